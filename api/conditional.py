@@ -0,0 +1,58 @@
+"""
+Conditional GET for the cached read endpoints (/data, /stats).
+
+The ETag is a hash of the dataset version token and the normalized request
+parameters, so it changes exactly when the cached body would. A request
+whose If-None-Match (or, without one, If-Modified-Since) still matches gets
+a bodyless 304 straight from the in-process dataset version: no query runs
+unless that version is due for its RESPONSE_CACHE_VERSION_TTL re-read.
+Per-request fields such as meta.request_id are not part of the validator.
+"""
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Hashable
+
+from fastapi import Request, Response
+
+from core.config import get_settings
+from services.cache import DatasetVersion
+
+
+def etag(version: DatasetVersion, key: Hashable) -> str:
+    digest = hashlib.sha256(f"{version.token}:{key!r}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def validator_headers(version: DatasetVersion, tag: str) -> Dict[str, str]:
+    headers = {
+        "ETag": tag,
+        "Cache-Control": f"public, max-age={get_settings().http_cache_max_age}, must-revalidate",
+    }
+    if version.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(version.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, version: DatasetVersion, tag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison; If-Modified-Since is then ignored
+        if if_none_match.strip() == "*":
+            return True
+        return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or version.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return version.last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -1,6 +1,6 @@
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession
-from services.db import get_session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from services.db import AsyncSessionLocal, get_session
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -8,4 +8,6 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-
+def get_sessionmaker() -> async_sessionmaker:
+    """For streaming responses, which open their own session: a get_db session is closed before the body is sent."""
+    return AsyncSessionLocal
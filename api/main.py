@@ -1,12 +1,18 @@
 import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta, timezone
 from fastapi import FastAPI
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.date import DateTrigger
+from sqlalchemy import select
 from api.routes import data, health, stats, trigger, admin
 from core.logger import configure_logging
 from core.config import get_settings
+from ingestion.jobs import EtlJob, get_job_manager
+from ingestion.schedule import AdaptiveSchedule, load_schedule
+from services import models, top
+from services.db import AsyncSessionLocal, init_db_with_retry
 
 configure_logging()
 logger = logging.getLogger(__name__)
@@ -14,17 +20,101 @@ settings = get_settings()
 
 # Initialize scheduler
 scheduler = AsyncIOScheduler()
+# Chooses the delay before each scheduled run (set at startup)
+etl_schedule: AdaptiveSchedule | None = None
+
+
+async def schedule_next_etl(job: EtlJob) -> None:
+    """Schedule the next run after the delay the adaptive schedule picks from job's outcome."""
+    _schedule_etl_in(await etl_schedule.observe(AsyncSessionLocal, job))
+
+
+def _schedule_etl_in(delay: float) -> None:
+    scheduler.add_job(
+        run_scheduled_etl,
+        trigger=DateTrigger(run_date=datetime.now(timezone.utc) + timedelta(seconds=delay)),
+        id='etl_job',
+        name='Run ETL (adaptive interval)',
+        replace_existing=True
+    )
 
 
 async def run_scheduled_etl():
-    """Run ETL process on schedule."""
+    """Run ETL process on schedule (joins a run that is already in flight)."""
     logger.info("Running scheduled ETL process...")
+    job = await get_job_manager().run("scheduler")
+    if job.status == "failure":
+        logger.error(f"Scheduled ETL process failed: {job.error}")
+    else:
+        logger.info(f"Scheduled ETL job {job.id} finished: {job.status}")
+    await schedule_next_etl(job)
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Startup work, run in the background so the app serves requests at once.
+
+    Creates the schema (retrying while the database comes up), then - unless
+    a worker process owns the ETL - runs the initial ETL and starts the
+    scheduler. /health/ready reports "warming" until this finishes.
+    """
+    await init_db_with_retry()
+
+    # Nothing below may leave the app warming (and /health/ready at 503) for
+    # good or the scheduler unstarted: each step logs its failure and moves on
     try:
-        from ingestion.runner import run_once
-        await run_once()
-        logger.info("Scheduled ETL process completed successfully")
-    except Exception as e:
-        logger.error(f"Scheduled ETL process failed: {e}", exc_info=True)
+        # A restart over an already populated database is ready before the ETL
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(models.NormalizedRecord.id).limit(1))
+                app.state.existing_data = result.first() is not None
+            await top.refresh(AsyncSessionLocal)
+        except Exception:
+            logger.exception("Reading existing data at startup failed")
+
+        if settings.etl_mode == "worker":
+            # The ETL worker process runs and schedules the ETL; this process
+            # only queues POST /trigger-etl jobs and serves reads
+            logger.info("ETL_MODE=worker: ETL runs in `python -m ingestion.runner --worker`")
+            app.state.top_watcher = asyncio.create_task(top.watch(AsyncSessionLocal, settings.worker_poll_seconds))
+        else:
+            await _start_inline_etl(app)
+    finally:
+        app.state.warming = False
+
+
+async def _start_inline_etl(app: FastAPI) -> None:
+    # /data/top is rebuilt after every job this process runs
+    get_job_manager().add_listener(lambda job: top.refresh(AsyncSessionLocal))
+    # Run initial ETL on startup
+    logger.info("Running initial ETL process...")
+    job = get_job_manager().submit("startup")
+    app.state.startup_job = job
+    await asyncio.shield(job.task)
+    if job.status == "failure":
+        logger.error(f"Initial ETL process failed: {job.error}")
+    else:
+        logger.info(f"Initial ETL job {job.id} finished: {job.status}")
+
+    # Each run schedules the next one, sooner when quotes are moving
+    global etl_schedule
+    try:
+        etl_schedule = await load_schedule(AsyncSessionLocal)
+    except Exception:
+        logger.exception("Loading the stored ETL schedule failed; starting from SCHEDULE_INITIAL_SECONDS")
+        etl_schedule = AdaptiveSchedule(
+            min_interval=settings.schedule_min_seconds,
+            max_interval=settings.schedule_max_seconds,
+            interval=settings.schedule_initial_seconds,
+            jitter=settings.schedule_jitter,
+        )
+    scheduler.start()
+    try:
+        await schedule_next_etl(job)
+    except Exception:
+        logger.exception("Scheduling the next ETL run failed; retrying after the current interval")
+        _schedule_etl_in(etl_schedule.interval)
+    logger.info("ETL scheduler started - adaptive interval")
 
 
 @asynccontextmanager
@@ -32,33 +122,29 @@ async def lifespan(app: FastAPI):
     """Manage application lifecycle - startup and shutdown events."""
     # Startup
     logger.info("Starting Kasparro ETL Backend...")
-    
-    # Run initial ETL on startup
-    logger.info("Running initial ETL process...")
-    try:
-        from ingestion.runner import run_once
-        await run_once()
-        logger.info("Initial ETL process completed successfully")
-    except Exception as e:
-        logger.error(f"Initial ETL process failed: {e}", exc_info=True)
-    
-    # Schedule ETL to run every hour
-    scheduler.add_job(
-        run_scheduled_etl,
-        trigger=IntervalTrigger(hours=1),
-        id='etl_job',
-        name='Run ETL every hour',
-        replace_existing=True
-    )
-    scheduler.start()
-    logger.info("ETL scheduler started - will run every hour")
+    app.state.warming = True
+    app.state.startup_job = None
+    app.state.existing_data = False
+    app.state.top_watcher = None
+    warm_up_task = asyncio.create_task(warm_up(app))
     
     yield
     
     # Shutdown
     logger.info("Shutting down Kasparro ETL Backend...")
-    scheduler.shutdown()
-    logger.info("ETL scheduler stopped")
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warm_up_task
+    if app.state.top_watcher is not None:
+        app.state.top_watcher.cancel()
+    if scheduler.running:
+        scheduler.shutdown()
+        logger.info("ETL scheduler stopped")
+    from ingestion.parallel import close_transform_pool
+    from ingestion.sources.http_client import close_http_client
+    await close_http_client()
+    close_transform_pool()
 
 
 app = FastAPI(
@@ -77,6 +163,8 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "data": "/data",
             "stats": "/stats",
             "trigger_etl": "/trigger-etl",
@@ -84,7 +172,7 @@ async def root():
             "openapi": "/openapi.json"
         },
         "description": "Cryptocurrency ETL Pipeline ingesting data from the CoinPaprika API",
-        "etl_schedule": "Every hour (automated)"
+        "etl_schedule": "Adaptive interval (automated, see /stats)"
     }
 
 app.include_router(data.router, prefix="/data", tags=["data"])
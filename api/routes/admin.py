@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from api.deps import get_db
 from core.config import get_settings
+from ingestion.load import rebuild_ohlcv
+from services import cache
 
 router = APIRouter()
 
@@ -16,7 +18,9 @@ async def cleanup_csv_data(
     """
     Remove all legacy CSV-derived data so only real API data remains.
 
-    - Deletes normalized records with source = 'csv'
+    - Deletes normalized records and price history with source = 'csv'
+    - Rebuilds the OHLCV rollups of the tickers that had csv price history
+      from their remaining (API) quotes; tickers with none left lose theirs
     - Deletes ETL runs and checkpoints for source = 'csv'
     - Attempts to delete raw_csv_records table data if it exists
     """
@@ -27,11 +31,18 @@ async def cleanup_csv_data(
         if not x_scheduler_token or x_scheduler_token != settings.scheduler_token:
             raise HTTPException(status_code=401, detail="Invalid scheduler token")
 
-    deleted = {"normalized": 0, "etl_runs": 0, "etl_checkpoints": 0, "raw_csv_records": 0}
+    deleted = {"normalized": 0, "price_history": 0, "etl_runs": 0, "etl_checkpoints": 0, "raw_csv_records": 0}
+
+    # Rollups were built from the csv quotes too; note whose to rebuild
+    result = await db.execute(text("SELECT DISTINCT ticker FROM price_history WHERE source = 'csv'"))
+    tickers = result.scalars().all()
 
     # Delete from normalized_records where source = 'csv'
     result = await db.execute(text("DELETE FROM normalized_records WHERE source = 'csv'"))
     deleted["normalized"] = result.rowcount or 0
+    result = await db.execute(text("DELETE FROM price_history WHERE source = 'csv'"))
+    deleted["price_history"] = result.rowcount or 0
+    await rebuild_ohlcv(db, tickers)
 
     # Delete ETL runs and checkpoints for csv
     result = await db.execute(text("DELETE FROM etl_runs WHERE source = 'csv'"))
@@ -48,9 +59,11 @@ async def cleanup_csv_data(
         pass
 
     await db.commit()
+    await cache.bump_dataset_version(db)
 
     return {
         "status": "ok",
         "deleted": deleted,
+        "ohlcv_rebuilt_tickers": len(tickers),
         "timestamp": datetime.utcnow().isoformat() + "Z",
     }
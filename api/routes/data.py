@@ -1,47 +1,214 @@
 import time
 from datetime import datetime
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from api.deps import get_db
-from schemas.record import NormalizedRecord as NormalizedSchema
-from services import models
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from api import conditional
+from api.deps import get_db, get_sessionmaker
+from core.config import get_settings
+from services import cache, export, history, records, top
 
 router = APIRouter()
 
 
 @router.get("", response_model=dict)
 async def list_data(
+    request: Request,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     source: Optional[str] = Query(None, description="Filter by source (e.g., coinpaprika)"),
     ticker: Optional[str] = Query(None, description="Filter by cryptocurrency ticker (e.g., BTC, ETH)"),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
+    count: Literal["exact", "estimated", "none"] = Query(
+        "exact", description="total: exact COUNT(*), the planner's estimate (PostgreSQL), or none"
+    ),
+    sort_by: records.SortBy = Query("created_at", description="Sort column; ties are ordered by id"),
+    order: Literal["desc", "asc"] = Query("desc", description="Sort direction; missing values always come last"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor / prev_cursor of a previous page (keyset paging; instead of offset)"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
+    """Filtered records, newest first unless sort_by/order say otherwise, paged in SQL by offset or cursor."""
     started = time.perf_counter()
-    query = select(models.NormalizedRecord)
-
-    if source:
-        query = query.where(models.NormalizedRecord.source == source)
-    if ticker:
-        query = query.where(models.NormalizedRecord.ticker == ticker.upper())
-    if start_date:
-        query = query.where(models.NormalizedRecord.created_at >= start_date)
-    if end_date:
-        query = query.where(models.NormalizedRecord.created_at <= end_date)
-
-    result = await db.execute(query)
-    total_rows = result.scalars().all()
-    items = total_rows[offset : offset + limit]
-    records = [NormalizedSchema.model_validate(row, from_attributes=True).model_dump() for row in items]
+    ticker = ticker.upper() if ticker else None
+    filters = {"source": source, "ticker": ticker, "start": start_date, "end": end_date}
+    sort = {"sort": sort_by, "descending": order == "desc"}
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+
+    # Cached per dataset version under the validated parameters (services.cache),
+    # which also make up the ETag (api.conditional)
+    response_cache = cache.get_response_cache()
+    version = await cache.dataset_version(db)
+    key = ("data", limit, offset, source, ticker, start_date, end_date, count, sort_by, order, cursor)
+    headers = conditional.validator_headers(version, conditional.etag(version, key))
+    if conditional.is_not_modified(request, version, headers["ETag"]):
+        return conditional.not_modified(headers)
+
+    # The serialized page is what gets cached; only meta is encoded per request
+    body = response_cache.get(key, version.token)
+    hit = body is not None
+    if not hit:
+        body = await _page_body(db, limit, offset, cursor, count, sort, filters)
+        response_cache.put(key, version.token, body)
+    meta = {
+        "request_id": f"req-{int(time.time()*1000)}",
+        "api_latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "cache": "hit" if hit else "miss",
+    }
+    # body is a complete JSON object; meta goes in before its closing brace
+    return Response(body[:-1] + b',"meta":' + to_json(meta) + b"}", media_type="application/json", headers=headers)
+
+
+def serialize_page(rows: List[Row], pagination: dict) -> bytes:
+    """
+    {"data": [...], "pagination": {...}} as JSON, in one pydantic-core pass.
+
+    rows hold every normalized_records column, which are exactly the fields
+    of schemas.record.NormalizedRecord with the same types, so they are
+    encoded as read instead of being validated into models and re-encoded
+    per row.
+    """
+    return to_json({"data": [row._asdict() for row in rows], "pagination": pagination})
+
+
+async def _page_body(
+    db: AsyncSession, limit: int, offset: int, cursor: Optional[str], count: str, sort: dict, filters: dict
+) -> bytes:
+    if cursor is not None:
+        try:
+            result = await records.page(db, limit, cursor=records.Cursor.decode(cursor), **sort, **filters)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    else:
+        result = await records.page(db, limit, offset, **sort, **filters)
+    total, estimated = await records.count(db, count, **filters)
+
+    return serialize_page(result.rows, {
+        "limit": limit,
+        "offset": offset,
+        "returned": len(result.rows),
+        "total": total,
+        "total_estimated": estimated,
+        "next_cursor": result.next_cursor,
+        "prev_cursor": result.prev_cursor,
+    })
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+
+@router.get("/export")
+async def export_data(
+    format: Literal["ndjson", "csv", "arrow", "parquet"] = Query(
+        "ndjson",
+        description="ndjson: one JSON record per line; csv: header row first; "
+        "arrow: Arrow IPC stream; parquet: Parquet file (arrow and parquet need pyarrow)",
+    ),
+    source: Optional[str] = Query(None, description="Filter by source (e.g., coinpaprika)"),
+    ticker: Optional[str] = Query(None, description="Filter by cryptocurrency ticker (e.g., BTC, ETH)"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    sessionmaker: async_sessionmaker = Depends(get_sessionmaker),
+):
+    """
+    Every matching record, oldest first, streamed as it is read.
+
+    Backed by a server-side cursor (services.export), so memory use does not
+    grow with the table and there is no limit. The columnar formats answer
+    501 on an install without pyarrow.
+    """
+    if format in export.ARROW_FORMATS and not export.ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail=f"format={format} needs pyarrow, which is not installed")
+    filters = {"source": source, "ticker": ticker, "start": start_date, "end": end_date}
+    return StreamingResponse(
+        export.export(sessionmaker, format, get_settings().export_chunk_size, **filters),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="normalized_records.{EXPORT_EXTENSIONS[format]}"'},
+    )
+
+
+@router.get("/top", response_model=dict)
+async def top_lists(n: int = Query(10, ge=1, le=top.TOP_SIZE, description="Records per list")):
+    """
+    Top n records by market cap, volume and price, and the biggest 24h gainers and losers.
+
+    Served from in-memory lists rebuilt after each ETL run (no database query).
+    """
+    started = time.perf_counter()
+    board = top.get_board()
+    lists = {name: rows[:n] for name, rows in board.lists.items()}
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    return {
+        "data": lists,
+        "meta": {
+            "request_id": f"req-{int(time.time()*1000)}",
+            "api_latency_ms": latency_ms,
+            "built_at": board.built_at.isoformat() + "Z" if board.built_at else None,
+        },
+    }
+
+
+@router.get("/history/{ticker}", response_model=dict)
+async def price_history(
+    ticker: str,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    method: Literal["avg", "lttb"] = Query("avg", description="avg: mean per interval bucket; lttb: shape-preserving sample"),
+    interval: Literal["1m", "1h", "1d"] = Query("1h", description="Bucket size for method=avg"),
+    points: int = Query(500, ge=3, le=5000, description="Maximum points for method=lttb"),
+    source: Optional[str] = Query(None, description="Filter by source (e.g., coinpaprika)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Downsampled price series for one ticker from the append-only price_history table."""
+    started = time.perf_counter()
+    ticker = ticker.upper()
+    if method == "avg":
+        series = await history.average_series(db, ticker, interval, start_date, end_date, source)
+    else:
+        series = await history.lttb_series(db, ticker, points, start_date, end_date, source)
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    return {
+        "ticker": ticker,
+        "method": method,
+        "interval": interval if method == "avg" else None,
+        "data": series,
+        "meta": {"request_id": f"req-{int(time.time()*1000)}", "api_latency_ms": latency_ms, "points": len(series)},
+    }
+
+
+@router.get("/ohlcv/{ticker}", response_model=dict)
+async def ohlcv(
+    ticker: str,
+    interval: Literal["1m", "1h", "1d"] = Query("1h"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    limit: int = Query(500, ge=1, le=5000, description="Most recent buckets in the range"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Open/high/low/close/volume candles for one ticker, read from the ingest-time rollups."""
+    started = time.perf_counter()
+    ticker = ticker.upper()
+    candles = await history.ohlcv_series(db, ticker, interval, start_date, end_date, limit)
     latency_ms = round((time.perf_counter() - started) * 1000, 2)
 
     return {
-        "data": records,
-        "pagination": {"limit": limit, "offset": offset, "returned": len(records), "total": len(total_rows)},
-        "meta": {"request_id": f"req-{int(time.time()*1000)}", "api_latency_ms": latency_ms},
+        "ticker": ticker,
+        "interval": interval,
+        "data": candles,
+        "meta": {"request_id": f"req-{int(time.time()*1000)}", "api_latency_ms": latency_ms, "points": len(candles)},
     }
 
@@ -1,9 +1,10 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from api.deps import get_db
 from services import models
+from services.db import schema_ready
 
 router = APIRouter()
 
@@ -17,7 +18,7 @@ async def healthcheck(db: AsyncSession = Depends(get_db)):
         db_status = "connected"
         
         last_run = await db.execute(
-            select(models.ETLRun).order_by(models.ETLRun.finished_at.desc()).limit(1)
+            select(models.ETLRun).order_by(models.ETLRun.finished_at.desc().nulls_last()).limit(1)
         )
         run = last_run.scalar_one_or_none()
         
@@ -39,6 +40,47 @@ async def healthcheck(db: AsyncSession = Depends(get_db)):
         }
 
 
+@router.get("/live")
+async def liveness():
+    """Liveness probe - the process is up and serving; never touches the database."""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
 
 
+@router.get("/ready")
+async def readiness(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """
+    Readiness probe - 200 once reads can be served, 503 while warming up.
 
+    Ready means the schema exists, the database answers, and either the
+    startup ETL has finished or the database already held data from earlier
+    runs when this process started.
+    """
+    warming = getattr(request.app.state, "warming", False)
+    startup_job = getattr(request.app.state, "startup_job", None)
+    checks = {
+        "schema": schema_ready(),
+        "database": "disconnected",
+        "existing_data": getattr(request.app.state, "existing_data", False),
+        "startup_etl": startup_job.status if startup_job else None,
+    }
+    try:
+        await db.execute(text("SELECT 1"))
+        checks["database"] = "connected"
+    except Exception as e:
+        checks["error"] = str(e)
+
+    if checks["database"] == "connected" and checks["schema"] and (not warming or checks["existing_data"]):
+        status = "ready"
+    elif warming:
+        # Still creating the schema (waiting for the database) or running the startup ETL
+        status = "warming"
+    else:
+        status = "unavailable"
+    if status != "ready":
+        response.status_code = 503
+    return {
+        "status": status,
+        "warming": warming,
+        "checks": checks,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
@@ -1,14 +1,57 @@
-from fastapi import APIRouter, Depends
+import json
+from dataclasses import replace
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from api import conditional
 from api.deps import get_db
-from services import models
+from ingestion.schedule import STATE_KEY
+from services import cache, models
 
 router = APIRouter()
 
 
 @router.get("")
-async def stats(db: AsyncSession = Depends(get_db)):
+async def stats(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    response_cache = cache.get_response_cache()
+    version = await cache.dataset_version(db)
+    # A run that wrote nothing keeps the dataset version but still changes
+    # last_success / last_failure, so the newest finished run is part of the key
+    last_finished = await _last_finished(db)
+    version = replace(version, last_modified=last_finished or version.last_modified)
+    schedule = version.state.get(STATE_KEY)
+    headers = conditional.validator_headers(
+        version, conditional.etag(version, ("stats", schedule["decided_at"] if schedule else None, last_finished))
+    )
+    if conditional.is_not_modified(request, version, headers["ETag"]):
+        return conditional.not_modified(headers)
+    response.headers.update(headers)
+
+    key = ("stats", last_finished)
+    summary = response_cache.get(key, version.token)
+    if summary is None:
+        summary = await _summary(db)
+        response_cache.put(key, version.token, summary)
+
+    return {
+        **summary,
+        # Last adaptive-schedule decision: interval, jittered delay, reason and next run
+        "schedule": schedule,
+        # Response cache of this process (services.cache)
+        "cache": {**response_cache.stats(), "dataset_version": version.token},
+    }
+
+
+async def _last_finished(db: AsyncSession) -> Optional[datetime]:
+    # One lookup on ix_etl_runs_finished_at
+    return (await db.execute(select(func.max(models.ETLRun.finished_at)))).scalar_one()
+
+
+async def _summary(db: AsyncSession) -> dict:
+    # Everything here changes only when an ETL run finishes, so it is cached per
+    # dataset version and newest finished run
     total_records = await db.execute(select(func.count(models.NormalizedRecord.id)))
     total = total_records.scalar_one() or 0
 
@@ -29,6 +72,8 @@ async def stats(db: AsyncSession = Depends(get_db)):
             "finished_at": success_run.finished_at if success_run else None,
             "duration_ms": success_run.duration_ms if success_run else None,
             "processed": success_run.processed if success_run else None,
+            # Pipeline stage throughput and queue depth (see ingestion.pipeline)
+            "stats": json.loads(success_run.stats) if success_run and success_run.stats else None,
         },
         "last_failure": {
             "source": failure_run.source if failure_run else None,
@@ -36,11 +81,3 @@ async def stats(db: AsyncSession = Depends(get_db)):
             "message": failure_run.message if failure_run else None,
         },
     }
-
-
-
-
-
-
-
-
@@ -1,30 +1,54 @@
 from datetime import datetime
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from api.deps import get_db
 from core.config import get_settings
-from ingestion.runner import run_once
+from ingestion.jobs import enqueue_job, get_job_manager, get_queued_job
 
 router = APIRouter()
 
 
-@router.post("")
-async def trigger_etl(
-    background_tasks: BackgroundTasks,
-    x_scheduler_token: str | None = Header(default=None, alias="X-Scheduler-Token"),
-    db: AsyncSession = Depends(get_db),
-):
+def _check_token(x_scheduler_token: str | None) -> None:
     settings = get_settings()
-    
+
     # If SCHEDULER_TOKEN is set, require authentication
     if settings.scheduler_token:
         if not x_scheduler_token or x_scheduler_token != settings.scheduler_token:
             raise HTTPException(status_code=401, detail="Invalid scheduler token")
 
-    background_tasks.add_task(run_once)
-    return {"status": "triggered", "timestamp": datetime.utcnow().isoformat() + "Z"}
-
-
-
-
 
+@router.post("")
+async def trigger_etl(
+    x_scheduler_token: str | None = Header(default=None, alias="X-Scheduler-Token"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start an ETL run, or join the one already in flight (same job_id)."""
+    _check_token(x_scheduler_token)
+
+    if get_settings().etl_mode == "worker":
+        # Queued for the ETL worker process; nothing runs on this event loop
+        job = await enqueue_job(db, "api")
+    else:
+        job = get_job_manager().submit("api")
+    return {
+        "status": "already_running" if job.merged else "triggered",
+        "job_id": job.id,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+@router.get("/{job_id}")
+async def etl_job_status(
+    job_id: str,
+    x_scheduler_token: str | None = Header(default=None, alias="X-Scheduler-Token"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Status of a job returned by POST /trigger-etl (recent jobs of this process, or etl_jobs in worker mode)."""
+    _check_token(x_scheduler_token)
+
+    job = get_job_manager().get(job_id)
+    if job is None and get_settings().etl_mode == "worker":
+        job = await get_queued_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
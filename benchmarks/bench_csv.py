@@ -0,0 +1,74 @@
+"""
+Benchmark: CSV source throughput in rows/s.
+
+Writes a synthetic quotes file, then times reading it with iter_csv_batches
+(mmap + chunked parsing) alone and with transform_csv_batch on every batch,
+which is what the runner's fetch and transform stages do per batch.
+
+Usage:
+    python -m benchmarks.bench_csv --rows 500000 --chunk-bytes 4194304
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from ingestion.columnar import transform_csv_batch  # noqa: E402
+from ingestion.sources.csv_source import iter_csv_batches  # noqa: E402
+
+HEADER = "symbol,name,price_usd,market_cap_usd,volume_24h_usd,percent_change_24h,created_at\n"
+
+
+def write_file(path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    with open(path, "w", newline="") as handle:
+        handle.write(HEADER)
+        for i in range(rows):
+            created_at = start + timedelta(minutes=i)
+            handle.write(
+                f"c{i % 2000},Coin {i % 2000},{rng.uniform(0.0001, 60000):.8f},{rng.randrange(10**12)},"
+                f"{rng.uniform(0, 1e10):.2f},{rng.uniform(-20, 20):.2f},{created_at:%Y-%m-%dT%H:%M:%SZ}\n"
+            )
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--chunk-bytes", type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "quotes.csv")
+        write_file(path, args.rows)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        def parse() -> None:
+            for _ in iter_csv_batches(path, batch_size=args.batch_size, chunk_bytes=args.chunk_bytes):
+                pass
+
+        def parse_and_transform() -> None:
+            for batch in iter_csv_batches(path, batch_size=args.batch_size, chunk_bytes=args.chunk_bytes):
+                transform_csv_batch(batch).batch.to_rows()
+
+        parse_only = timed(parse)
+        full = timed(parse_and_transform)
+
+    print(f"{args.rows} rows ({size_mb:.1f} MB), chunk {args.chunk_bytes} bytes, batch {args.batch_size}")
+    print(f"  parse              : {parse_only:8.2f} s  ({args.rows / parse_only:10.0f} rows/s)")
+    print(f"  parse + transform  : {full:8.2f} s  ({args.rows / full:10.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
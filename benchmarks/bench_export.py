@@ -0,0 +1,120 @@
+"""
+Benchmark: export payload size and client decode time by format.
+
+Fills a SQLite normalized_records table with --rows synthetic quotes,
+exports it through services.export in each format, and times decoding the
+payload into columns the way an analyst's client would:
+
+- json     the /data body shape ({"data": [...]}), json.loads
+- ndjson   json.loads per line
+- arrow    pyarrow.ipc.open_stream(...).read_all()
+- parquet  pyarrow.parquet.read_table(...)
+
+Arrow and Parquet are skipped when pyarrow is not installed.
+
+Usage:
+    python -m benchmarks.bench_export --rows 100000
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from services import export, models  # noqa: E402
+
+CHUNK_SIZE = 1000
+
+
+async def fill(sessionmaker, rows: int) -> None:
+    base = datetime(2024, 1, 1)
+    async with sessionmaker() as session:
+        for low in range(0, rows, 50000):
+            await session.execute(insert(models.NormalizedRecord), [
+                {
+                    "id": f"bench_T{i}", "ticker": f"T{i}", "name": f"Coin {i}", "price_usd": i * 1.37,
+                    "market_cap_usd": i * 1.1e9, "volume_24h_usd": i * 3.3e7, "percent_change_24h": (i % 41) / 3 - 7,
+                    "source": "bench", "created_at": base + timedelta(seconds=i), "ingested_at": base,
+                }
+                for i in range(low, min(low + 50000, rows))
+            ])
+        await session.commit()
+
+
+async def payload(sessionmaker, fmt: str) -> bytes:
+    return b"".join([chunk async for chunk in export.export(sessionmaker, fmt, CHUNK_SIZE)])
+
+
+def decoders():
+    decode = {
+        "json": json.loads,
+        "ndjson": lambda data: [json.loads(line) for line in data.splitlines()],
+    }
+    if export.ARROW_AVAILABLE:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        decode["arrow"] = lambda data: pa.ipc.open_stream(data).read_all()
+        decode["parquet"] = lambda data: pq.read_table(io.BytesIO(data))
+    return decode
+
+
+def best_ms(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def run(rows: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'export.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        await fill(sessionmaker, rows)
+
+        ndjson = await payload(sessionmaker, "ndjson")
+        payloads = {"json": b'{"data":[' + b",".join(ndjson.splitlines()) + b"]}", "ndjson": ndjson}
+        encode_ms = {}
+        for fmt in export.ARROW_FORMATS if export.ARROW_AVAILABLE else ():
+            started = time.perf_counter()
+            payloads[fmt] = await payload(sessionmaker, fmt)
+            encode_ms[fmt] = (time.perf_counter() - started) * 1000
+        await engine.dispose()
+
+    print(f"{rows} rows  (decode: best of {repeat})")
+    print(f"  {'format':<8} | {'size MB':>8} | {'vs json':>7} | {'decode ms':>9}")
+    decode = decoders()
+    for fmt, data in payloads.items():
+        size = len(data)
+        print(
+            f"  {fmt:<8} | {size / 1e6:8.2f} | {size / len(payloads['json']):6.2f}x | "
+            f"{best_ms(lambda: decode[fmt](data), repeat):9.1f}"
+        )
+    if not export.ARROW_AVAILABLE:
+        print("  arrow / parquet: skipped, pyarrow is not installed")
+    for fmt, elapsed in encode_ms.items():
+        print(f"  export {fmt}: {elapsed:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
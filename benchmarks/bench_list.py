@@ -0,0 +1,103 @@
+"""
+Benchmark: GET /data page latency as normalized_records grows.
+
+Grows a SQLite normalized_records table to each --sizes step and times one
+50-row page the way list_data reads it (records.page, then records.count),
+against the previous approach of loading every matching row and slicing in
+Python (only up to --legacy-max rows, it gets slow). The middle of the table
+is read both by OFFSET and by keyset cursor.
+
+Usage:
+    python -m benchmarks.bench_list --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from services import models, records  # noqa: E402
+
+LIMIT = 50
+
+
+async def grow(sessionmaker, start: int, stop: int) -> None:
+    base = datetime(2024, 1, 1)
+    async with sessionmaker() as session:
+        for low in range(start, stop, 50000):
+            rows = [
+                {
+                    "id": f"bench_T{i}", "ticker": f"T{i}", "price_usd": float(i % 1000), "source": "bench",
+                    "created_at": base + timedelta(seconds=i), "ingested_at": base,
+                }
+                for i in range(low, min(low + 50000, stop))
+            ]
+            await session.execute(insert(models.NormalizedRecord), rows)
+        await session.commit()
+
+
+async def timed(sessionmaker, read, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await read(session)
+            best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def sql_page(session, offset: int = 0, count: str = "exact", cursor=None) -> None:
+    await records.page(session, LIMIT, offset, cursor=cursor)
+    await records.count(session, count)
+
+
+async def legacy_page(session):
+    rows = (await session.execute(select(models.NormalizedRecord))).scalars().all()
+    return rows[:LIMIT], len(rows)
+
+
+async def run(sizes, legacy_max: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'list.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        print(
+            f"{'rows':>9} | {'page+count':>10} | {'page only':>9} | {'offset mid':>10} | {'cursor mid':>10} | "
+            f"{'legacy':>9}  (ms, best of {repeat})"
+        )
+        size = 0
+        for target in sorted(sizes):
+            await grow(sessionmaker, size, target)
+            size = target
+            exact = await timed(sessionmaker, sql_page, repeat)
+            uncounted = await timed(sessionmaker, lambda s: sql_page(s, count="none"), repeat)
+            middle = size // 2
+            deep = await timed(sessionmaker, lambda s: sql_page(s, offset=middle, count="none"), repeat)
+            async with sessionmaker() as session:
+                row = (await records.page(session, 1, middle)).rows[0]
+            cursor = records.Cursor.at(row, "created_at", True)
+            keyset = await timed(sessionmaker, lambda s: sql_page(s, count="none", cursor=cursor), repeat)
+            legacy = f"{await timed(sessionmaker, legacy_page, 1):9.1f}" if size <= legacy_max else f"{'-':>9}"
+            print(f"{size:>9} | {exact:10.2f} | {uncounted:9.2f} | {deep:10.2f} | {keyset:10.2f} | {legacy}")
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.legacy_max, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: GET /data serialization cost per page.
+
+Reads one --limit row page from a SQLite normalized_records table both ways
+and times turning it into the JSON response body:
+
+- before: ORM objects -> NormalizedSchema.model_validate(...).model_dump()
+  per row, then FastAPI's jsonable_encoder + json.dumps of the dict response
+- after:  column rows -> api.routes.data.serialize_page (one pydantic-core
+  to_json pass)
+
+The read itself is timed separately (ORM entities vs plain rows).
+
+Usage:
+    python -m benchmarks.bench_serialize --limit 200 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from api.routes.data import serialize_page  # noqa: E402
+from schemas.record import NormalizedRecord as NormalizedSchema  # noqa: E402
+from services import models  # noqa: E402
+
+PAGINATION = {"limit": 0, "offset": 0, "returned": 0, "total": 0, "total_estimated": False,
+              "next_cursor": None, "prev_cursor": None}
+
+
+def before(rows) -> bytes:
+    data = [NormalizedSchema.model_validate(row, from_attributes=True).model_dump() for row in rows]
+    body = jsonable_encoder({"data": data, "pagination": PAGINATION})
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def after(rows) -> bytes:
+    return serialize_page(rows, PAGINATION)
+
+
+def best_ms(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def timed_read(sessionmaker, query, entities: bool, repeat: int):
+    best, rows = float("inf"), None
+    for _ in range(repeat):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            result = await session.execute(query)
+            rows = list(result.scalars() if entities else result)
+            best = min(best, time.perf_counter() - started)
+    return best * 1000, rows
+
+
+async def run(limit: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    base = datetime(2024, 1, 1)
+    async with sessionmaker() as session:
+        await session.execute(insert(models.NormalizedRecord), [
+            {
+                "id": f"bench_T{i}", "ticker": f"T{i}", "name": f"Coin {i}", "price_usd": i * 1.5,
+                "market_cap_usd": i * 1e9, "volume_24h_usd": i * 1e7, "percent_change_24h": (i % 21) - 10.0,
+                "source": "bench", "created_at": base + timedelta(seconds=i), "ingested_at": base,
+            }
+            for i in range(limit)
+        ])
+        await session.commit()
+
+    orm_ms, orm_rows = await timed_read(sessionmaker, select(models.NormalizedRecord), True, repeat)
+    row_ms, plain_rows = await timed_read(sessionmaker, select(models.NormalizedRecord.__table__), False, repeat)
+    await engine.dispose()
+    assert json.loads(before(orm_rows)) == json.loads(after(plain_rows))
+
+    old = best_ms(lambda: before(orm_rows), repeat)
+    new = best_ms(lambda: after(plain_rows), repeat)
+    print(f"{limit}-row page (ms, best of {repeat})")
+    print(f"  read       ORM entities {orm_ms:8.3f} | column rows {row_ms:8.3f}")
+    print(f"  serialize  before       {old:8.3f} | after       {new:8.3f}  ({old / new:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: API cold start, as time-to-first-200.
+
+Starts `uvicorn api.main:app` against a fresh SQLite database and polls until
+each endpoint first answers 200:
+
+- /health/live   the process is serving
+- /data          reads are served (before any data is loaded)
+- /health/ready  schema created and the startup ETL finished
+
+The startup ETL ingests a synthetic CSV file of --rows quotes. Upstream
+requests go through an unreachable proxy, so the API source fails at once
+and the numbers do not depend on the network.
+
+Usage:
+    python -m benchmarks.bench_startup --rows 200000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_csv import write_file
+
+ENDPOINTS = ("/health/live", "/data", "/health/ready")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_200(base_url: str, timeout: float) -> dict:
+    started = time.perf_counter()
+    pending = list(ENDPOINTS)
+    results = {}
+    with httpx.Client(base_url=base_url, timeout=1.0, trust_env=False) as client:
+        while pending and time.perf_counter() - started < timeout:
+            for path in list(pending):
+                try:
+                    if client.get(path).status_code == 200:
+                        results[path] = time.perf_counter() - started
+                        pending.remove(path)
+                except httpx.TransportError:
+                    pass
+            time.sleep(0.01)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "quotes.csv")
+        write_file(csv_path, args.rows)
+        port = free_port()
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(directory, 'startup.db')}",
+            "CSV_SOURCE_PATH": csv_path,
+            "ETL_MODE": "inline",
+            "HTTPS_PROXY": "http://127.0.0.1:9",
+            "LOG_LEVEL": "WARNING",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            results = time_to_first_200(f"http://127.0.0.1:{port}", args.timeout)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"cold start, startup ETL of {args.rows} CSV rows")
+    for path in ENDPOINTS:
+        elapsed = results.get(path)
+        shown = f"{elapsed:8.2f} s" if elapsed is not None else "   timeout"
+        print(f"  first 200 {path:<14}: {shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: transform_api_record per payload vs. transform_api_batch.
+
+Both sides produce what the bulk writer consumes: rows from
+NormalizedRecord models (old path) or NormalizedBatch.to_rows() (new path).
+Payloads look like CoinPaprika /v1/tickers elements.
+
+Usage:
+    python -m benchmarks.bench_transform --payloads 10000 --repeat 5
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from ingestion.columnar import transform_api_batch  # noqa: E402
+from ingestion.load import _normalized_row  # noqa: E402
+from ingestion.transform import transform_api_record  # noqa: E402
+
+
+def make_payloads(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 15, 10, 0, 0)
+    payloads = []
+    for i in range(count):
+        last_updated = start + timedelta(seconds=rng.randrange(86400))
+        payloads.append({
+            "id": f"coin{i}-coin",
+            "name": f"Coin {i}",
+            "symbol": f"c{i % (count // 2 or 1)}",
+            "rank": i + 1,
+            "quotes": {"USD": {
+                "price": rng.uniform(0.0001, 60000),
+                "volume_24h": rng.uniform(0, 1e10) if rng.random() > 0.05 else 0,
+                "market_cap": rng.randrange(0, 10**12),
+                "percent_change_24h": round(rng.uniform(-20, 20), 2),
+                "last_updated": last_updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }},
+        })
+    return payloads
+
+
+def per_record(payloads: list) -> list:
+    return [_normalized_row(transform_api_record(payload)) for payload in payloads]
+
+
+def columnar(payloads: list) -> list:
+    return transform_api_batch(payloads).batch.to_rows()
+
+
+def best_of(fn, payloads: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payloads)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.payloads)
+    legacy = best_of(per_record, payloads, args.repeat)
+    batched = best_of(columnar, payloads, args.repeat)
+    transform_only = best_of(transform_api_batch, payloads, args.repeat)
+
+    print(f"{args.payloads} payloads, best of {args.repeat}")
+    print(f"  transform_api_record + rows : {legacy * 1000:8.1f} ms  ({args.payloads / legacy:10.0f} rows/s)")
+    print(f"  transform_api_batch + rows  : {batched * 1000:8.1f} ms  ({args.payloads / batched:10.0f} rows/s)")
+    print(f"  transform_api_batch only    : {transform_only * 1000:8.1f} ms")
+    print(f"  speedup                     : {legacy / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
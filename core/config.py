@@ -12,6 +12,48 @@ class Settings(BaseSettings):
     api_source_key: str = Field(default="REPLACE_ME", env="API_SOURCE_KEY")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     scheduler_token: str | None = Field(default=None, env="SCHEDULER_TOKEN")
+    # Rows per INSERT ... ON CONFLICT statement when loading normalized records
+    upsert_batch_size: int = Field(default=1000, env="UPSERT_BATCH_SIZE")
+    # Raw payloads buffered before a bulk archive write to raw_api_records
+    raw_batch_size: int = Field(default=500, env="RAW_BATCH_SIZE")
+    # ETL pipeline: batches buffered between stages, and workers per stage
+    pipeline_queue_size: int = Field(default=4, env="PIPELINE_QUEUE_SIZE")
+    transform_concurrency: int = Field(default=1, env="TRANSFORM_CONCURRENCY")
+    write_concurrency: int = Field(default=2, env="WRITE_CONCURRENCY")
+    # >0: decode and transform in a process pool of this size instead of on the event loop
+    transform_processes: int = Field(default=0, env="TRANSFORM_PROCESSES")
+    # CSV backfill source: file to load (source disabled when unset) and bytes mapped per chunk
+    csv_source_path: str | None = Field(default=None, env="CSV_SOURCE_PATH")
+    csv_chunk_bytes: int = Field(default=4 * 1024 * 1024, env="CSV_CHUNK_BYTES")
+    # "inline": the API process runs the ETL itself; "worker": the API only queues
+    # jobs in etl_jobs and `python -m ingestion.runner --worker` runs them
+    etl_mode: str = Field(default="inline", env="ETL_MODE")
+    # Worker: seconds between polls of etl_jobs
+    worker_poll_seconds: float = Field(default=5.0, env="WORKER_POLL_SECONDS")
+    # Adaptive ETL schedule (ingestion.schedule): interval bounds, starting interval,
+    # and +/- fraction of random jitter on each delay
+    schedule_min_seconds: float = Field(default=300.0, env="SCHEDULE_MIN_SECONDS")
+    schedule_max_seconds: float = Field(default=7200.0, env="SCHEDULE_MAX_SECONDS")
+    schedule_initial_seconds: float = Field(default=3600.0, env="SCHEDULE_INITIAL_SECONDS")
+    schedule_jitter: float = Field(default=0.1, env="SCHEDULE_JITTER")
+    # Connection pool per process (PostgreSQL); the API and the worker size theirs separately
+    db_pool_size: int = Field(default=5, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    # Response cache for /data and /stats (services.cache): entries per process (0 disables),
+    # and seconds a process trusts its last read of the dataset version
+    response_cache_size: int = Field(default=256, env="RESPONSE_CACHE_SIZE")
+    response_cache_version_ttl: float = Field(default=1.0, env="RESPONSE_CACHE_VERSION_TTL")
+    # Cache-Control max-age of /data and /stats; 0 makes clients revalidate (ETag -> 304) on every poll
+    http_cache_max_age: int = Field(default=0, env="HTTP_CACHE_MAX_AGE")
+    # Rows fetched from the server-side cursor per chunk of GET /data/export
+    export_chunk_size: int = Field(default=1000, env="EXPORT_CHUNK_SIZE")
+
+    @field_validator("etl_mode")
+    @classmethod
+    def check_etl_mode(cls, v: str) -> str:
+        if v not in ("inline", "worker"):
+            raise ValueError("ETL_MODE must be 'inline' or 'worker'")
+        return v
 
     @field_validator("database_url")
     @classmethod
@@ -0,0 +1,439 @@
+"""
+Columnar batch transform for CoinPaprika ticker payloads (and CSV rows,
+see transform_csv_batch).
+
+transform_api_batch produces the same values as calling
+ingestion.transform.transform_api_record on every payload, but builds the
+batch as columns instead of one Pydantic model per row:
+
+- price / market cap / volume / percent change are float64 NumPy arrays; the
+  nullable ones are masked arrays (masked = None), so a real NaN from the
+  API is not confused with a missing value.
+- last_updated strings in the format CoinPaprika sends
+  (YYYY-MM-DDTHH:MM:SSZ) are parsed in one datetime64 conversion; anything
+  else goes through transform.parse_last_updated row by row.
+- A batch of well-formed payloads is transformed one column at a time with
+  list comprehensions and C-level type checks. A batch containing odd
+  payloads (non-numeric quote values, non-string symbols, ...) is walked row
+  by row instead, and the odd rows are handed to transform_api_record
+  itself, so they keep exactly the old behaviour, including which ones fail.
+- created_at for rows without a usable last_updated and ingested_at are
+  taken once per batch instead of twice per row.
+"""
+import operator
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import repeat
+from types import NoneType
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ingestion.normalize import merge_many
+from ingestion.transform import optional_float, parse_last_updated, transform_api_record, transform_csv_record
+from schemas.record import NormalizedRecord
+
+SOURCE = "coinpaprika"
+
+# Timestamps numpy parses exactly like datetime.fromisoformat. Fields are
+# range-checked here; day-of-month overflow makes numpy raise, which sends
+# the batch's timestamps down the row-by-row path.
+_FAST_TIMESTAMP = re.compile(
+    r"(?!0000)\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])"
+    r"T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\dZ",
+    re.ASCII,
+)
+_FAST_TIMESTAMPS = re.compile(
+    rf"(?:{_FAST_TIMESTAMP.pattern}\n)*{_FAST_TIMESTAMP.pattern}",
+    re.ASCII,
+)
+
+# What float() accepts exactly like the per-record path does
+_NUMBER_TYPES = {float, int, bool}
+_NULLABLE_NUMBER_TYPES = _NUMBER_TYPES | {NoneType}
+
+
+class _Irregular(Exception):
+    """Row needs the per-record transform."""
+
+
+def _number(value: Any) -> float:
+    # bool is deliberately excluded (type(True) is bool); it goes row-by-row
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise _Irregular
+
+
+def _nullable(value: Any) -> Optional[float]:
+    # Mirrors `float(value) if value else None`
+    return _number(value) if value else None
+
+
+def _masked(values: List[Optional[float]]) -> np.ma.MaskedArray:
+    mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    data = np.array([0.0 if value is None else value for value in values], dtype=np.float64)
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+def _timestamps(raw: List[Any], now: datetime) -> np.ndarray:
+    """Convert fast-path strings / datetimes / None to datetime64[us]."""
+    try:
+        return np.array([now if value is None else value for value in raw], dtype="datetime64[us]")
+    except ValueError:
+        # e.g. 2024-02-30: fromisoformat rejects it too, so created_at = now
+        fixed = [
+            (parse_last_updated(value + "Z") or now) if isinstance(value, str) else (value or now)
+            for value in raw
+        ]
+        return np.array(fixed, dtype="datetime64[us]")
+
+
+@dataclass
+class NormalizedBatch:
+    """
+    A batch of normalized records stored column by column.
+
+    Row i is (ids[i], tickers[i], names[i], price_usd[i], ...); nullable
+    numeric columns are masked arrays. ingested_at is shared by the batch.
+    """
+    ids: List[str]
+    tickers: List[str]
+    names: List[Optional[str]]
+    price_usd: np.ndarray
+    market_cap_usd: np.ma.MaskedArray
+    volume_24h_usd: np.ma.MaskedArray
+    percent_change_24h: np.ma.MaskedArray
+    sources: List[str]
+    created_at: np.ndarray
+    ingested_at: datetime
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @classmethod
+    def from_records(cls, records: List[NormalizedRecord], ingested_at: Optional[datetime] = None) -> "NormalizedBatch":
+        # One ingested_at per batch: the newest of the records', as merge_records would keep
+        if ingested_at is None:
+            ingested_at = max((record.ingested_at for record in records if record.ingested_at), default=None)
+        return cls(
+            ids=[record.id for record in records],
+            tickers=[record.ticker for record in records],
+            names=[record.name for record in records],
+            price_usd=np.array([record.price_usd for record in records], dtype=np.float64),
+            market_cap_usd=_masked([record.market_cap_usd for record in records]),
+            volume_24h_usd=_masked([record.volume_24h_usd for record in records]),
+            percent_change_24h=_masked([record.percent_change_24h for record in records]),
+            sources=[record.source for record in records],
+            created_at=np.array([record.created_at for record in records], dtype="datetime64[us]"),
+            ingested_at=ingested_at or datetime.utcnow(),
+        )
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Column-wise to row dicts (None for masked values), without building models."""
+        columns = zip(
+            self.ids,
+            self.tickers,
+            self.names,
+            self.price_usd.tolist(),
+            self.market_cap_usd.tolist(),
+            self.volume_24h_usd.tolist(),
+            self.percent_change_24h.tolist(),
+            self.sources,
+            self.created_at.tolist(),
+        )
+        return [
+            {
+                "id": row_id,
+                "ticker": ticker,
+                "name": name,
+                "price_usd": price,
+                "market_cap_usd": market_cap,
+                "volume_24h_usd": volume,
+                "percent_change_24h": percent_change,
+                "source": source,
+                "created_at": created_at,
+                "ingested_at": self.ingested_at,
+            }
+            for row_id, ticker, name, price, market_cap, volume, percent_change, source, created_at in columns
+        ]
+
+    def to_records(self) -> List[NormalizedRecord]:
+        return [NormalizedRecord(**row) for row in self.to_rows()]
+
+    def take(self, indices: List[int]) -> "NormalizedBatch":
+        """Subset of rows, in the given order."""
+        index = np.asarray(indices, dtype=np.intp)
+        return NormalizedBatch(
+            ids=[self.ids[i] for i in indices],
+            tickers=[self.tickers[i] for i in indices],
+            names=[self.names[i] for i in indices],
+            price_usd=self.price_usd[index],
+            market_cap_usd=self.market_cap_usd[index],
+            volume_24h_usd=self.volume_24h_usd[index],
+            percent_change_24h=self.percent_change_24h[index],
+            sources=[self.sources[i] for i in indices],
+            created_at=self.created_at[index],
+            ingested_at=self.ingested_at,
+        )
+
+    def concat(self, other: "NormalizedBatch") -> "NormalizedBatch":
+        return NormalizedBatch(
+            ids=self.ids + other.ids,
+            tickers=self.tickers + other.tickers,
+            names=self.names + other.names,
+            price_usd=np.concatenate([self.price_usd, other.price_usd]),
+            market_cap_usd=np.ma.concatenate([self.market_cap_usd, other.market_cap_usd]),
+            volume_24h_usd=np.ma.concatenate([self.volume_24h_usd, other.volume_24h_usd]),
+            percent_change_24h=np.ma.concatenate([self.percent_change_24h, other.percent_change_24h]),
+            sources=self.sources + other.sources,
+            created_at=np.concatenate([self.created_at, other.created_at]),
+            ingested_at=max(self.ingested_at, other.ingested_at),
+        )
+
+    def collapse(self) -> "NormalizedBatch":
+        """
+        One row per ticker, same result as merge_many.
+
+        Only tickers that actually repeat are materialized as records and
+        merged; unique rows stay columnar.
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, ticker in enumerate(self.tickers):
+            groups.setdefault(ticker, []).append(i)
+        if len(groups) == len(self.tickers):
+            return self
+
+        singles = [rows[0] for rows in groups.values() if len(rows) == 1]
+        repeated = [i for rows in groups.values() if len(rows) > 1 for i in rows]
+        merged = merge_many(self.take(repeated).to_records())
+        return self.take(singles).concat(NormalizedBatch.from_records(merged, self.ingested_at))
+
+
+@dataclass
+class BatchResult:
+    """transform_api_batch output: the batch plus the payloads that failed."""
+    batch: NormalizedBatch
+    # Indices into the input payloads, in order
+    failed: List[int]
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    return np.array(values, dtype=np.float64)
+
+
+def _nullable_column(values: List[Any]) -> np.ma.MaskedArray:
+    # `float(value) if value else None`: every falsy value is missing
+    mask = np.fromiter(map(operator.not_, values), dtype=bool, count=len(values))
+    return np.ma.MaskedArray(_float_column(values), mask=mask)
+
+
+def _created_at(stamps: List[Any], now: datetime) -> np.ndarray:
+    """Parse a column of last_updated values (None = missing)."""
+    if set(map(type, stamps)) <= {str} and _FAST_TIMESTAMPS.fullmatch("\n".join(stamps)):
+        try:
+            # U19 drops the trailing Z
+            return np.array(stamps, dtype="U19").astype("datetime64[us]")
+        except ValueError:
+            pass
+    fast = _FAST_TIMESTAMP.fullmatch
+    return _timestamps(
+        [value[:-1] if type(value) is str and fast(value) else parse_last_updated(value) for value in stamps],
+        now,
+    )
+
+
+def _transform_columns(payloads: List[Dict[str, Any]], now: datetime) -> Optional[NormalizedBatch]:
+    """
+    Whole-batch fast path: one list comprehension per field, then a type
+    check per column. Returns None if any payload needs the per-row path.
+    """
+    try:
+        quotes = [payload.get("quotes", {}).get("USD", {}) for payload in payloads]
+    except AttributeError:
+        return None
+    symbols = [payload.get("symbol", "") for payload in payloads]
+    names = [payload.get("name", "") for payload in payloads]
+    if not (
+        set(map(type, quotes)) <= {dict}
+        and set(map(type, symbols)) <= {str}
+        and set(map(type, names)) <= {str, NoneType}
+    ):
+        return None
+
+    prices = [quote.get("price", 0) for quote in quotes]
+    nullable = [
+        [quote.get(key) for quote in quotes]
+        for key in ("market_cap", "volume_24h", "percent_change_24h")
+    ]
+    if not set(map(type, prices)) <= _NUMBER_TYPES:
+        return None
+    if not all(set(map(type, column)) <= _NULLABLE_NUMBER_TYPES for column in nullable):
+        return None
+    try:
+        price_usd = _float_column(prices)
+        market_cap, volume, change = (_nullable_column(column) for column in nullable)
+    except OverflowError:
+        # int too large for a float; transform_api_record rejects the row
+        return None
+
+    # normalize_price: round(float(price), 8). np.round is not correctly
+    # rounded (it differs from round() in ~1% of prices), so round stays scalar.
+    price_usd = np.fromiter(map(round, price_usd.tolist(), repeat(8)), dtype=np.float64, count=len(payloads))
+
+    return NormalizedBatch(
+        ids=[f"coinpaprika_{payload.get('id', '')}" for payload in payloads],
+        tickers=[symbol.upper().strip() for symbol in symbols],
+        names=names,
+        price_usd=price_usd,
+        market_cap_usd=market_cap,
+        volume_24h_usd=volume,
+        percent_change_24h=change,
+        sources=[SOURCE] * len(payloads),
+        # A missing key and an explicit null both fall back to now
+        created_at=_created_at([quote.get("last_updated") for quote in quotes], now),
+        ingested_at=now,
+    )
+
+
+def _transform_rows(payloads: List[Dict[str, Any]], now: datetime) -> BatchResult:
+    """Per-row path for batches with irregular payloads."""
+    ids: List[str] = []
+    tickers: List[str] = []
+    names: List[Optional[str]] = []
+    prices: List[float] = []
+    market_caps: List[Optional[float]] = []
+    volumes: List[Optional[float]] = []
+    changes: List[Optional[float]] = []
+    # Fast-path strings (without the trailing Z), datetimes, or None for "now"
+    created: List[Any] = []
+    failed: List[int] = []
+
+    for index, payload in enumerate(payloads):
+        try:
+            symbol = payload.get("symbol", "")
+            name = payload.get("name", "")
+            usd_quote = payload.get("quotes", {}).get("USD", {})
+            if type(symbol) is not str or (name is not None and type(name) is not str) or type(usd_quote) is not dict:
+                raise _Irregular
+            price = _number(usd_quote.get("price", 0))
+            market_cap = _nullable(usd_quote.get("market_cap"))
+            volume = _nullable(usd_quote.get("volume_24h"))
+            change = _nullable(usd_quote.get("percent_change_24h"))
+        except Exception:
+            try:
+                record = transform_api_record(payload)
+            except Exception:
+                failed.append(index)
+                continue
+            ids.append(record.id)
+            tickers.append(record.ticker)
+            names.append(record.name)
+            prices.append(record.price_usd)
+            market_caps.append(record.market_cap_usd)
+            volumes.append(record.volume_24h_usd)
+            changes.append(record.percent_change_24h)
+            created.append(record.created_at)
+            continue
+
+        ids.append(f"coinpaprika_{payload.get('id', '')}")
+        tickers.append(symbol.upper().strip())
+        names.append(name)
+        prices.append(price)
+        market_caps.append(market_cap)
+        volumes.append(volume)
+        changes.append(change)
+        last_updated = usd_quote.get("last_updated")
+        if type(last_updated) is str and _FAST_TIMESTAMP.fullmatch(last_updated):
+            created.append(last_updated[:-1])
+        else:
+            created.append(parse_last_updated(last_updated))
+
+    batch = NormalizedBatch(
+        ids=ids,
+        tickers=tickers,
+        names=names,
+        price_usd=np.fromiter(map(round, prices, repeat(8)), dtype=np.float64, count=len(prices)),
+        market_cap_usd=_masked(market_caps),
+        volume_24h_usd=_masked(volumes),
+        percent_change_24h=_masked(changes),
+        sources=[SOURCE] * len(ids),
+        created_at=_timestamps(created, now),
+        ingested_at=now,
+    )
+    return BatchResult(batch=batch, failed=failed)
+
+
+def transform_api_batch(payloads: List[Dict[str, Any]]) -> BatchResult:
+    """
+    Transform a batch of CoinPaprika payloads into a NormalizedBatch.
+
+    Produces the same values as transform_api_record per payload (except the
+    created_at fallback and ingested_at, which are one timestamp per batch);
+    payloads transform_api_record would reject are reported in
+    BatchResult.failed instead of raising.
+    """
+    now = datetime.utcnow()
+    batch = _transform_columns(payloads, now)
+    if batch is not None:
+        return BatchResult(batch=batch, failed=[])
+    return _transform_rows(payloads, now)
+
+
+def _transform_csv_columns(payloads: List[Dict[str, Any]], now: datetime) -> Optional[NormalizedBatch]:
+    """Column-wise transform_csv_record; None if any row needs the per-row path."""
+    symbols = [payload.get("symbol", "") for payload in payloads]
+    names = [payload.get("name") or None for payload in payloads]
+    prices = [payload.get("price_usd", 0) for payload in payloads]
+    if not (set(map(type, symbols)) <= {str} and set(map(type, names)) <= {str, NoneType}):
+        return None
+    try:
+        # float() raising means normalize_price's 0.0 fallback: leave that to the row path
+        price_usd = np.fromiter(
+            map(round, map(float, prices), repeat(8)), dtype=np.float64, count=len(payloads)
+        )
+        market_cap, volume, change = (
+            _masked([optional_float(payload.get(key)) for payload in payloads])
+            for key in ("market_cap_usd", "volume_24h_usd", "percent_change_24h")
+        )
+    except (TypeError, ValueError, OverflowError):
+        return None
+    tickers = [symbol.upper().strip() for symbol in symbols]
+    return NormalizedBatch(
+        ids=[payload.get("external_id") or f"csv_{ticker.lower()}" for payload, ticker in zip(payloads, tickers)],
+        tickers=tickers,
+        names=names,
+        price_usd=price_usd,
+        market_cap_usd=market_cap,
+        volume_24h_usd=volume,
+        percent_change_24h=change,
+        sources=["csv"] * len(payloads),
+        created_at=_created_at([payload.get("created_at") for payload in payloads], now),
+        ingested_at=now,
+    )
+
+
+def transform_csv_batch(payloads: List[Dict[str, Any]]) -> BatchResult:
+    """
+    Transform a batch of CSV rows into a NormalizedBatch.
+
+    Same values as transform_csv_record per row (created_at fallback and
+    ingested_at aside, as for transform_api_batch). A batch with cells that
+    do not parse is transformed row by row with transform_csv_record; rows
+    it rejects are reported in BatchResult.failed instead of raising.
+    """
+    now = datetime.utcnow()
+    batch = _transform_csv_columns(payloads, now)
+    if batch is not None:
+        return BatchResult(batch=batch, failed=[])
+
+    records: List[NormalizedRecord] = []
+    failed: List[int] = []
+    for index, payload in enumerate(payloads):
+        try:
+            records.append(transform_csv_record(payload))
+        except Exception:
+            failed.append(index)
+    return BatchResult(batch=NormalizedBatch.from_records(records, now), failed=failed)
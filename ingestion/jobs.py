@@ -0,0 +1,428 @@
+"""
+Single-flight ETL execution.
+
+The ETL can be started from the API's startup hook, the scheduler,
+POST /trigger-etl and the runner CLI. All of them go through one
+JobManager, which makes sure only one run happens at a time:
+
+- In process: while a job is queued or running, every further trigger is
+  merged into it and gets the same job id back; an asyncio.Lock keeps two
+  jobs from ever executing at once.
+- Across processes (API replicas, the CLI): the run holds a database lock.
+  PostgreSQL uses a session-level advisory lock on a dedicated connection;
+  SQLite, which has none, uses a lease row in etl_locks that expires after
+  LEASE_TTL if its holder dies. A job that cannot get the lock ends as
+  "skipped" instead of waiting.
+
+Job ids are kept in memory for the last HISTORY_SIZE jobs, for
+GET /trigger-etl/{job_id}.
+
+With ETL_MODE=worker the API process never runs the ETL itself: triggers
+become rows in etl_jobs (merged into a queued or running row the same way),
+and run_worker - `python -m ingestion.runner --worker`, with its own event
+loop and connection pool - claims every queued row at once, runs one job
+through its JobManager and records the outcome on each claimed row. The
+worker also queues its own runs, timed by ingestion.schedule.
+
+While it runs a job the worker refreshes heartbeat_at on the claimed rows
+every HEARTBEAT_INTERVAL. A running row without a heartbeat for
+HEARTBEAT_TIMEOUT belongs to a worker that died: triggers no longer join it,
+and every worker poll marks it failed. A starting worker also fails the
+running rows of any other worker id, since a restart mid-run leaves them
+behind.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from services import models
+
+if TYPE_CHECKING:
+    from ingestion.schedule import AdaptiveSchedule
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key for the ETL ("ETL" in ASCII)
+ADVISORY_LOCK_KEY = 0x45544C
+LOCK_NAME = "etl"
+# Must exceed the longest ETL run; a dead holder blocks the ETL at most this long
+LEASE_TTL = timedelta(hours=1)
+HISTORY_SIZE = 100
+# Worker liveness on running etl_jobs rows
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+HEARTBEAT_TIMEOUT = timedelta(minutes=2)
+
+# Identifies this process as a lease owner
+_OWNER = uuid.uuid4().hex
+# Recorded on the etl_jobs rows a worker claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class EtlJob:
+    """One single-flight ETL run and the triggers merged into it."""
+    id: str
+    trigger: str
+    # queued -> running -> success | failure; or skipped (lock held elsewhere)
+    status: str = "queued"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Triggers that arrived while this job was in flight
+    merged: int = 0
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() + "Z",
+            "started_at": self.started_at.isoformat() + "Z" if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() + "Z" if self.finished_at else None,
+            "merged_triggers": self.merged,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_record(cls, row: models.ETLJobRecord) -> "EtlJob":
+        return cls(
+            id=row.id,
+            trigger=row.trigger,
+            status=row.status,
+            created_at=row.created_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+            merged=row.merged,
+            error=row.error,
+        )
+
+
+async def _acquire_lease(engine: AsyncEngine) -> bool:
+    now = datetime.utcnow()
+    table = models.ETLLock.__table__
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: table.create(sync_conn, checkfirst=True))
+        stmt = sqlite_insert(table).values(name=LOCK_NAME, owner=_OWNER, acquired_at=now, expires_at=now + LEASE_TTL)
+        # Take the row over only if the previous holder's lease has run out
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"owner": _OWNER, "acquired_at": now, "expires_at": now + LEASE_TTL},
+            where=table.c.expires_at < now,
+        )
+        await conn.execute(stmt)
+        owner = (await conn.execute(select(table.c.owner).where(table.c.name == LOCK_NAME))).scalar_one()
+    return owner == _OWNER
+
+
+async def _release_lease(engine: AsyncEngine) -> None:
+    table = models.ETLLock.__table__
+    async with engine.begin() as conn:
+        await conn.execute(delete(table).where(table.c.name == LOCK_NAME, table.c.owner == _OWNER))
+
+
+@asynccontextmanager
+async def etl_lock(engine: Optional[AsyncEngine] = None) -> AsyncIterator[bool]:
+    """
+    Try to take the cross-process ETL lock without waiting.
+
+    Yields:
+        True if this process holds the lock for the duration of the block.
+    """
+    if engine is None:
+        from services.db import engine
+    if engine.dialect.name == "sqlite":
+        acquired = await _acquire_lease(engine)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await _release_lease(engine)
+        return
+
+    # Session-level advisory locks belong to a connection: keep one for the
+    # whole run, in autocommit so it does not sit idle in a transaction
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        key = {"key": ADVISORY_LOCK_KEY}
+        acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), key)).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), key)
+
+
+async def _run_once() -> None:
+    # Imported here: ingestion.runner imports this module
+    from ingestion.runner import run_once
+    await run_once()
+
+
+class JobManager:
+    """Merges concurrent ETL triggers into one in-flight job."""
+
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[None]] = _run_once,
+        lock: Callable[[], AsyncContextManager[bool]] = etl_lock,
+    ):
+        self._run = run
+        self._lock = lock
+        self._running = asyncio.Lock()
+        self._current: Optional[EtlJob] = None
+        self._jobs: "OrderedDict[str, EtlJob]" = OrderedDict()
+        self._listeners: List[Callable[[EtlJob], Awaitable[None]]] = []
+
+    @property
+    def current(self) -> Optional[EtlJob]:
+        """The queued or running job, if any."""
+        return self._current
+
+    def get(self, job_id: str) -> Optional[EtlJob]:
+        return self._jobs.get(job_id)
+
+    def add_listener(self, listener: Callable[[EtlJob], Awaitable[None]]) -> None:
+        """Await listener(job) after every job that ran (success or failure: batches may have committed)."""
+        self._listeners.append(listener)
+
+    def submit(self, trigger: str) -> EtlJob:
+        """
+        Start an ETL job, or join the one already in flight.
+
+        Returns immediately; the job runs as a task on the current event loop.
+        """
+        if self._current is not None:
+            self._current.merged += 1
+            return self._current
+        job = EtlJob(id=uuid.uuid4().hex, trigger=trigger)
+        self._current = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > HISTORY_SIZE:
+            self._jobs.popitem(last=False)
+        job.task = asyncio.create_task(self._execute(job))
+        return job
+
+    async def run(self, trigger: str) -> EtlJob:
+        """submit() and wait for the job to finish; never raises the run's error."""
+        job = self.submit(trigger)
+        # Shielded: a cancelled caller (e.g. shutdown) does not cancel a shared job
+        await asyncio.shield(job.task)
+        return job
+
+    async def _execute(self, job: EtlJob) -> None:
+        try:
+            async with self._running, self._lock() as acquired:
+                if not acquired:
+                    job.status = "skipped"
+                    job.error = "ETL already running in another process"
+                    logger.info("ETL job %s skipped: %s", job.id, job.error)
+                    return
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                await self._run()
+            job.status = "success"
+        except asyncio.CancelledError:
+            job.status = "failure"
+            job.error = "cancelled"
+            raise
+        except Exception as exc:
+            job.status = "failure"
+            job.error = str(exc)
+            logger.exception("ETL job %s failed", job.id)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._current = None
+        if job.status == "skipped":
+            return
+        for listener in self._listeners:
+            try:
+                await listener(job)
+            except Exception:
+                logger.exception("ETL job %s listener failed", job.id)
+
+
+def _alive(table=models.ETLJobRecord):
+    # Running rows whose worker sent a heartbeat recently (rows from before
+    # heartbeats count from started_at)
+    return func.coalesce(table.heartbeat_at, table.started_at) >= datetime.utcnow() - HEARTBEAT_TIMEOUT
+
+
+async def enqueue_job(session: AsyncSession, trigger: str) -> EtlJob:
+    """
+    Queue an ETL job for the worker, or join the queued one or one a live worker is running.
+
+    Two API replicas racing here can both insert a row; the worker claims
+    all queued rows together, so that still costs a single run.
+    """
+    table = models.ETLJobRecord
+    row = (await session.execute(
+        select(table)
+        .where(or_(table.status == "queued", and_(table.status == "running", _alive())))
+        .order_by(table.created_at)
+        .limit(1)
+    )).scalar_one_or_none()
+    if row is not None:
+        row.merged += 1
+    else:
+        row = table(id=uuid.uuid4().hex, trigger=trigger, status="queued", created_at=datetime.utcnow(), merged=0)
+        session.add(row)
+    await session.commit()
+    return EtlJob.from_record(row)
+
+
+async def get_queued_job(session: AsyncSession, job_id: str) -> Optional[EtlJob]:
+    row = await session.get(models.ETLJobRecord, job_id)
+    return EtlJob.from_record(row) if row is not None else None
+
+
+async def claim_jobs(session: AsyncSession, worker: str = WORKER_ID) -> List[str]:
+    """Mark every queued job running on behalf of worker; returns their ids."""
+    table = models.ETLJobRecord
+    # A competing worker's UPDATE re-checks status after the row lock, so a
+    # row is claimed once
+    result = await session.execute(
+        update(table)
+        .where(table.status == "queued")
+        .values(status="running", started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow(), worker=worker)
+        .returning(table.id)
+    )
+    ids = list(result.scalars())
+    await session.commit()
+    return ids
+
+
+async def finish_jobs(session: AsyncSession, job_ids: List[str], job: EtlJob) -> None:
+    """Copy the outcome of the run that served job_ids onto their rows."""
+    table = models.ETLJobRecord
+    await session.execute(
+        update(table)
+        .where(table.id.in_(job_ids))
+        .values(status=job.status, error=job.error, finished_at=job.finished_at)
+    )
+    await session.commit()
+
+
+async def heartbeat_jobs(session: AsyncSession, job_ids: List[str]) -> None:
+    table = models.ETLJobRecord
+    await session.execute(
+        update(table).where(table.id.in_(job_ids), table.status == "running").values(heartbeat_at=datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def fail_stale_jobs(session: AsyncSession) -> int:
+    """
+    Fail running rows whose worker died: no heartbeat for HEARTBEAT_TIMEOUT.
+
+    Liveness comes from the heartbeat alone, so the runs of other live workers
+    (a second worker, or the old one during a rolling deploy) are left alone.
+    """
+    table = models.ETLJobRecord
+    result = await session.execute(
+        update(table)
+        .where(table.status == "running", ~_alive())
+        .values(status="failure", error="worker stopped", finished_at=datetime.utcnow())
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def _keep_alive(sessionmaker: async_sessionmaker, job_ids: List[str]) -> None:
+    # Runs alongside the job until cancelled
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL.total_seconds())
+        try:
+            async with sessionmaker() as session:
+                await heartbeat_jobs(session, job_ids)
+        except Exception:
+            logger.exception("ETL job heartbeat failed")
+
+
+async def run_worker(
+    sessionmaker: async_sessionmaker,
+    manager: Optional["JobManager"] = None,
+    poll_seconds: float = 5.0,
+    schedule: Optional["AdaptiveSchedule"] = None,
+    stop: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Serve etl_jobs until stop is set.
+
+    Polls for queued jobs every poll_seconds. With a schedule, also queues a
+    "scheduler" job at startup and then whenever the delay the schedule chose
+    after the last run has passed; without one, only runs what the API queues.
+    """
+    manager = manager or get_job_manager()
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    next_scheduled = loop.time()
+
+    # A restart mid-run leaves the previous worker's rows running until their heartbeat times out
+    async with sessionmaker() as session:
+        stale = await fail_stale_jobs(session)
+    if stale:
+        logger.warning("Marked %d stale ETL jobs as failed", stale)
+    logger.info("ETL worker %s started", WORKER_ID)
+
+    while not stop.is_set():
+        async with sessionmaker() as session:
+            stale = await fail_stale_jobs(session)
+        if stale:
+            logger.warning("Marked %d ETL jobs of a stopped worker as failed", stale)
+
+        if schedule is not None and loop.time() >= next_scheduled:
+            async with sessionmaker() as session:
+                queued = await enqueue_job(session, "scheduler")
+            if queued.merged and queued.status == "running":
+                # Joined a run another worker is serving: its outcome is not
+                # observed here, so come back after the current interval
+                next_scheduled = loop.time() + schedule.interval
+            else:
+                # Pushed back by the decision after the run; not due again meanwhile
+                next_scheduled = float("inf")
+
+        async with sessionmaker() as session:
+            job_ids = await claim_jobs(session)
+        if job_ids:
+            heartbeat = asyncio.create_task(_keep_alive(sessionmaker, job_ids))
+            try:
+                job = await manager.run("worker")
+            finally:
+                heartbeat.cancel()
+            async with sessionmaker() as session:
+                await finish_jobs(session, job_ids, job)
+            logger.info("ETL worker ran %d queued jobs: %s", len(job_ids), job.status)
+            if schedule is not None:
+                # API-triggered runs reset the timer too: the data is as fresh
+                next_scheduled = loop.time() + await schedule.observe(sessionmaker, job)
+            # Rows queued while the run was finishing: claim them without waiting
+            continue
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """The process-wide JobManager."""
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
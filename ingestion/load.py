@@ -0,0 +1,370 @@
+"""
+Bulk load helpers for the ETL pipeline.
+
+Writes whole batches with a single INSERT ... ON CONFLICT statement instead of
+one round trip per record. The conflict clauses mirror the merge rules in
+ingestion.normalize.merge_records so the database ends up in the same state
+as the record-at-a-time path.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Set, Union
+
+from sqlalchemy import and_, case, delete, func, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ingestion.columnar import NormalizedBatch
+from ingestion.normalize import merge_many
+from ingestion.rollups import aggregate
+from ingestion.sources.registry import DEFAULT_PRIORITY, source_priority
+from schemas.record import NormalizedRecord
+from services import models
+
+
+def _insert(session: AsyncSession):
+    """Return the dialect-specific insert() that supports ON CONFLICT."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
+
+
+def _source_priority(column):
+    """SQL equivalent of registry.priority_of(source)."""
+    return case(source_priority(), value=func.lower(column), else_=DEFAULT_PRIORITY)
+
+
+def _normalized_row(record: NormalizedRecord) -> Dict:
+    # Canonical ID: one row per ticker, same format as merge_records
+    return {
+        "id": f"merged_{record.ticker.lower()}",
+        "ticker": record.ticker,
+        "name": record.name,
+        "price_usd": record.price_usd,
+        "market_cap_usd": record.market_cap_usd,
+        "volume_24h_usd": record.volume_24h_usd,
+        "percent_change_24h": record.percent_change_24h,
+        "source": record.source,
+        "created_at": record.created_at,
+        "ingested_at": record.ingested_at or datetime.utcnow(),
+    }
+
+
+def _normalized_rows(records: Union[NormalizedBatch, Iterable[NormalizedRecord]]) -> List[Dict]:
+    # A single ON CONFLICT statement may not touch the same row twice
+    # (PostgreSQL rejects it), so duplicate tickers are merged in memory first.
+    if isinstance(records, NormalizedBatch):
+        rows = records.collapse().to_rows()
+        for row in rows:
+            row["id"] = f"merged_{row['ticker'].lower()}"
+        return rows
+    return [_normalized_row(record) for record in merge_many(records)]
+
+
+def _merge_set(stmt) -> Dict:
+    """
+    Build the DO UPDATE SET clause implementing merge_records in SQL.
+
+    - Volatile fields: the newer row (by created_at) wins; ties go to the
+      incoming row. Nullable volatile fields fall back to the other row.
+    - name: incoming name replaces the existing one when the incoming source
+      has a higher priority or the existing name is empty.
+    - ingested_at: most recent of the two.
+    """
+    current = models.NormalizedRecord.__table__.c
+    excluded = stmt.excluded
+    existing_is_newer = current.created_at > excluded.created_at
+
+    def volatile(name: str, nullable: bool = True):
+        if not nullable:
+            return case((existing_is_newer, current[name]), else_=excluded[name])
+        return case(
+            (existing_is_newer, func.coalesce(current[name], excluded[name])),
+            else_=func.coalesce(excluded[name], current[name]),
+        )
+
+    incoming_has_name = and_(excluded.name.is_not(None), excluded.name != "")
+    incoming_name_wins = or_(
+        _source_priority(current.source) > _source_priority(excluded.source),
+        current.name.is_(None),
+        current.name == "",
+    )
+
+    return {
+        "price_usd": volatile("price_usd", nullable=False),
+        "market_cap_usd": volatile("market_cap_usd"),
+        "volume_24h_usd": volatile("volume_24h_usd"),
+        "percent_change_24h": volatile("percent_change_24h"),
+        "created_at": volatile("created_at", nullable=False),
+        "source": volatile("source", nullable=False),
+        "name": case((and_(incoming_has_name, incoming_name_wins), excluded.name), else_=current.name),
+        "ingested_at": case(
+            (current.ingested_at > excluded.ingested_at, current.ingested_at),
+            else_=excluded.ingested_at,
+        ),
+    }
+
+
+async def upsert_normalized_batch(
+    session: AsyncSession,
+    records: Union[NormalizedBatch, Iterable[NormalizedRecord]],
+) -> int:
+    """
+    Upsert a batch of normalized records with one INSERT ... ON CONFLICT (ticker).
+
+    Accepts either NormalizedRecord models or a columnar NormalizedBatch from
+    ingestion.columnar.transform_api_batch (written without building models).
+
+    Rows are written in ticker order so concurrent writers acquire row locks
+    in the same order.
+
+    Returns:
+        Number of rows sent to the database (after folding duplicate tickers).
+    """
+    rows = _normalized_rows(records)
+    if not rows:
+        return 0
+    rows.sort(key=lambda row: row["ticker"])
+
+    # executemany + RETURNING lets SQLAlchemy's insertmanyvalues render one
+    # multi-row VALUES statement per batch on both asyncpg and SQLite, instead
+    # of falling back to the driver's row-by-row executemany.
+    stmt = _insert(session)(models.NormalizedRecord)
+    stmt = stmt.on_conflict_do_update(index_elements=["ticker"], set_=_merge_set(stmt))
+    stmt = stmt.returning(models.NormalizedRecord.id)
+    result = await session.execute(stmt, rows)
+    return len(result.all())
+
+
+async def upsert_watermarks(session: AsyncSession, source: str, marks: Dict[str, str]) -> int:
+    """Store per-ticker watermarks ({external_id: watermark}) for a source."""
+    if not marks:
+        return 0
+    now = datetime.utcnow()
+    rows = [
+        {"source": source, "external_id": external_id, "watermark": watermark, "updated_at": now}
+        for external_id, watermark in sorted(marks.items())
+    ]
+    table = models.TickerWatermark.__table__
+    stmt = _insert(session)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source", "external_id"],
+        set_={"watermark": stmt.excluded.watermark, "updated_at": stmt.excluded.updated_at},
+    )
+    result = await session.execute(stmt.returning(table.c.external_id), rows)
+    return len(result.all())
+
+
+# Months whose price_history partition exists (created here and committed)
+_history_partitions: Set[date] = set()
+# session.info key: months created in the session's open transaction
+_PENDING_PARTITIONS = "price_history_partitions"
+
+
+def _month(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+async def ensure_history_partitions(session: AsyncSession, timestamps: Iterable[datetime]) -> None:
+    """
+    Create the monthly price_history partitions covering timestamps (PostgreSQL only).
+
+    The CREATE TABLEs run under a transaction-level advisory lock, so
+    concurrent writers wait for each other's partitions to commit instead of
+    racing. A month is only skipped from then on once the caller reports
+    the commit with history_partitions_committed(): a rolled-back CREATE is
+    retried by the next batch.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    missing = sorted({_month(ts) for ts in timestamps} - _history_partitions)
+    if not missing:
+        return
+    await session.execute(text("SELECT pg_advisory_xact_lock(hashtext('price_history_partitions'))"))
+    for month in missing:
+        await session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS price_history_{month:%Y_%m} PARTITION OF price_history "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+    session.info.setdefault(_PENDING_PARTITIONS, set()).update(missing)
+
+
+def history_partitions_committed(session: AsyncSession) -> None:
+    """Call after session's transaction committed: its new partitions are known to exist."""
+    _history_partitions.update(session.info.pop(_PENDING_PARTITIONS, ()))
+
+
+async def append_price_history(
+    session: AsyncSession,
+    records: Union[NormalizedBatch, Iterable[NormalizedRecord]],
+) -> List[Dict[str, Any]]:
+    """
+    Append normalized quotes to price_history, keyed by (ticker, created_at, source).
+
+    Quotes already recorded are skipped (ON CONFLICT DO NOTHING), so re-running
+    a batch is safe.
+
+    Returns:
+        The rows actually inserted (price_history columns), for rollups that
+        must count each quote once.
+    """
+    if isinstance(records, NormalizedBatch):
+        normalized = records.to_rows()
+    else:
+        normalized = [_normalized_row(record) for record in records]
+    if not normalized:
+        return []
+    rows = sorted(
+        (
+            {
+                "ticker": row["ticker"],
+                "ts": row["created_at"],
+                "source": row["source"],
+                "price_usd": row["price_usd"],
+                "market_cap_usd": row["market_cap_usd"],
+                "volume_24h_usd": row["volume_24h_usd"],
+                "percent_change_24h": row["percent_change_24h"],
+            }
+            for row in normalized
+        ),
+        key=lambda row: (row["ticker"], row["ts"]),
+    )
+    await ensure_history_partitions(session, (row["ts"] for row in rows))
+
+    table = models.PriceHistory.__table__
+    stmt = _insert(session)(table).on_conflict_do_nothing(index_elements=["ticker", "ts", "source"])
+    # RETURNING reports which rows were new (and gives insertmanyvalues batching)
+    result = await session.execute(stmt.returning(*table.c), rows)
+    return [dict(row) for row in result.mappings()]
+
+
+async def upsert_ohlcv(session: AsyncSession, history_rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Fold newly appended price_history rows into ohlcv_rollups.
+
+    Pass only rows that were actually inserted (append_price_history's
+    return value): samples is additive, so a quote must be counted once.
+    high/low/open/close are merged with the stored bucket in SQL, one
+    statement for every bucket the rows touch.
+
+    Returns:
+        Number of buckets written.
+    """
+    rows = aggregate(history_rows)
+    if not rows:
+        return 0
+    current = models.OHLCVRollup.__table__.c
+    stmt = _insert(session)(models.OHLCVRollup)
+    excluded = stmt.excluded
+    incoming_opens = excluded.open_ts < current.open_ts
+    incoming_closes = excluded.close_ts >= current.close_ts
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["ticker", "interval", "bucket"],
+        set_={
+            "open": case((incoming_opens, excluded.open), else_=current.open),
+            "open_ts": case((incoming_opens, excluded.open_ts), else_=current.open_ts),
+            "high": case((excluded.high > current.high, excluded.high), else_=current.high),
+            "low": case((excluded.low < current.low, excluded.low), else_=current.low),
+            "close": case((incoming_closes, excluded.close), else_=current.close),
+            "close_ts": case((incoming_closes, excluded.close_ts), else_=current.close_ts),
+            "volume": case(
+                (incoming_closes, func.coalesce(excluded.volume, current.volume)),
+                else_=func.coalesce(current.volume, excluded.volume),
+            ),
+            "samples": current.samples + excluded.samples,
+        },
+    )
+    result = await session.execute(stmt.returning(current.bucket), rows)
+    return len(result.all())
+
+
+# price_history rows read per chunk by rebuild_ohlcv
+REBUILD_CHUNK_ROWS = 10000
+
+
+async def rebuild_ohlcv(session: AsyncSession, tickers: Iterable[str]) -> int:
+    """
+    Recompute the tickers' ohlcv_rollups from the rows left in price_history.
+
+    For deletes from price_history, which upsert_ohlcv cannot undo (samples
+    only adds up): each ticker's buckets are dropped and its remaining quotes
+    folded back in, REBUILD_CHUNK_ROWS at a time in (ts, source) order.
+
+    Returns:
+        Number of price_history rows folded back in.
+    """
+    history = models.PriceHistory.__table__.c
+    columns = (history.ticker, history.ts, history.source, history.price_usd, history.volume_24h_usd)
+    folded = 0
+    for ticker in sorted(set(tickers)):
+        await session.execute(delete(models.OHLCVRollup).where(models.OHLCVRollup.ticker == ticker))
+        last = None
+        while True:
+            query = select(*columns).where(history.ticker == ticker)
+            if last is not None:
+                query = query.where(tuple_(history.ts, history.source) > last)
+            result = await session.execute(query.order_by(history.ts, history.source).limit(REBUILD_CHUNK_ROWS))
+            rows = result.mappings().all()
+            if not rows:
+                break
+            await upsert_ohlcv(session, rows)
+            folded += len(rows)
+            last = (rows[-1]["ts"], rows[-1]["source"])
+    return folded
+
+
+class RawRecordWriter:
+    """
+    Buffers raw payloads and archives them in bulk to model's table
+    (raw_api_records by default).
+
+    PostgreSQL gets one multi-row INSERT ... VALUES ... ON CONFLICT DO NOTHING
+    per flush; SQLite falls back to a driver executemany of the same statement.
+    Payloads whose external_id is already archived are skipped, as before.
+    """
+
+    def __init__(self, session: AsyncSession, batch_size: int = 500, model: type = models.RawAPIRecord):
+        self.session = session
+        self.batch_size = max(1, batch_size)
+        self.model = model
+        self.written = 0
+        self._buffer: List[Dict[str, Any]] = []
+
+    async def add(self, payload: Dict[str, Any]) -> None:
+        """Queue a payload, flushing once the buffer reaches batch_size."""
+        await self.add_serialized(payload["external_id"], str(payload))  # Store as string
+
+    async def add_serialized(self, external_id: str, payload: str) -> None:
+        """Queue a payload already converted to its archived text form."""
+        self._buffer.append({
+            "external_id": external_id,
+            "payload": payload,
+            "ingested_at": datetime.utcnow(),
+        })
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write buffered payloads. Returns the number of rows inserted."""
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+
+        table = self.model.__table__
+        stmt = _insert(self.session)(table).on_conflict_do_nothing(
+            index_elements=["external_id"]
+        )
+        if self.session.get_bind().dialect.name == "sqlite":
+            result = await self.session.execute(stmt, rows)
+            inserted = max(result.rowcount, 0)
+        else:
+            # RETURNING switches SQLAlchemy to insertmanyvalues: one multi-row
+            # VALUES statement instead of asyncpg's per-row executemany.
+            result = await self.session.execute(stmt.returning(table.c.id), rows)
+            inserted = len(result.all())
+        self.written += inserted
+        return inserted
@@ -1,12 +1,13 @@
 """
 Normalization module for merging cryptocurrency data.
 
-This module implements intelligent field merging designed for CoinPaprika as the
-primary source. It remains generic enough to merge future sources if added,
-but current deployment uses CoinPaprika only.
+This module implements intelligent field merging across sources. Source
+priorities for canonical fields come from the source registry
+(ingestion.sources.registry): lower number wins, unknown sources get 99.
 """
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
+from ingestion.sources.registry import priority_of
 from schemas.record import NormalizedRecord
 
 
@@ -37,14 +38,9 @@ def merge_records(existing: Optional[NormalizedRecord], incoming: NormalizedReco
         # First record for this ticker - use incoming as-is
         return incoming
     
-    # Source priority for canonical fields (name) — CoinPaprika only at present
-    SOURCE_PRIORITY = {
-      "coinpaprika": 1,
-    }
-    
     # Determine which source has higher priority
-    existing_priority = SOURCE_PRIORITY.get(existing.source.lower(), 99)
-    incoming_priority = SOURCE_PRIORITY.get(incoming.source.lower(), 99)
+    existing_priority = priority_of(existing.source)
+    incoming_priority = priority_of(incoming.source)
     
     # Merge strategy: Use most recent for volatile fields (prices, market data)
     # Compare timestamps to determine which is more recent
@@ -102,4 +98,21 @@ def merge_records(existing: Optional[NormalizedRecord], incoming: NormalizedReco
     )
 
 
+def merge_many(records: Iterable[NormalizedRecord]) -> List[NormalizedRecord]:
+    """
+    Fold a batch down to one record per ticker using merge_records.
+
+    Records are merged in the order given, exactly as if they had been
+    upserted one at a time, so only the survivors need to reach the database.
+    Tickers keep the order of their first appearance.
 
+    Args:
+        records: Normalized records, possibly with repeated tickers
+
+    Returns:
+        One merged NormalizedRecord per distinct ticker
+    """
+    merged: Dict[str, NormalizedRecord] = {}
+    for record in records:
+        merged[record.ticker] = merge_records(merged.get(record.ticker), record)
+    return list(merged.values())
@@ -0,0 +1,85 @@
+"""
+Process-pool transform stage for the ETL pipeline.
+
+With TRANSFORM_PROCESSES > 0 the runner streams the undecoded bytes of each
+ticker element and hands every batch to a worker process. The worker does the
+CPU-bound part - json.loads, watermark hashing, the raw-archive text and
+transform_api_batch - and sends back a RawChunkResult: a few string lists
+plus the NumPy columns of a NormalizedBatch, which pickle compactly. The
+event loop that also serves /data is left with watermark filtering and the
+database writes.
+"""
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from ingestion.columnar import NormalizedBatch, transform_api_batch
+from ingestion.sources.api_source import _with_external_id
+from ingestion.watermarks import payload_watermark
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class RawChunkResult:
+    """Everything the parent needs from one transformed chunk, per input element."""
+    external_ids: List[str]
+    watermarks: List[str]
+    # str(payload), the form RawRecordWriter archives
+    archived: List[str]
+    # One row per element not listed in failed, in input order
+    batch: NormalizedBatch
+    failed: List[int]
+
+    def __len__(self) -> int:
+        return len(self.external_ids)
+
+
+def transform_raw_chunk(elements: List[bytes]) -> RawChunkResult:
+    """Decode and transform a chunk of raw /v1/tickers elements (runs in a worker)."""
+    payloads = [_with_external_id(json.loads(element)) for element in elements]
+    result = transform_api_batch(payloads)
+    return RawChunkResult(
+        external_ids=[payload["external_id"] for payload in payloads],
+        watermarks=[payload_watermark(payload) for payload in payloads],
+        archived=[str(payload) for payload in payloads],
+        batch=result.batch,
+        failed=result.failed,
+    )
+
+
+def transform_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Worker pool for transform_raw_chunk.
+
+    Uses spawn rather than fork: the parent runs an event loop, the
+    scheduler's threads and open database connections, none of which are
+    safe to copy into a child.
+    """
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def get_transform_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Process-wide transform pool, created on first use (and again after close).
+
+    Spawning workers re-imports the ingestion modules in each of them, so the
+    pool is kept across ETL runs rather than started for every run. A pool
+    left broken by a crashed worker is replaced.
+    """
+    global _pool
+    if _pool is None or _pool._broken:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = transform_pool(processes)
+    return _pool
+
+
+def close_transform_pool() -> None:
+    """Shut down the shared pool; safe to call when none was created."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
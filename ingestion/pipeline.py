@@ -0,0 +1,146 @@
+"""
+Bounded-queue asyncio pipeline used by the ETL runner.
+
+    producer (fetch/parse) -> [queue] -> transform workers -> [queue] -> write workers
+
+Stages are joined by asyncio.Queue(maxsize=queue_size), so a slow writer
+applies backpressure all the way to the HTTP stream instead of letting
+parsed batches pile up in memory. Each stage records how long it spent
+working and how full its input queue was, which tells us where the
+bottleneck is.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+_DONE = object()
+
+
+def _size(item: Any) -> int:
+    try:
+        return len(item)
+    except TypeError:
+        return 1
+
+
+@dataclass
+class StageStats:
+    """Throughput and input-queue depth for one pipeline stage."""
+    name: str
+    concurrency: int
+    batches: int = 0
+    records: int = 0
+    busy_seconds: float = 0.0
+    queue_samples: List[int] = field(default_factory=list)
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        capacity = elapsed * self.concurrency
+        return {
+            "concurrency": self.concurrency,
+            "batches": self.batches,
+            "records": self.records,
+            "busy_s": round(self.busy_seconds, 4),
+            # Records per second of busy time: what the stage could sustain alone
+            "records_per_s": round(self.records / self.busy_seconds, 1) if self.busy_seconds else None,
+            # Share of wall time the stage's workers were busy; highest = bottleneck
+            "utilization": round(self.busy_seconds / capacity, 3) if capacity else None,
+            "queue_depth_max": max(self.queue_samples, default=0),
+            "queue_depth_avg": round(sum(self.queue_samples) / len(self.queue_samples), 2) if self.queue_samples else 0,
+        }
+
+
+async def run_pipeline(
+    source: AsyncIterator[Any],
+    transform: Callable[[Any], Awaitable[Any]],
+    write: Callable[[Any], Awaitable[None]],
+    *,
+    queue_size: int = 4,
+    transform_concurrency: int = 1,
+    write_concurrency: int = 1,
+) -> Dict[str, Any]:
+    """
+    Drive batches from source through transform and write.
+
+    Args:
+        source: Async iterator of batches (the fetch/parse stage).
+        transform: Coroutine turning one source batch into one write batch.
+        write: Coroutine persisting one write batch.
+        queue_size: Max batches waiting between two stages.
+        transform_concurrency: Number of transform workers.
+        write_concurrency: Number of write workers.
+
+    Returns:
+        Per-stage stats (see StageStats.as_dict) plus total elapsed time and
+        the name of the busiest stage.
+
+    Raises:
+        The first exception raised by any stage; the other stages are cancelled.
+    """
+    transform_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    fetch_stats = StageStats("fetch", 1)
+    transform_stats = StageStats("transform", max(1, transform_concurrency))
+    write_stats = StageStats("write", max(1, write_concurrency))
+    transformers_left = transform_stats.concurrency
+
+    async def put(queue: asyncio.Queue, stats: StageStats, item: Any) -> None:
+        await queue.put(item)
+        stats.queue_samples.append(queue.qsize())
+
+    async def produce() -> None:
+        iterator = source.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                fetch_stats.busy_seconds += time.perf_counter() - started
+            fetch_stats.batches += 1
+            fetch_stats.records += _size(batch)
+            await put(transform_queue, transform_stats, batch)
+        for _ in range(transform_stats.concurrency):
+            await transform_queue.put(_DONE)
+
+    async def transform_worker() -> None:
+        nonlocal transformers_left
+        while (batch := await transform_queue.get()) is not _DONE:
+            started = time.perf_counter()
+            result = await transform(batch)
+            transform_stats.busy_seconds += time.perf_counter() - started
+            transform_stats.batches += 1
+            transform_stats.records += _size(batch)
+            await put(write_queue, write_stats, result)
+        transformers_left -= 1
+        if transformers_left == 0:
+            for _ in range(write_stats.concurrency):
+                await write_queue.put(_DONE)
+
+    async def write_worker() -> None:
+        while (batch := await write_queue.get()) is not _DONE:
+            started = time.perf_counter()
+            await write(batch)
+            write_stats.busy_seconds += time.perf_counter() - started
+            write_stats.batches += 1
+            write_stats.records += _size(batch)
+
+    started = time.perf_counter()
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(produce())
+            for _ in range(transform_stats.concurrency):
+                group.create_task(transform_worker())
+            for _ in range(write_stats.concurrency):
+                group.create_task(write_worker())
+    except BaseExceptionGroup as group_error:
+        raise group_error.exceptions[0]
+    elapsed = time.perf_counter() - started
+
+    stages = {stats.name: stats.as_dict(elapsed) for stats in (fetch_stats, transform_stats, write_stats)}
+    return {
+        "elapsed_s": round(elapsed, 4),
+        "bottleneck": max(stages, key=lambda name: stages[name]["utilization"] or 0),
+        "stages": stages,
+    }
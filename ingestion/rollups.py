@@ -0,0 +1,61 @@
+"""
+OHLCV rollups of price_history, maintained at ingest time.
+
+Each write batch folds the quotes it newly appended to price_history into
+per-ticker open/high/low/close/volume buckets at 1m, 1h and 1d, and
+ingestion.load.upsert_ohlcv merges those partial buckets into
+ohlcv_rollups. Only the buckets a batch touches are written, so the cost
+of keeping rollups current depends on the batch, not on how much history
+exists, and chart reads never have to scan raw quotes.
+
+The merge is order-independent: open/close are picked by quote time, so
+batches may arrive in any order (e.g. concurrent write workers).
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+ROLLUP_INTERVALS: Dict[str, Callable[[datetime], datetime]] = {
+    "1m": lambda ts: ts.replace(second=0, microsecond=0),
+    "1h": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "1d": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+def aggregate(history_rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Partial OHLCV buckets for a set of price_history rows.
+
+    Returns:
+        One ohlcv_rollups row per (ticker, interval, bucket), sorted by that key.
+    """
+    buckets: Dict[Tuple[str, str, datetime], Dict[str, Any]] = {}
+    for row in history_rows:
+        ts, price = row["ts"], row["price_usd"]
+        for interval, floor in ROLLUP_INTERVALS.items():
+            key = (row["ticker"], interval, floor(ts))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "ticker": key[0],
+                    "interval": interval,
+                    "bucket": key[2],
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "volume": row["volume_24h_usd"],
+                    "open_ts": ts,
+                    "close_ts": ts,
+                    "samples": 1,
+                }
+                continue
+            if ts < bucket["open_ts"]:
+                bucket["open"], bucket["open_ts"] = price, ts
+            if ts >= bucket["close_ts"]:
+                bucket["close"], bucket["close_ts"] = price, ts
+                if row["volume_24h_usd"] is not None:
+                    bucket["volume"] = row["volume_24h_usd"]
+            bucket["high"] = max(bucket["high"], price)
+            bucket["low"] = min(bucket["low"], price)
+            bucket["samples"] += 1
+    return [buckets[key] for key in sorted(buckets)]
@@ -1,20 +1,36 @@
 import argparse
 import asyncio
+import json
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.config import get_settings
 from core.logger import configure_logging
-from ingestion.sources.api_source import fetch_api_records
-from ingestion.transform import transform_api_record
-from ingestion.normalize import merge_records
-from schemas.record import NormalizedRecord
-from services import models
-from services.db import get_session, init_db
+from ingestion.sources.base import FetchContext, Source
+from ingestion.sources.http_client import CacheValidators, NotModified, close_http_client, get_http_client
+from ingestion.sources.registry import get_sources
+from ingestion.columnar import NormalizedBatch
+from ingestion.jobs import EtlJob, get_job_manager, run_worker
+from ingestion.load import (
+    RawRecordWriter,
+    append_price_history,
+    history_partitions_committed,
+    upsert_normalized_batch,
+    upsert_ohlcv,
+    upsert_watermarks,
+)
+from ingestion.parallel import RawChunkResult, close_transform_pool, get_transform_pool
+from ingestion.pipeline import run_pipeline
+from ingestion.schedule import load_schedule, run_adaptive
+from ingestion.watermarks import HASH_PREFIX, WatermarkCache, get_watermark_cache
+from services import cache, models
+from services.db import AsyncSessionLocal, init_db, init_db_with_retry
 
 logger = logging.getLogger(__name__)
 configure_logging()
@@ -33,10 +49,18 @@ async def _get_checkpoint(session: AsyncSession, source: str) -> models.ETLCheck
     return checkpoint
 
 
-async def _update_checkpoint(session: AsyncSession, source: str, last_id: Optional[str]) -> None:
+async def _update_checkpoint(
+    session: AsyncSession,
+    source: str,
+    last_id: Optional[str],
+    validators: Optional[CacheValidators] = None,
+) -> None:
     checkpoint = await _get_checkpoint(session, source)
     checkpoint.last_id = last_id
     checkpoint.last_timestamp = datetime.utcnow()
+    if validators is not None:
+        checkpoint.etag = validators.etag
+        checkpoint.last_modified = validators.last_modified
     await session.flush()
 
 
@@ -63,7 +87,15 @@ async def _record_run(
     return run
 
 
-async def _finalize_run(session: AsyncSession, run: models.ETLRun, status: str, processed: int, failed: int, message: Optional[str] = None) -> None:
+async def _finalize_run(
+    session: AsyncSession,
+    run: models.ETLRun,
+    status: str,
+    processed: int,
+    failed: int,
+    message: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> None:
     run.status = status
     run.processed = processed
     run.failed = failed
@@ -71,146 +103,320 @@ async def _finalize_run(session: AsyncSession, run: models.ETLRun, status: str,
     if run.started_at:
         run.duration_ms = int((run.finished_at - run.started_at).total_seconds() * 1000)
     run.message = message
+    if stats is not None:
+        run.stats = json.dumps(stats)
     await session.flush()
 
 
-async def _upsert_normalized(session: AsyncSession, record: NormalizedRecord) -> None:
-    """
-    Upsert normalized record using best-practice merging strategy with improved concurrency safety.
-    
-    Merge Strategy:
-    - Find existing record by ticker (if any) using FOR UPDATE lock for safety
-    - Merge intelligently: most recent for volatile fields, canonical source for static fields
-    - Preserve one record per ticker with enriched data from all sources
-    
-    Concurrency Safety:
-    - Uses database-level locking (FOR UPDATE) to prevent race conditions
-    - Transaction-scoped: All operations happen atomically within the session
-    - Canonical ID ensures idempotent updates even with concurrent requests
-    - For production systems with high concurrency, consider moving merge logic to a database trigger
-    """
-    from sqlalchemy import select, delete
-    
-    # Find existing record by ticker using FOR UPDATE lock for safe concurrent access
-    # This prevents other transactions from modifying the same record while we're updating it
-    result = await session.execute(
-        select(models.NormalizedRecord)
-        .where(models.NormalizedRecord.ticker == record.ticker)
-        .with_for_update()  # Row-level lock: prevents other transactions from modifying this record
+@dataclass
+class _TransformedBatch:
+    """Output of the transform stage: raw payloads to archive plus their normalized records."""
+    # (external_id, archived payload text) for every changed payload
+    archive: List[Tuple[str, str]] = field(default_factory=list)
+    # One row per ticker, for normalized_records
+    records: NormalizedBatch = field(default_factory=lambda: NormalizedBatch.from_records([]))
+    # Every transformed quote before collapsing, for price_history and the rollups
+    history: NormalizedBatch = field(default_factory=lambda: NormalizedBatch.from_records([]))
+    # external_id -> watermark for records that transformed successfully
+    watermarks: Dict[str, str] = field(default_factory=dict)
+    failed: int = 0
+    skipped: int = 0
+    # Records folded into another record with the same ticker
+    collapsed: int = 0
+    # File sources: ETLCheckpoint.last_offset once this batch is committed
+    offset: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.archive)
+
+
+def _log_failed(source: Source, external_ids: List[str]) -> None:
+    if external_ids:
+        logger.error("%s: %s records failed validation: %s", source.name, len(external_ids), external_ids)
+
+
+def _transform_batch(source: Source, payloads: List[Dict[str, Any]], watermarks: WatermarkCache) -> _TransformedBatch:
+    # Unchanged payloads are dropped here, before transform and any DB write
+    if source.use_watermarks:
+        changed, skipped = watermarks.filter(payloads, source.watermark)
+    else:
+        changed, skipped = [(payload, None) for payload in payloads], 0
+    result = source.transform([payload for payload, _ in changed])
+    batch = _TransformedBatch(
+        archive=[(payload["external_id"], str(payload)) for payload, _ in changed],
+        failed=len(result.failed),
+        skipped=skipped,
+        offset=getattr(payloads, "end_offset", None),
     )
-    existing_db_record = result.scalar_one_or_none()
-    
-    # Convert existing DB record to Pydantic model if exists
-    existing_record = None
-    if existing_db_record:
-        existing_record = NormalizedRecord(
-            id=existing_db_record.id,
-            ticker=existing_db_record.ticker,
-            name=existing_db_record.name,
-            price_usd=existing_db_record.price_usd,
-            market_cap_usd=existing_db_record.market_cap_usd,
-            volume_24h_usd=existing_db_record.volume_24h_usd,
-            percent_change_24h=existing_db_record.percent_change_24h,
-            source=existing_db_record.source,
-            created_at=existing_db_record.created_at,
-            ingested_at=existing_db_record.ingested_at,
-        )
-    
-    # Merge records using intelligent strategy
-    merged_record = merge_records(existing_record, record)
-    
-    # Use canonical ID format: merged_{ticker} to ensure one record per ticker
-    # This ID is deterministic - same ticker always gets same ID
-    merged_id = f"merged_{merged_record.ticker.lower()}"
-    
-    # Delete existing record if it exists (we're replacing it with the merged version)
-    # This happens within the transaction, and the FOR UPDATE lock ensures no conflicts
-    if existing_db_record:
-        await session.delete(existing_db_record)
-        await session.flush()
-    
-    # Insert merged record
-    new_record = models.NormalizedRecord(
-        id=merged_id,
-        ticker=merged_record.ticker,
-        name=merged_record.name,
-        price_usd=merged_record.price_usd,
-        market_cap_usd=merged_record.market_cap_usd,
-        volume_24h_usd=merged_record.volume_24h_usd,
-        percent_change_24h=merged_record.percent_change_24h,
-        source=merged_record.source,  # Primary source after merge
-        created_at=merged_record.created_at,
-        ingested_at=merged_record.ingested_at or datetime.utcnow(),
+    _log_failed(source, [changed[i][0]["external_id"] for i in result.failed])
+    failed = set(result.failed)
+    if source.use_watermarks:
+        batch.watermarks = {
+            payload["external_id"]: watermark
+            for i, (payload, watermark) in enumerate(changed)
+            if i not in failed
+        }
+
+    # Coins sharing a symbol map to the same ticker; only one row per ticker is
+    # written to normalized_records, but history keeps every quote
+    batch.history = result.batch
+    batch.records = result.batch.collapse()
+    batch.collapsed = len(result.batch) - len(batch.records)
+    return batch
+
+
+def _filter_chunk(source: Source, chunk: RawChunkResult, watermarks: WatermarkCache) -> _TransformedBatch:
+    # Process-pool mode: the worker has already transformed everything, so
+    # unchanged payloads are dropped after transform but still before any DB write
+    failed = set(chunk.failed)
+    rows = [i for i in range(len(chunk)) if i not in failed]
+    changed = {
+        i for i, (external_id, watermark) in enumerate(zip(chunk.external_ids, chunk.watermarks))
+        if watermarks.changed(external_id, watermark)
+    }
+    batch = _TransformedBatch(
+        archive=[(chunk.external_ids[i], chunk.archived[i]) for i in sorted(changed)],
+        failed=len(failed & changed),
+        skipped=len(chunk) - len(changed),
     )
-    session.add(new_record)
-    await session.flush()
-    
-    # NOTE: For even higher concurrency safety in a distributed system:
-    # 1. Consider implementing a database trigger that performs the merge logic
-    # 2. Or use PostgreSQL's ON CONFLICT clause with a custom conflict resolution function
-    # 3. Example: INSERT INTO ... ON CONFLICT (ticker) DO UPDATE SET ...
-    # The current approach is safe for typical single-server deployments and handles
-    # concurrent requests within a single database instance correctly.
+    _log_failed(source, [chunk.external_ids[i] for i in sorted(failed & changed)])
+    keep = [row for row, i in enumerate(rows) if i in changed]
+    batch.watermarks = {chunk.external_ids[rows[row]]: chunk.watermarks[rows[row]] for row in keep}
+
+    records = chunk.batch.take(keep)
+    batch.history = records
+    batch.records = records.collapse()
+    batch.collapsed = len(records) - len(batch.records)
+    return batch
+
+
+async def _write_batch(source: Source, batch: _TransformedBatch, watermarks: WatermarkCache) -> None:
+    # Each write worker uses its own session so batches can be written concurrently
+    async with AsyncSessionLocal() as session:
+        raw_writer = RawRecordWriter(session, batch_size=settings.raw_batch_size, model=source.archive_model)
+        for external_id, payload in batch.archive:
+            await raw_writer.add_serialized(external_id, payload)
+        await raw_writer.flush()
+        await upsert_normalized_batch(session, batch.records)
+        # Rollups only count quotes that are new to price_history
+        await upsert_ohlcv(session, await append_price_history(session, batch.history))
+        await upsert_watermarks(session, watermarks.source, batch.watermarks)
+        if batch.offset is not None:
+            # Committed together with the rows, so a restart resumes after them
+            checkpoint = await _get_checkpoint(session, source.name)
+            checkpoint.last_offset = batch.offset
+        await session.commit()
+        # Only committed partitions and watermarks go into the caches
+        history_partitions_committed(session)
+    watermarks.update(batch.watermarks)
 
 
-async def _ingest_api(session: AsyncSession) -> None:
-    checkpoint = await _get_checkpoint(session, "coinpaprika")
+def _failure_stats(exc: Exception) -> Optional[Dict[str, Any]]:
+    # A 429 is recorded for the adaptive schedule (ingestion.schedule) to back off on
+    if not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code != 429:
+        return None
+    retry_after = exc.response.headers.get("Retry-After", "")
+    return {"rate_limited": True, "retry_after": float(retry_after) if retry_after.isdigit() else None}
+
+
+async def _ingest_source(
+    session: AsyncSession,
+    source: Source,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> None:
+    """
+    Run one source through the fetch -> transform -> write pipeline.
+
+    Args:
+        session: Session for the source's ETLCheckpoint / ETLRun rows.
+        source: Registered source to ingest.
+        pool: Process pool for the transform stage (TRANSFORM_PROCESSES);
+              ignored for sources without transform_raw.
+    """
+    checkpoint = await _get_checkpoint(session, source.name)
     last_id = checkpoint.last_id
-    run = await _record_run(session, "coinpaprika", status="running")
+    # Sent as If-None-Match / If-Modified-Since; replaced by the new response's
+    # values, which are only stored once the run succeeds
+    validators = CacheValidators(checkpoint.etag, checkpoint.last_modified)
+    watermarks = await get_watermark_cache(source.name).load(session)
+    run = await _record_run(session, source.name, status="running")
+    # Commit the running row up front: batches are committed by the pipeline's
+    # write workers, and the run is visible in etl_runs while it is in progress
+    await session.commit()
+
+    processed = failed = skipped = collapsed = 0
+    # Checkpoint = newest timestamp watermark written so far
+    latest_seen = last_id
 
+    if source.transform_raw is None:
+        pool = None
+    transform_concurrency = source.transform_concurrency or settings.transform_concurrency
+    if pool is not None:
+        # Enough in-flight chunks to keep every worker process busy
+        transform_concurrency = max(transform_concurrency, settings.transform_processes)
+    write_concurrency = source.write_concurrency or settings.write_concurrency
+    if AsyncSessionLocal.kw["bind"].dialect.name == "sqlite":
+        # SQLite runs one write transaction at a time anyway, and an in-memory
+        # database shares a single connection between all sessions
+        write_concurrency = 1
+
+    async def transform(chunk: List[Any]) -> _TransformedBatch:
+        nonlocal failed, skipped, collapsed
+        if pool is None:
+            batch = _transform_batch(source, chunk, watermarks)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(pool, source.transform_raw, chunk)
+            batch = _filter_chunk(source, result, watermarks)
+        failed += batch.failed
+        skipped += batch.skipped
+        collapsed += batch.collapsed
+        return batch
+
+    async def write(batch: _TransformedBatch) -> None:
+        nonlocal processed, latest_seen
+        await _write_batch(source, batch, watermarks)
+        processed += len(batch.records) + batch.collapsed
+        for watermark in batch.watermarks.values():
+            if not watermark.startswith(HASH_PREFIX):
+                latest_seen = max(latest_seen or watermark, watermark)
+
+    context = FetchContext(
+        batch_size=settings.upsert_batch_size,
+        last_id=last_id,
+        validators=validators,
+        client=get_http_client(),
+        raw=pool is not None,
+        last_offset=checkpoint.last_offset,
+    )
     try:
-        raw_payloads = await fetch_api_records(settings.api_source_key, last_id=last_id)
-        processed = failed = 0
-        latest_seen = last_id
-
-        for payload in raw_payloads:
-            try:
-                stmt = pg_insert(models.RawAPIRecord).values(
-                    external_id=payload["external_id"],
-                    payload=str(payload),  # Store as string
-                ).on_conflict_do_nothing(index_elements=["external_id"])
-                await session.execute(stmt)
-
-                normalized = transform_api_record(payload)
-                await _upsert_normalized(session, normalized)
-                processed += 1
-                latest_seen = max(latest_seen or normalized.id, normalized.id)
-            except Exception as exc:
-                logger.exception("API record failed validation/insert")
-                failed += 1
-
-        await _update_checkpoint(session, "coinpaprika", latest_seen)
-        await _finalize_run(session, run, status="success", processed=processed, failed=failed)
+        stats = await run_pipeline(
+            source.fetch(context),
+            transform,
+            write,
+            queue_size=settings.pipeline_queue_size,
+            transform_concurrency=transform_concurrency,
+            write_concurrency=write_concurrency,
+        )
+        stats["records"] = {"processed": processed, "failed": failed, "skipped": skipped, "collapsed": collapsed}
+        stats["records_per_s"] = round(processed / stats["elapsed_s"], 1) if stats["elapsed_s"] else 0.0
+        logger.info(
+            "%s run: %s processed (%s rows/s), %s skipped (unchanged), %s collapsed (duplicate ticker), %s failed, "
+            "bottleneck=%s",
+            source.name, processed, stats["records_per_s"], skipped, collapsed, failed, stats["bottleneck"],
+        )
+
+        await _update_checkpoint(session, source.name, latest_seen, validators)
+        await _finalize_run(session, run, status="success", processed=processed, failed=failed, stats=stats)
+    except NotModified:
+        # 304: nothing upstream changed since the last successful run
+        logger.info("%s run: upstream not modified, skipping", source.name)
+        await _finalize_run(
+            session, run, status="success", processed=0, failed=0,
+            message="Upstream not modified (HTTP 304)", stats={"not_modified": True},
+        )
     except Exception as exc:
-        await _finalize_run(session, run, status="failure", processed=0, failed=1, message=str(exc))
+        await session.rollback()
+        await session.refresh(run)
+        await _finalize_run(
+            session, run, status="failure", processed=processed, failed=failed + 1, message=str(exc),
+            stats=_failure_stats(exc),
+        )
+        # Batches already written stay committed, so record the failure durably too
+        await session.commit()
         raise
 
 
-async def run_once() -> None:
-    async for session in get_session():
-        await init_db()
+async def _run_source(source: Source, pool: Optional[ProcessPoolExecutor]) -> None:
+    # Sources run concurrently, so each gets its own session
+    async with AsyncSessionLocal() as session:
         try:
-            await _ingest_api(session)
+            await _ingest_source(session, source, pool)
             await session.commit()
         except Exception:
             await session.rollback()
+            logger.exception("%s run failed", source.name)
             raise
 
 
+async def _wrote_records(session: AsyncSession, since: datetime) -> bool:
+    # A failed run's processed count is the batches it committed before failing
+    result = await session.execute(
+        select(models.ETLRun.id).where(models.ETLRun.started_at >= since, models.ETLRun.processed > 0).limit(1)
+    )
+    return result.first() is not None
+
+
+async def run_once() -> None:
+    """Ingest every registered source concurrently; raises the first failure after all finish."""
+    await init_db()
+    started_at = datetime.utcnow()
+    sources = get_sources()
+    # Optional process pool shared by all sources: decode + transform off the event loop.
+    # It outlives the run; the API lifespan and the entry points below close it
+    pool = None
+    if settings.transform_processes > 0 and any(source.transform_raw for source in sources):
+        pool = get_transform_pool(settings.transform_processes)
+    results = await asyncio.gather(
+        *(_run_source(source, pool) for source in sources),
+        return_exceptions=True,
+    )
+    # Cached responses stay valid unless a source wrote rows; sources commit
+    # batch by batch, so that includes a run that failed part way
+    async with AsyncSessionLocal() as session:
+        if await _wrote_records(session, started_at):
+            await cache.bump_dataset_version(session)
+    # One failing source does not cancel the others
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def _run_cli_job() -> EtlJob:
+    # Through the job manager: skipped while another process holds the ETL lock
+    job = await get_job_manager().run("cli")
+    if job.status == "failure":
+        logger.error("ETL run failed: %s", job.error)
+    return job
+
+
 async def main(run_forever: bool = False) -> None:
-    while True:
-        async for session in get_session():
+    try:
+        if run_forever:
+            # Waits between runs as chosen by the adaptive schedule
             await init_db()
-            try:
-                await _ingest_api(session)
-                await session.commit()
-            except Exception:
-                await session.rollback()
-            finally:
-                await session.close()
-        if not run_forever:
-            break
-        await asyncio.sleep(300)
+            await run_adaptive(await load_schedule(AsyncSessionLocal), AsyncSessionLocal, _run_cli_job)
+        else:
+            await _run_cli_job()
+    finally:
+        await close_http_client()
+        close_transform_pool()
+
+
+async def worker() -> None:
+    """ETL worker process: runs the jobs the API queues in etl_jobs (ETL_MODE=worker)."""
+    # Started alongside the database (docker-compose): wait for it instead of exiting
+    await init_db_with_retry()
+    try:
+        await run_worker(
+            AsyncSessionLocal,
+            poll_seconds=settings.worker_poll_seconds,
+            schedule=await load_schedule(AsyncSessionLocal),
+        )
+    finally:
+        await close_http_client()
+        close_transform_pool()
+
+
+async def _run_once_and_close() -> None:
+    try:
+        job = await get_job_manager().run("cli")
+        if job.status == "failure":
+            raise RuntimeError(job.error)
+        if job.status == "skipped":
+            logger.info("ETL run skipped: %s", job.error)
+    finally:
+        await close_http_client()
+        close_transform_pool()
 
 
 if __name__ == "__main__":
@@ -218,6 +424,7 @@ if __name__ == "__main__":
     parser.add_argument("--once", action="store_true", help="Run ETL one time and exit")
     parser.add_argument("--init-db", action="store_true", help="Initialize tables")
     parser.add_argument("--run-forever", action="store_true", help="Keep running on an interval")
+    parser.add_argument("--worker", action="store_true", help="Run jobs queued by the API (ETL_MODE=worker)")
     args = parser.parse_args()
 
     if args.init_db:
@@ -229,11 +436,13 @@ if __name__ == "__main__":
             import sys
             sys.exit(1)
 
-    if args.run_forever:
+    if args.worker:
+        asyncio.run(worker())
+    elif args.run_forever:
         asyncio.run(main(run_forever=True))
     elif args.once:
         try:
-            asyncio.run(run_once())
+            asyncio.run(_run_once_and_close())
         except Exception as e:
             logger.error(f"ETL run failed: {e}")
             import sys
@@ -0,0 +1,217 @@
+"""
+Adaptive ETL scheduling.
+
+Instead of a fixed interval, the time until the next run is chosen from
+what the last run observed (its etl_runs rows):
+
+- many changed quotes (CHANGE_RATIO_HIGH of those seen): halve the interval
+- few or none, or upstream answered 304: back off by BACKOFF
+- upstream answered 429: back off by RATE_LIMIT_BACKOFF, and wait at least
+  its Retry-After
+- anything else (a failure, a job skipped because another process ran it):
+  keep the interval
+
+The interval stays within SCHEDULE_MIN_SECONDS..SCHEDULE_MAX_SECONDS, and
+each delay gets +/- SCHEDULE_JITTER of random jitter so replicas and
+restarts do not hit upstream in lockstep. Every decision is stored in
+etl_state under STATE_KEY, where /stats reads it and where a restarted
+process picks up the interval it had reached.
+"""
+import asyncio
+import json
+import logging
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.config import get_settings
+from ingestion.jobs import EtlJob
+from services import models
+from services.state import load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "schedule"
+# Share of the quotes seen in a run that changed
+CHANGE_RATIO_HIGH = 0.5
+CHANGE_RATIO_LOW = 0.05
+SPEEDUP = 0.5
+BACKOFF = 1.5
+RATE_LIMIT_BACKOFF = 2.0
+
+
+@dataclass
+class RunOutcome:
+    """What one ETL job observed upstream, summed over its sources."""
+    changed: int = 0
+    unchanged: int = 0
+    not_modified: int = 0
+    rate_limited: bool = False
+    # Seconds, from the 429's Retry-After header
+    retry_after: Optional[float] = None
+    succeeded: int = 0
+    failed: int = 0
+
+    @property
+    def change_ratio(self) -> Optional[float]:
+        seen = self.changed + self.unchanged
+        return self.changed / seen if seen else None
+
+
+@dataclass
+class ScheduleDecision:
+    interval_s: float
+    delay_s: float
+    reason: str
+    changed: int
+    unchanged: int
+    change_ratio: Optional[float]
+    decided_at: datetime
+    next_run_at: datetime
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["decided_at"] = self.decided_at.isoformat() + "Z"
+        data["next_run_at"] = self.next_run_at.isoformat() + "Z"
+        return data
+
+
+async def load_outcome(session: AsyncSession, job: EtlJob) -> RunOutcome:
+    """Sum the etl_runs rows a job wrote (those started while it ran)."""
+    outcome = RunOutcome()
+    if job.started_at is None:
+        return outcome
+    query = select(models.ETLRun).where(models.ETLRun.started_at >= job.started_at)
+    if job.finished_at is not None:
+        query = query.where(models.ETLRun.started_at <= job.finished_at)
+    for run in (await session.execute(query)).scalars():
+        stats = json.loads(run.stats) if run.stats else {}
+        if run.status == "success":
+            outcome.succeeded += 1
+        elif run.status == "failure":
+            outcome.failed += 1
+        if stats.get("not_modified"):
+            outcome.not_modified += 1
+        if stats.get("rate_limited"):
+            outcome.rate_limited = True
+            if stats.get("retry_after") is not None:
+                outcome.retry_after = max(outcome.retry_after or 0.0, float(stats["retry_after"]))
+        records = stats.get("records") or {}
+        outcome.changed += records.get("processed", 0)
+        outcome.unchanged += records.get("skipped", 0)
+    return outcome
+
+
+class AdaptiveSchedule:
+    """Chooses the delay before the next ETL run from the last run's outcome."""
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        interval: Optional[float] = None,
+        jitter: float = 0.1,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.jitter = jitter
+        self._rng = rng
+        self.interval = self._clamp(interval if interval is not None else self.max_interval)
+        self.last: Optional[ScheduleDecision] = None
+
+    def _clamp(self, seconds: float) -> float:
+        return min(max(seconds, self.min_interval), self.max_interval)
+
+    def decide(self, outcome: RunOutcome) -> ScheduleDecision:
+        ratio = outcome.change_ratio
+        floor = self.min_interval
+        if outcome.rate_limited:
+            reason, interval = "rate_limited", self.interval * RATE_LIMIT_BACKOFF
+            floor = max(floor, outcome.retry_after or 0.0)
+        elif outcome.succeeded == 0:
+            reason, interval = ("failed" if outcome.failed else "no_runs"), self.interval
+        elif outcome.not_modified == outcome.succeeded:
+            reason, interval = "not_modified", self.interval * BACKOFF
+        elif ratio is None or ratio < CHANGE_RATIO_LOW:
+            reason, interval = "low_change", self.interval * BACKOFF
+        elif ratio >= CHANGE_RATIO_HIGH:
+            reason, interval = "high_change", self.interval * SPEEDUP
+        else:
+            reason, interval = "steady", self.interval
+        self.interval = self._clamp(interval)
+
+        # Jitter only the delay, so it does not accumulate in the interval
+        delay = self.interval * (1 + self.jitter * (2 * self._rng() - 1))
+        delay = max(min(delay, self.max_interval), floor)
+        now = datetime.utcnow()
+        self.last = ScheduleDecision(
+            interval_s=round(self.interval, 1),
+            delay_s=round(delay, 1),
+            reason=reason,
+            changed=outcome.changed,
+            unchanged=outcome.unchanged,
+            change_ratio=round(ratio, 4) if ratio is not None else None,
+            decided_at=now,
+            next_run_at=now + timedelta(seconds=delay),
+        )
+        return self.last
+
+    async def observe(self, sessionmaker: async_sessionmaker, job: EtlJob) -> float:
+        """
+        Decide after job finished, record the decision, and return the delay in seconds.
+
+        Never raises: if the outcome cannot be read or the decision stored
+        (e.g. the database is briefly unreachable), the error is logged and
+        the delay falls back to the current interval, so the next run is
+        still scheduled.
+        """
+        decision = None
+        try:
+            async with sessionmaker() as session:
+                decision = self.decide(await load_outcome(session, job))
+                await save_state(session, STATE_KEY, decision.to_dict())
+                await session.commit()
+        except Exception:
+            delay = decision.delay_s if decision is not None else self.interval
+            logger.exception("Could not record the ETL schedule decision; next run in %.0fs", delay)
+            return delay
+        logger.info(
+            "Next ETL run in %.0fs (interval %.0fs, %s, %s changed / %s unchanged)",
+            decision.delay_s, decision.interval_s, decision.reason, decision.changed, decision.unchanged,
+        )
+        return decision.delay_s
+
+
+async def load_schedule(sessionmaker: async_sessionmaker) -> AdaptiveSchedule:
+    """An AdaptiveSchedule from the settings, resuming the last stored interval."""
+    settings = get_settings()
+    async with sessionmaker() as session:
+        state = await load_state(session, STATE_KEY)
+    return AdaptiveSchedule(
+        min_interval=settings.schedule_min_seconds,
+        max_interval=settings.schedule_max_seconds,
+        interval=state["interval_s"] if state else settings.schedule_initial_seconds,
+        jitter=settings.schedule_jitter,
+    )
+
+
+async def run_adaptive(
+    schedule: AdaptiveSchedule,
+    sessionmaker: async_sessionmaker,
+    run: Callable[[], Awaitable[EtlJob]],
+    delay: float = 0.0,
+) -> None:
+    """Run jobs forever, waiting the schedule's delay after each; a failing iteration waits the current interval."""
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            job = await run()
+            delay = await schedule.observe(sessionmaker, job)
+        except Exception:
+            delay = schedule.interval
+            logger.exception("Scheduled ETL run failed; next run in %.0fs", delay)
@@ -1,50 +1,127 @@
+import json
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 from core.config import get_settings
+from ingestion.sources.http_client import CacheValidators, NotModified, client_or_temporary
+from ingestion.sources.jsonstream import JSONArrayParser
 
 settings = get_settings()
 
+# CoinPaprika API endpoint for tickers
+TICKERS_URL = "https://api.coinpaprika.com/v1/tickers"
 
-async def fetch_api_records(api_key: Optional[str] = None, last_id: Optional[str] = None) -> List[Dict[str, Any]]:
+
+def _build_headers(api_key: Optional[str]) -> Optional[Dict[str, str]]:
+    # Prepare headers with API key if provided
+    headers = {}
+    if api_key:
+        # CoinPaprika uses custom X-CoinAPI-Key header or Authorization header
+        # depending on the plan. We support both patterns.
+        headers["X-CoinAPI-Key"] = api_key
+        # Some APIs use standard Authorization header with Bearer token
+        # Uncomment if using Bearer token format:
+        # headers["Authorization"] = f"Bearer {api_key}"
+    return headers if headers else None
+
+
+def _with_external_id(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Tag in place instead of copying: the raw item is not used anywhere else
+    item.setdefault("external_id", item.get("id", ""))
+    return item
+
+
+async def fetch_api_records(
+    api_key: Optional[str] = None,
+    last_id: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None,
+) -> List[Dict[str, Any]]:
     """
     Fetch records from CoinPaprika API.
-    
+
+    Buffers the whole response; the runner uses stream_api_records instead so
+    memory stays flat regardless of response size.
+
     Args:
         api_key: Optional API key for authenticated requests. If provided, will be included
                 in the Authorization header for premium API tier access.
         last_id: Optional ID to fetch records from (for pagination/resumption).
-    
+        client: Client to reuse (see http_client.get_http_client); a
+                temporary one is created and closed if omitted.
+
     Returns:
         List of payloads with external_id and full data.
     """
     try:
-        # CoinPaprika API endpoint for tickers
-        url = "https://api.coinpaprika.com/v1/tickers"
-        
-        # Prepare headers with API key if provided
-        headers = {}
-        if api_key:
-            # CoinPaprika uses custom X-CoinAPI-Key header or Authorization header
-            # depending on the plan. We support both patterns.
-            headers["X-CoinAPI-Key"] = api_key
-            # Some APIs use standard Authorization header with Bearer token
-            # Uncomment if using Bearer token format:
-            # headers["Authorization"] = f"Bearer {api_key}"
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers if headers else None)
+        async with client_or_temporary(client) as client:
+            response = await client.get(TICKERS_URL, headers=_build_headers(api_key))
             response.raise_for_status()
             data = response.json()
-            
-            records = []
-            for item in data:
-                external_id = item.get("id", "")
-                records.append({
-                    "external_id": external_id,
-                    **item
-                })
-            
-            return records
+            return [_with_external_id(item) for item in data]
     except Exception as e:
         # Return empty list on error (can be logged)
         return []
+
+
+async def stream_api_records(
+    api_key: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    raw: bool = False,
+    client: Optional[httpx.AsyncClient] = None,
+    validators: Optional[CacheValidators] = None,
+) -> AsyncIterator[Union[Dict[str, Any], bytes, List[Dict[str, Any]], List[bytes]]]:
+    """
+    Stream records from CoinPaprika API as the response arrives.
+
+    The body is read with aiter_bytes() and split by an incremental JSON array
+    parser, so only the element being parsed (plus the current batch) is held
+    in memory.
+
+    Args:
+        api_key: Optional API key, sent the same way as fetch_api_records.
+        batch_size: If set, yield lists of up to this many payloads instead of
+                    single payloads.
+        raw: Yield the undecoded JSON bytes of each element instead of a dict
+             (decoding is then up to the caller, e.g. a worker process).
+        client: Client to reuse (see http_client.get_http_client); a
+                temporary one is created and closed if omitted.
+        validators: ETag / Last-Modified of the last processed response, sent
+                    as If-None-Match / If-Modified-Since. Updated in place
+                    from the new response; the caller persists them once the
+                    body has been processed.
+
+    Yields:
+        Payloads with external_id and full data (or raw element bytes), one at
+        a time or in batches.
+
+    Raises:
+        NotModified: If upstream answered the conditional request with 304.
+        httpx.HTTPError: On network errors or non-2xx responses.
+        ValueError: If the body is not a well-formed JSON array.
+    """
+    parser = JSONArrayParser()
+    batch: List[Any] = []
+    headers = _build_headers(api_key) or {}
+    if validators is not None:
+        headers.update(validators.request_headers())
+
+    async with client_or_temporary(client) as client:
+        async with client.stream("GET", TICKERS_URL, headers=headers or None) as response:
+            if response.status_code == 304:
+                raise NotModified(TICKERS_URL)
+            response.raise_for_status()
+            if validators is not None:
+                validators.update_from(response)
+            async for chunk in response.aiter_bytes():
+                for element in parser.feed(chunk):
+                    item = element if raw else _with_external_id(json.loads(element))
+                    if batch_size is None:
+                        yield item
+                        continue
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            parser.close()
+
+    if batch:
+        yield batch
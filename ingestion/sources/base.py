@@ -0,0 +1,84 @@
+"""
+Source plugin interface for the ETL runner.
+
+A source knows how to fetch batches from one upstream and turn them into a
+NormalizedBatch. The runner supplies everything else: the ETLCheckpoint and
+ETLRun rows keyed by Source.name, watermarks, and the fetch -> transform ->
+write pipeline. Register an instance with ingestion.sources.registry.register
+and it runs on every ETL cycle, concurrently with the other sources.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from ingestion.columnar import BatchResult
+from ingestion.parallel import RawChunkResult
+from ingestion.sources.http_client import CacheValidators
+from ingestion.sources.registry import DEFAULT_PRIORITY
+from ingestion.watermarks import payload_watermark
+from services import models
+
+
+@dataclass
+class FetchContext:
+    """What the runner hands to Source.fetch for one run."""
+    batch_size: int
+    # Checkpoint high-water mark from the previous successful run
+    last_id: Optional[str]
+    # Conditional-request state; sources update it in place from the response
+    validators: CacheValidators
+    # Shared, pooled HTTP client
+    client: httpx.AsyncClient
+    # Yield undecoded element bytes for Source.transform_raw (process-pool mode)
+    raw: bool = False
+    # File sources: byte offset to resume from (ETLCheckpoint.last_offset)
+    last_offset: Optional[int] = None
+
+
+class Source(ABC):
+    """
+    One upstream data source.
+
+    Attributes:
+        name: Checkpoint key; also ETLRun.source and NormalizedRecord.source.
+        priority: Merge priority for canonical fields such as name (lower wins).
+        transform_concurrency / write_concurrency: Pipeline workers for this
+            source; None falls back to TRANSFORM_CONCURRENCY / WRITE_CONCURRENCY.
+        transform_raw: Picklable module-level function turning a list of raw
+            element bytes into a RawChunkResult, used when TRANSFORM_PROCESSES
+            is set; None if the source cannot ship raw bytes to workers.
+        use_watermarks: Skip payloads whose watermark has not moved. Sources
+            that resume from a byte offset never re-read a payload and turn
+            this off.
+        archive_model: Table raw payloads are archived to.
+    """
+
+    name: str
+    priority: int = DEFAULT_PRIORITY
+    transform_concurrency: Optional[int] = None
+    write_concurrency: Optional[int] = None
+    transform_raw: Optional[Callable[[List[bytes]], RawChunkResult]] = None
+    use_watermarks: bool = True
+    archive_model: type = models.RawAPIRecord
+
+    @abstractmethod
+    def fetch(self, context: FetchContext) -> AsyncIterator[List[Any]]:
+        """
+        Yield batches of up to context.batch_size payloads.
+
+        Payloads are dicts with an external_id key (or raw bytes when
+        context.raw is set). Raise http_client.NotModified to end the run
+        early when the upstream reports no changes. A batch with an
+        end_offset attribute moves ETLCheckpoint.last_offset to that value
+        in the same transaction that writes the batch.
+        """
+
+    @abstractmethod
+    def transform(self, payloads: List[Dict[str, Any]]) -> BatchResult:
+        """Normalize a batch; payloads that fail go in BatchResult.failed."""
+
+    def watermark(self, payload: Dict[str, Any]) -> str:
+        """Change marker for a payload; unchanged payloads are skipped."""
+        return payload_watermark(payload)
@@ -0,0 +1,32 @@
+"""CoinPaprika /v1/tickers as an ETL source plugin."""
+from typing import Any, AsyncIterator, Dict, List
+
+from core.config import get_settings
+from ingestion.columnar import BatchResult, transform_api_batch
+from ingestion.parallel import transform_raw_chunk
+from ingestion.sources.api_source import stream_api_records
+from ingestion.sources.base import FetchContext, Source
+from ingestion.sources.registry import register
+
+settings = get_settings()
+
+
+class CoinPaprikaSource(Source):
+    name = "coinpaprika"
+    priority = 1
+    transform_raw = staticmethod(transform_raw_chunk)
+
+    def fetch(self, context: FetchContext) -> AsyncIterator[List[Any]]:
+        return stream_api_records(
+            settings.api_source_key,
+            batch_size=context.batch_size,
+            raw=context.raw,
+            client=context.client,
+            validators=context.validators,
+        )
+
+    def transform(self, payloads: List[Dict[str, Any]]) -> BatchResult:
+        return transform_api_batch(payloads)
+
+
+register(CoinPaprikaSource())
@@ -0,0 +1,146 @@
+"""
+CSV files as an ETL source, for bulk historical backfills.
+
+The file is memory-mapped and parsed one window of CSV_CHUNK_BYTES at a
+time, so a file of several hundred MB never has to fit in memory. Every
+batch the source yields carries the byte offset just past its last row
+(end_offset); the runner stores it in ETLCheckpoint.last_offset in the same
+transaction as the batch, so an interrupted load resumes at the first row
+that was not committed. Rows appended to the file later are picked up by
+the next run.
+
+The first line is the header. Recognized columns are those read by
+transform.transform_csv_record (symbol, name, price_usd, market_cap_usd,
+volume_24h_usd, percent_change_24h, created_at, external_id); others are
+archived but ignored. Quoted fields must not contain line breaks.
+"""
+import asyncio
+import csv
+import mmap
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from core.config import get_settings
+from ingestion.columnar import BatchResult, transform_csv_batch
+from ingestion.sources.base import FetchContext, Source
+from ingestion.sources.registry import register
+from services import models
+
+settings = get_settings()
+
+
+class CSVBatch(list):
+    """A batch of row dicts plus the offset to resume from once it is written."""
+
+    def __init__(self, rows: List[Dict[str, Any]], end_offset: int):
+        super().__init__(rows)
+        self.end_offset = end_offset
+
+
+def _split_lines(data: bytes, start: int) -> Iterator[Tuple[int, int, bytes]]:
+    """(offset of the line, offset of the next line, line without terminator) per non-blank line."""
+    offset = start
+    for line in data.split(b"\n"):
+        following = offset + len(line) + 1
+        stripped = line.rstrip(b"\r")
+        if stripped:
+            yield offset, following, stripped
+        offset = following
+
+
+def iter_csv_batches(
+    path: str,
+    start_offset: Optional[int] = None,
+    batch_size: int = 500,
+    chunk_bytes: int = 4 * 1024 * 1024,
+) -> Iterator[CSVBatch]:
+    """
+    Yield CSVBatch lists of row dicts from path, starting at start_offset.
+
+    Each row gets external_id csv:<file name>:<byte offset of the row>
+    unless the file has its own external_id column. An offset past the end
+    of the file (the file was replaced by a shorter one) starts over.
+    """
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_end = mapped.find(b"\n")
+            if header_end < 0:
+                return
+            header = next(csv.reader([mapped[:header_end].rstrip(b"\r").decode("utf-8-sig")]))
+            name = os.path.basename(path)
+
+            position = header_end + 1
+            if start_offset is not None and position < start_offset <= size:
+                position = start_offset
+
+            rows: List[Dict[str, Any]] = []
+            while position < size:
+                end = min(position + max(1, chunk_bytes), size)
+                if end < size:
+                    # Only whole lines: cut the window after its last newline
+                    newline = mapped.rfind(b"\n", position, end)
+                    if newline < 0:
+                        newline = mapped.find(b"\n", end)
+                    end = size if newline < 0 else newline + 1
+                lines = list(_split_lines(mapped[position:end], position))
+                texts = (line.decode("utf-8") for _, _, line in lines)
+                for (offset, following, _), values in zip(lines, csv.reader(texts)):
+                    row: Dict[str, Any] = dict(zip(header, values))
+                    row.setdefault("external_id", f"csv:{name}:{offset}")
+                    rows.append(row)
+                    if len(rows) >= batch_size:
+                        # Resume point: the line after this row
+                        yield CSVBatch(rows, min(following, size))
+                        rows = []
+                # A partial batch carries over into the next window
+                position = end
+            if rows:
+                yield CSVBatch(rows, size)
+
+
+async def stream_csv_batches(
+    path: str,
+    start_offset: Optional[int] = None,
+    batch_size: int = 500,
+    chunk_bytes: int = 4 * 1024 * 1024,
+) -> AsyncIterator[CSVBatch]:
+    """iter_csv_batches with the parsing done in a worker thread, off the event loop."""
+    batches = iter_csv_batches(path, start_offset, batch_size, chunk_bytes)
+    try:
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            yield batch
+    finally:
+        batches.close()
+
+
+class CSVSource(Source):
+    """One CSV file; name is the checkpoint key, so use one name per file."""
+
+    archive_model = models.RawCSVRecord
+    # Rows are read once and resumed by offset, not re-read and compared
+    use_watermarks = False
+    # Offsets must be committed in file order
+    transform_concurrency = 1
+    write_concurrency = 1
+
+    def __init__(self, path: str, name: str = "csv", priority: int = 3, chunk_bytes: Optional[int] = None):
+        self.path = path
+        self.name = name
+        self.priority = priority
+        self.chunk_bytes = chunk_bytes or settings.csv_chunk_bytes
+
+    def fetch(self, context: FetchContext) -> AsyncIterator[List[Any]]:
+        return stream_csv_batches(self.path, context.last_offset, context.batch_size, self.chunk_bytes)
+
+    def transform(self, payloads: List[Dict[str, Any]]) -> BatchResult:
+        return transform_csv_batch(payloads)
+
+
+if settings.csv_source_path:
+    register(CSVSource(settings.csv_source_path))
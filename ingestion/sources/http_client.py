@@ -0,0 +1,82 @@
+"""
+Shared HTTP client for upstream fetches.
+
+One long-lived httpx.AsyncClient per process instead of one per run, so
+connections (and their TLS handshakes) are reused across requests and runs.
+HTTP/2 is enabled when the optional h2 package is installed, and brotli is
+only advertised when a decoder for it is. The client is closed by whoever
+owns the process lifecycle: the API lifespan or the runner's entry point.
+
+Conditional requests: sources send the ETag / Last-Modified they stored in
+their ETLCheckpoint, and a 304 from upstream surfaces as NotModified so the
+runner can skip the whole run.
+"""
+import importlib.util
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_BROTLI_AVAILABLE = any(importlib.util.find_spec(name) for name in ("brotli", "brotlicffi"))
+ACCEPT_ENCODING = "gzip, deflate, br" if _BROTLI_AVAILABLE else "gzip, deflate"
+
+TIMEOUT = 30.0
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class NotModified(Exception):
+    """Upstream answered a conditional request with 304 Not Modified."""
+
+
+@dataclass
+class CacheValidators:
+    """ETag / Last-Modified of the last fully processed upstream response."""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update_from(self, response: httpx.Response) -> None:
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide client, created on first use (and again after close)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            limits=LIMITS,
+            http2=HTTP2_AVAILABLE,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client; safe to call when none was created."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def client_or_temporary(client: Optional[httpx.AsyncClient]) -> AsyncIterator[httpx.AsyncClient]:
+    """Use the given client, or a short-lived one closed on exit."""
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=TIMEOUT) as temporary:
+        yield temporary
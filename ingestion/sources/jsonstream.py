@@ -0,0 +1,141 @@
+"""
+Incremental parser for top-level JSON arrays.
+
+Splits a byte stream such as the CoinPaprika /v1/tickers response into the raw
+bytes of each array element as soon as the element is complete, without
+holding the whole document in memory. Elements are not decoded here; callers
+json.loads() them one at a time (or ship the bytes elsewhere to decode).
+"""
+import re
+from typing import List, Optional
+
+_WHITESPACE = b" \t\r\n"
+# A whole string token (group 1 is None when the string is cut off by the end
+# of the buffer) or a single bracket. Possessive quantifiers need Python 3.11+.
+_TOKEN = re.compile(rb'"(?:[^"\\]++|\\.)*+(")?|[\[\]{}]', re.DOTALL)
+_SCALAR_END = re.compile(rb"[,\]\s]")
+
+
+def _container_pattern(levels: int) -> bytes:
+    string = rb'"(?:[^"\\]++|\\.)*+"'
+    pattern = rb'[{\[](?:[^{}\[\]"]++|' + string + rb')*+[}\]]'
+    for _ in range(levels):
+        pattern = rb'[{\[](?:[^{}\[\]"]++|' + string + rb'|' + pattern + rb')*+[}\]]'
+    return pattern
+
+
+# Fast path: one C-level match for a complete object/array nested up to five
+# levels deep. Incomplete or deeper elements fall back to the token scanner.
+_ELEMENT = re.compile(_container_pattern(4), re.DOTALL)
+
+_OPEN_ARRAY = ord("[")
+_CLOSE_ARRAY = ord("]")
+_COMMA = ord(",")
+_QUOTE = ord('"')
+
+
+class JSONArrayParser:
+    """
+    Feed bytes in, get complete array elements out.
+
+    Usage:
+        parser = JSONArrayParser()
+        for chunk in chunks:
+            for raw in parser.feed(chunk):
+                item = json.loads(raw)
+        parser.close()
+
+    Only the element currently being scanned is buffered, so memory is bounded
+    by the largest single element rather than the document size. Structural
+    validation is limited to what is needed to find element boundaries;
+    malformed elements surface when they are decoded.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0  # Next byte to scan
+        self._start: Optional[int] = None  # Start of the element being scanned
+        self._depth = 0
+        self._scalar = False
+        self._started = False
+        self._done = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Consume a chunk and return the raw bytes of every element it completed."""
+        self._buf += data
+        buf = self._buf
+        end = len(buf)
+        pos = self._pos
+        items: List[bytes] = []
+
+        while pos < end:
+            if self._start is None:
+                byte = buf[pos]
+                if byte in _WHITESPACE:
+                    pos += 1
+                elif self._done:
+                    raise ValueError("Unexpected data after end of JSON array")
+                elif not self._started:
+                    if byte != _OPEN_ARRAY:
+                        raise ValueError("Expected a JSON array")
+                    self._started = True
+                    pos += 1
+                elif byte == _COMMA:
+                    pos += 1
+                elif byte == _CLOSE_ARRAY:
+                    self._done = True
+                    pos += 1
+                else:
+                    match = _ELEMENT.match(buf, pos) if byte in b"{[" else None
+                    if match is not None:
+                        items.append(bytes(buf[pos:match.end()]))
+                        pos = match.end()
+                        continue
+                    # Rescan the opening byte below as part of the element
+                    self._start = pos
+                    self._depth = 0
+                    self._scalar = byte not in b'{["'
+                continue
+
+            if self._scalar:
+                # Bare number / true / false / null element
+                match = _SCALAR_END.search(buf, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.start()
+            else:
+                match = _TOKEN.search(buf, pos)
+                if match is None:
+                    pos = end
+                    break
+                byte = buf[match.start()]
+                if byte == _QUOTE and match.group(1) is None:
+                    # String continues in the next chunk; rescan it from its quote
+                    pos = match.start()
+                    break
+                pos = match.end()
+                if byte in b"{[":
+                    self._depth += 1
+                elif byte != _QUOTE:
+                    self._depth -= 1
+                if self._depth:
+                    continue
+
+            items.append(bytes(buf[self._start:pos]))
+            self._start = None
+
+        # Drop everything before the element still in progress
+        keep = self._start if self._start is not None else pos
+        if keep:
+            del buf[:keep]
+            pos -= keep
+            if self._start is not None:
+                self._start = 0
+        self._pos = pos
+        return items
+
+    def close(self) -> None:
+        """Raise if the stream ended before the closing bracket."""
+        if not self._done:
+            raise ValueError("Incomplete JSON array")
@@ -0,0 +1,66 @@
+"""
+Registry of ETL sources.
+
+Built-in sources register themselves when their module is imported; the
+modules listed in BUILTIN_SOURCES are imported on first lookup. Merge
+priorities (normalize.merge_records, the SQL upsert) are read from here.
+"""
+import importlib
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from ingestion.sources.base import Source
+
+# Merge priority of sources that are not registered (lower number wins)
+DEFAULT_PRIORITY = 99
+
+BUILTIN_SOURCES = (
+    "ingestion.sources.coinpaprika",
+    # Registers only when CSV_SOURCE_PATH is set
+    "ingestion.sources.csv_source",
+)
+
+_sources: Dict[str, "Source"] = {}
+_builtins_loaded = False
+
+
+def _load_builtins() -> None:
+    global _builtins_loaded
+    if not _builtins_loaded:
+        for module in BUILTIN_SOURCES:
+            importlib.import_module(module)
+        _builtins_loaded = True
+
+
+def register(source: "Source") -> "Source":
+    """Add (or replace) a source under source.name."""
+    _sources[source.name] = source
+    return source
+
+
+def unregister(name: str) -> None:
+    _sources.pop(name, None)
+
+
+def get_sources() -> List["Source"]:
+    """All registered sources, in registration order."""
+    _load_builtins()
+    return list(_sources.values())
+
+
+def get_source(name: str) -> "Source":
+    _load_builtins()
+    return _sources[name]
+
+
+def priority_of(name: str) -> int:
+    """Merge priority for a source name (case-insensitive); DEFAULT_PRIORITY if unknown."""
+    _load_builtins()
+    source = _sources.get(name.lower())
+    return source.priority if source is not None else DEFAULT_PRIORITY
+
+
+def source_priority() -> Dict[str, int]:
+    """{source name: merge priority} for every registered source."""
+    _load_builtins()
+    return {name: source.priority for name, source in _sources.items()}
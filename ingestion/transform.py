@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from schemas.record import NormalizedRecord
 
 
@@ -16,6 +16,15 @@ def normalize_price(price: Any) -> float:
         return 0.0
 
 
+def parse_last_updated(value: Any) -> Optional[datetime]:
+    """Parse an ISO-8601 last_updated value to naive UTC, or None if it is not one."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return parsed.replace(tzinfo=None)
+
+
 def transform_api_record(payload: Dict[str, Any]) -> NormalizedRecord:
     """Transform CoinPaprika API record to normalized format."""
     coin_id = payload.get("id", "")
@@ -30,13 +39,9 @@ def transform_api_record(payload: Dict[str, Any]) -> NormalizedRecord:
     volume_24h = usd_quote.get("volume_24h")
     percent_change = usd_quote.get("percent_change_24h")
     
-    created_at = datetime.utcnow()
+    created_at = None
     if "last_updated" in usd_quote:
-        try:
-            created_at = datetime.fromisoformat(usd_quote["last_updated"].replace("Z", "+00:00"))
-            created_at = created_at.replace(tzinfo=None)
-        except:
-            pass
+        created_at = parse_last_updated(usd_quote["last_updated"])
     
     return NormalizedRecord(
         id=f"coinpaprika_{coin_id}",
@@ -47,9 +52,31 @@ def transform_api_record(payload: Dict[str, Any]) -> NormalizedRecord:
         volume_24h_usd=float(volume_24h) if volume_24h else None,
         percent_change_24h=float(percent_change) if percent_change else None,
         source="coinpaprika",
-        created_at=created_at,
+        created_at=created_at or datetime.utcnow(),
         ingested_at=datetime.utcnow(),
     )
 
 
+def optional_float(value: Any) -> Optional[float]:
+    """CSV numeric cell: empty or missing -> None, otherwise float()."""
+    if value is None or value == "":
+        return None
+    return float(value)
+
 
+def transform_csv_record(payload: Dict[str, Any]) -> NormalizedRecord:
+    """Transform a CSV row (header -> cell) to normalized format."""
+    ticker = normalize_ticker(payload.get("symbol", ""))
+    created_at = parse_last_updated(payload.get("created_at"))
+    return NormalizedRecord(
+        id=payload.get("external_id") or f"csv_{ticker.lower()}",
+        ticker=ticker,
+        name=payload.get("name") or None,
+        price_usd=normalize_price(payload.get("price_usd", 0)),
+        market_cap_usd=optional_float(payload.get("market_cap_usd")),
+        volume_24h_usd=optional_float(payload.get("volume_24h_usd")),
+        percent_change_24h=optional_float(payload.get("percent_change_24h")),
+        source="csv",
+        created_at=created_at or datetime.utcnow(),
+        ingested_at=datetime.utcnow(),
+    )
@@ -0,0 +1,152 @@
+"""
+In-process response cache for GET /data and GET /stats.
+
+The data behind these endpoints only changes when an ETL run commits, so
+responses are cached per process in an LRU of RESPONSE_CACHE_SIZE entries,
+keyed by the normalized query parameters. Each entry is tagged with the
+dataset version it was built from; an entry whose version is not the current
+one is a miss and gets rebuilt.
+
+The dataset version is a random token in etl_state (VERSION_KEY). It is
+replaced by runner.run_once when a source wrote rows, and by the admin
+cleanup after its deletes; runs that wrote nothing keep it. It also records
+when the last successful ETL run finished, the Last-Modified of the cached
+responses.
+
+Every process re-reads the version, together with the rest of etl_state, at
+most once per RESPONSE_CACHE_VERSION_TTL seconds. API replicas and uvicorn
+workers therefore drop their entries soon after an ETL run in any process,
+the worker included. A bump in this process takes effect here at once.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from services import models
+from services.state import load_all, save_state
+
+VERSION_KEY = "dataset_version"
+# Version before the first ETL run has stored one
+INITIAL_VERSION = "initial"
+
+
+@dataclass(frozen=True)
+class DatasetVersion:
+    token: str
+    # finished_at of the last successful ETL run
+    last_modified: Optional[datetime] = None
+    # All of etl_state as read with the token (e.g. the schedule's last decision)
+    state: Dict[str, Any] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """Size-bounded LRU of version-tagged values, with hit/miss/eviction counters."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, version: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+# (version, monotonic time it was read)
+_version: Optional[Tuple[DatasetVersion, float]] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """The process-wide ResponseCache."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(get_settings().response_cache_size)
+    return _cache
+
+
+def reset() -> None:
+    """Empty the cache and forget the last version read (tests)."""
+    global _version
+    get_response_cache().clear()
+    _version = None
+
+
+async def _last_success(session: AsyncSession) -> Optional[datetime]:
+    query = select(func.max(models.ETLRun.finished_at)).where(models.ETLRun.status == "success")
+    return (await session.execute(query)).scalar()
+
+
+async def dataset_version(session: AsyncSession) -> DatasetVersion:
+    """The current dataset version, re-read from etl_state once the last read is older than the TTL."""
+    global _version
+    now = time.monotonic()
+    if _version is not None and now - _version[1] < get_settings().response_cache_version_ttl:
+        return _version[0]
+    state = await load_all(session)
+    stored = state.get(VERSION_KEY)
+    if stored:
+        last_modified = stored.get("last_modified")
+        version = DatasetVersion(
+            stored["version"], datetime.fromisoformat(last_modified) if last_modified else None, state
+        )
+    else:
+        # No ETL run has stored a version yet (or it predates versioning)
+        version = DatasetVersion(INITIAL_VERSION, await _last_success(session), state)
+    _version = (version, now)
+    return version
+
+
+async def bump_dataset_version(session: AsyncSession) -> DatasetVersion:
+    """Store and commit a new dataset version, invalidating every process's cached responses."""
+    global _version
+    last_modified = await _last_success(session)
+    token = uuid.uuid4().hex
+    await save_state(session, VERSION_KEY, {
+        "version": token,
+        "last_modified": last_modified.isoformat() if last_modified else None,
+    })
+    await session.commit()
+    # Re-read on the next request, so the snapshot of etl_state is current too
+    _version = None
+    return DatasetVersion(token, last_modified)
@@ -1,5 +1,8 @@
+import asyncio
 import logging
 from typing import AsyncGenerator
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from core.config import get_settings
 from services import models
@@ -19,12 +22,16 @@ if '@' in masked_url:
             masked_url = f"{protocol_user[0]}://{user}:****@{parts[1]}"
 logger.info(f"Connecting to database: {masked_url}")
 
+# SQLite (local runs, benchmarks) uses a non-queue pool that rejects sizing arguments
+pool_kwargs = {}
+if make_url(settings.database_url).get_backend_name() != "sqlite":
+    pool_kwargs = {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow}
+
 engine = create_async_engine(
     settings.database_url,
     echo=False,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    **pool_kwargs,
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -45,7 +52,61 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(models.Base.metadata.create_all)
+def _create_schema(sync_conn) -> None:
+    models.Base.metadata.create_all(sync_conn)
+    # create_all skips tables that already exist, so nullable columns and
+    # indexes declared after a table was first created are added here.
+    inspector = inspect(sync_conn)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+_schema_ready = False
+_schema_lock = asyncio.Lock()
+
+
+def schema_ready() -> bool:
+    """Whether init_db has completed in this process."""
+    return _schema_ready
+
+
+async def init_db(force: bool = False):
+    """
+    Initialize database tables.
+
+    Runs once per process: the API startup, every ETL run and the worker all
+    call it, and only the first call (or force=True) inspects the schema.
+    """
+    global _schema_ready
+    if _schema_ready and not force:
+        return
+    async with _schema_lock:
+        if _schema_ready and not force:
+            return
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_schema)
+        _schema_ready = True
+
+
+async def init_db_with_retry(max_delay: float = 30.0) -> None:
+    """
+    init_db, retried with backoff until the database accepts connections.
+
+    For process startup: the API and the ETL worker may come up before
+    PostgreSQL does.
+    """
+    delay = 1.0
+    while True:
+        try:
+            await init_db()
+            return
+        except Exception as e:
+            logger.warning(f"Database initialization failed, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
@@ -0,0 +1,179 @@
+"""
+Downsampled reads of the price_history table.
+
+Long ranges are reduced on the server before they reach the client:
+
+- average: one point per 1m / 1h / 1d bucket, aggregated in SQL, so only
+  the buckets leave the database.
+- lttb: Largest-Triangle-Three-Buckets over the raw series. Keeps the
+  points that preserve the visual shape (spikes included) rather than
+  smoothing them away; computed with NumPy on (ts, price) pairs only.
+
+OHLCV candles are not computed here at all: ohlcv_series reads the
+ohlcv_rollups rows maintained at ingest time (ingestion.rollups).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services import models
+
+# interval -> (PostgreSQL date_trunc field, SQLite strftime format)
+INTERVALS = {
+    "1m": ("minute", "%Y-%m-%d %H:%M:00"),
+    "1h": ("hour", "%Y-%m-%d %H:00:00"),
+    "1d": ("day", "%Y-%m-%d 00:00:00"),
+}
+
+
+def bucket_start(column, interval: str, dialect: str):
+    """SQL expression truncating column to the start of its interval bucket."""
+    field, sqlite_format = INTERVALS[interval]
+    if dialect == "sqlite":
+        return func.strftime(sqlite_format, column)
+    return func.date_trunc(field, column)
+
+
+def _as_datetime(value: Any) -> datetime:
+    # SQLite's strftime returns text
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _range(query, ticker: str, start: Optional[datetime], end: Optional[datetime], source: Optional[str]):
+    history = models.PriceHistory
+    query = query.where(history.ticker == ticker)
+    if start:
+        query = query.where(history.ts >= start)
+    if end:
+        query = query.where(history.ts <= end)
+    if source:
+        query = query.where(history.source == source)
+    return query
+
+
+async def average_series(
+    session: AsyncSession,
+    ticker: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    source: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """One averaged point per interval bucket, oldest first."""
+    history = models.PriceHistory
+    bucket = bucket_start(history.ts, interval, session.get_bind().dialect.name).label("bucket")
+    query = _range(
+        select(
+            bucket,
+            func.avg(history.price_usd),
+            func.avg(history.market_cap_usd),
+            func.avg(history.volume_24h_usd),
+            func.count(),
+        ),
+        ticker, start, end, source,
+    ).group_by(bucket).order_by(bucket)
+    result = await session.execute(query)
+    return [
+        {
+            "ts": _as_datetime(ts),
+            "price_usd": price,
+            "market_cap_usd": market_cap,
+            "volume_24h_usd": volume,
+            "samples": samples,
+        }
+        for ts, price, market_cap, volume, samples in result.all()
+    ]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept; the rest are split into
+    threshold - 2 buckets and each contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.intp)
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0], kept[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[high:edges[bucket + 2]].mean()
+            next_y = y[high:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change argmax
+        areas = np.abs(
+            (x[previous] - next_x) * (y[low:high] - y[previous])
+            - (x[previous] - x[low:high]) * (next_y - y[previous])
+        )
+        previous = low + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+async def lttb_series(
+    session: AsyncSession,
+    ticker: str,
+    points: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    source: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """The raw series reduced to at most points points with LTTB, oldest first."""
+    history = models.PriceHistory
+    query = _range(select(history.ts, history.price_usd), ticker, start, end, source).order_by(history.ts)
+    rows = (await session.execute(query)).all()
+    if not rows:
+        return []
+    stamps = np.array([row[0] for row in rows], dtype="datetime64[us]")
+    prices = np.array([row[1] for row in rows], dtype=np.float64)
+    keep = lttb_indices(stamps.astype(np.int64).astype(np.float64), prices, points)
+    return [
+        {"ts": ts, "price_usd": price}
+        for ts, price in zip(stamps[keep].tolist(), prices[keep].tolist())
+    ]
+
+
+async def ohlcv_series(
+    session: AsyncSession,
+    ticker: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 500,
+) -> List[Dict[str, Any]]:
+    """
+    Precomputed candles, oldest first: the last limit buckets of the range.
+
+    A primary-key range scan over (ticker, interval, bucket), so the cost
+    depends on limit, not on how much history is stored.
+    """
+    rollup = models.OHLCVRollup
+    query = select(rollup).where(rollup.ticker == ticker, rollup.interval == interval)
+    if start:
+        query = query.where(rollup.bucket >= start)
+    if end:
+        query = query.where(rollup.bucket <= end)
+    result = await session.execute(query.order_by(rollup.bucket.desc()).limit(limit))
+    return [
+        {
+            "ts": row.bucket,
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "volume": row.volume,
+            "samples": row.samples,
+        }
+        for row in reversed(result.scalars().all())
+    ]
+
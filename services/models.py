@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, String, Float, DateTime, Integer, Text
+from sqlalchemy import BigInteger, Column, String, Float, DateTime, Integer, Text, Index, PrimaryKeyConstraint
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -15,11 +15,31 @@ class RawAPIRecord(Base):
     ingested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class RawCSVRecord(Base):
+    __tablename__ = "raw_csv_records"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    external_id = Column(String, unique=True, nullable=False, index=True)  # csv:<file>:<byte offset>
+    payload = Column(Text, nullable=False)  # Row as dict text
+    ingested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class NormalizedRecord(Base):
     __tablename__ = "normalized_records"
+    __table_args__ = (
+        # One row per ticker; conflict target for the bulk upsert in ingestion.load
+        Index("uq_normalized_records_ticker", "ticker", unique=True),
+        # GET /data sort orders (services.records.SORT_KEYS): ORDER BY <column>, id
+        # LIMIT n reads n index entries, and a cursor page is one index seek
+        Index("ix_normalized_records_created_at_id", "created_at", "id"),
+        Index("ix_normalized_records_market_cap_usd_id", "market_cap_usd", "id"),
+        Index("ix_normalized_records_volume_24h_usd_id", "volume_24h_usd", "id"),
+        Index("ix_normalized_records_percent_change_24h_id", "percent_change_24h", "id"),
+        Index("ix_normalized_records_price_usd_id", "price_usd", "id"),
+    )
     
     id = Column(String, primary_key=True)
-    ticker = Column(String, nullable=False, index=True)
+    ticker = Column(String, nullable=False)
     name = Column(String, nullable=True)
     price_usd = Column(Float, nullable=False)
     market_cap_usd = Column(Float, nullable=True)
@@ -30,6 +50,59 @@ class NormalizedRecord(Base):
     ingested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+    __table_args__ = (
+        # Leading (ticker, ts) doubles as the range-scan index for /data/history;
+        # source keeps one row per quote per source (re-ingesting it is a no-op)
+        PrimaryKeyConstraint("ticker", "ts", "source", name="pk_price_history"),
+        # PostgreSQL: one partition per calendar month, created on first write
+        # (ingestion.load.ensure_history_partitions)
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+    
+    # Append-only: every normalized quote, keyed by its quote time
+    ticker = Column(String, nullable=False)
+    ts = Column(DateTime, nullable=False)
+    source = Column(String, nullable=False)
+    price_usd = Column(Float, nullable=False)
+    market_cap_usd = Column(Float, nullable=True)
+    volume_24h_usd = Column(Float, nullable=True)
+    percent_change_24h = Column(Float, nullable=True)
+
+
+class OHLCVRollup(Base):
+    __tablename__ = "ohlcv_rollups"
+    __table_args__ = (
+        # Chart reads scan one (ticker, interval) prefix in bucket order
+        PrimaryKeyConstraint("ticker", "interval", "bucket", name="pk_ohlcv_rollups"),
+    )
+    
+    # Maintained at ingest time from newly appended price_history rows
+    ticker = Column(String, nullable=False)
+    interval = Column(String, nullable=False)  # 1m, 1h or 1d
+    bucket = Column(DateTime, nullable=False)  # Bucket start
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=True)  # 24h volume as of the bucket's last quote
+    # Quote times of open / close, so out-of-order batches merge correctly
+    open_ts = Column(DateTime, nullable=False)
+    close_ts = Column(DateTime, nullable=False)
+    samples = Column(Integer, nullable=False)
+
+
+class TickerWatermark(Base):
+    __tablename__ = "ticker_watermarks"
+    
+    # One row per upstream coin; several coins can share a ticker symbol
+    source = Column(String, primary_key=True)
+    external_id = Column(String, primary_key=True)
+    watermark = Column(String, nullable=False)  # quotes.USD.last_updated or payload hash
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class ETLCheckpoint(Base):
     __tablename__ = "etl_checkpoints"
     
@@ -37,6 +110,11 @@ class ETLCheckpoint(Base):
     source = Column(String, unique=True, nullable=False)
     last_id = Column(String, nullable=True)
     last_timestamp = Column(DateTime, nullable=True)
+    # File sources: byte offset of the next unread row
+    last_offset = Column(BigInteger, nullable=True)
+    # Validators of the last fully processed upstream response (conditional GET)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
@@ -47,8 +125,47 @@ class ETLRun(Base):
     source = Column(String, nullable=False, index=True)
     status = Column(String, nullable=False)  # success, failure, running
     started_at = Column(DateTime, nullable=False)
-    finished_at = Column(DateTime, nullable=True)
+    # Indexed: GET /stats reads max(finished_at) on every request
+    finished_at = Column(DateTime, nullable=True, index=True)
     processed = Column(Integer, default=0)
     failed = Column(Integer, default=0)
     duration_ms = Column(Integer, nullable=True)
     message = Column(Text, nullable=True)
+    stats = Column(Text, nullable=True)  # JSON stored as text: per-stage pipeline stats
+
+
+class ETLLock(Base):
+    __tablename__ = "etl_locks"
+    
+    # Lease-based ETL lock for databases without advisory locks (SQLite)
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+
+class ETLJobRecord(Base):
+    __tablename__ = "etl_jobs"
+    
+    # ETL jobs queued by the API for the worker process (ETL_MODE=worker)
+    id = Column(String, primary_key=True)
+    trigger = Column(String, nullable=False)
+    status = Column(String, nullable=False, index=True)  # queued, running, success, failure, skipped
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    merged = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    worker = Column(String, nullable=True)
+    # Refreshed by the worker while the job runs; a running row without a recent one is dead
+    heartbeat_at = Column(DateTime, nullable=True)
+
+
+class ETLState(Base):
+    __tablename__ = "etl_state"
+    
+    # Small ETL state shared between processes, e.g. the adaptive schedule's last decision
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=True)  # JSON stored as text
+    updated_at = Column(DateTime, nullable=True)
@@ -0,0 +1,233 @@
+"""
+Paged reads of the normalized_records table for GET /data.
+
+Filtering, ordering, LIMIT/OFFSET and counting all happen in SQL, so a page
+costs the same however many rows match. Pages are ordered by a sort key
+(SORT_KEYS) and then id: id breaks ties between equal values, so every row
+has one fixed position and pages neither repeat nor skip rows.
+
+Two ways to page:
+
+- offset: LIMIT/OFFSET. Simple, but the database still walks every
+  skipped row, so deep pages get slower.
+- cursor (keyset): every page returns opaque next/prev cursors holding the
+  (sort value, id) of its last/first row, and the next page is
+  WHERE (value, id) < (:value, :id) ORDER BY value, id LIMIT n - an index
+  seek on the matching composite index, the same cost at any depth.
+  NULL sort values always come last; they are read as a second segment
+  (WHERE value IS NULL ORDER BY id) so both segments stay index scans.
+
+Pages are read as plain column rows (no ORM objects or identity map), which
+list_data serializes straight to JSON.
+
+Counting is separate from the page query and has three modes:
+
+- exact: SELECT COUNT(*) over the filtered rows.
+- estimated: the planner's row estimate for that count (PostgreSQL
+  EXPLAIN), constant-time whatever the table size; SQLite has no
+  estimate and falls back to exact.
+- none: no count at all.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from sqlalchemy import Row, Select, func, literal, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services import models
+
+CountMode = Literal["exact", "estimated", "none"]
+
+
+def filtered(
+    query: Select,
+    source: Optional[str] = None,
+    ticker: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Select:
+    record = models.NormalizedRecord
+    if source:
+        query = query.where(record.source == source)
+    if ticker:
+        query = query.where(record.ticker == ticker.upper())
+    if start:
+        query = query.where(record.created_at >= start)
+    if end:
+        query = query.where(record.created_at <= end)
+    return query
+
+
+@dataclass(frozen=True)
+class SortKey:
+    column: Any
+    nullable: bool = False
+    # Cursor JSON value -> column value
+    decode: Callable[[Any], Any] = lambda value: value
+
+
+# sort_by values of GET /data; each has a (column, id) index on normalized_records
+SORT_KEYS: Dict[str, SortKey] = {
+    "created_at": SortKey(models.NormalizedRecord.created_at, decode=datetime.fromisoformat),
+    "market_cap_usd": SortKey(models.NormalizedRecord.market_cap_usd, nullable=True, decode=float),
+    "volume_24h_usd": SortKey(models.NormalizedRecord.volume_24h_usd, nullable=True, decode=float),
+    "percent_change_24h": SortKey(models.NormalizedRecord.percent_change_24h, nullable=True, decode=float),
+    "price_usd": SortKey(models.NormalizedRecord.price_usd, decode=float),
+}
+SortBy = Literal["created_at", "market_cap_usd", "volume_24h_usd", "percent_change_24h", "price_usd"]
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Keyset position: the page continues after (value, id), or before it when backward."""
+    sort: str
+    descending: bool
+    value: Any
+    id: str
+    backward: bool = False
+
+    def encode(self) -> str:
+        value = self.value.isoformat() if isinstance(self.value, datetime) else self.value
+        payload = [self.sort, self.descending, value, self.id, self.backward]
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Raises ValueError if token is not a cursor issued by encode."""
+        try:
+            sort, descending, value, record_id, backward = json.loads(
+                base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            )
+            key = SORT_KEYS[sort]
+            return cls(sort, bool(descending), None if value is None else key.decode(value), str(record_id), bool(backward))
+        except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    @classmethod
+    def at(cls, row: Row, sort: str, descending: bool, backward: bool = False) -> "Cursor":
+        return cls(sort, descending, getattr(row, SORT_KEYS[sort].column.key), row.id, backward)
+
+
+@dataclass
+class Page:
+    # Every normalized_records column, by name
+    rows: List[Row]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def _segment(query: Select, key: SortKey, nulls: bool, descending: bool, after: Optional[Cursor]) -> Select:
+    # One index-ordered run of rows: the non-NULL sort values, or the NULL ones by id
+    record_id = models.NormalizedRecord.id
+    if nulls:
+        query = query.where(key.column.is_(None))
+        if after is not None:
+            query = query.where(record_id < after.id if descending else record_id > after.id)
+        return query.order_by(record_id.desc() if descending else record_id.asc())
+    if key.nullable:
+        query = query.where(key.column.isnot(None))
+    if after is not None:
+        position = tuple_(key.column, record_id)
+        bound = tuple_(literal(after.value, key.column.type), literal(after.id))
+        query = query.where(position < bound if descending else position > bound)
+    return query.order_by(*((key.column.desc(), record_id.desc()) if descending else (key.column, record_id)))
+
+
+async def page(
+    session: AsyncSession,
+    limit: int,
+    offset: int = 0,
+    sort: str = "created_at",
+    descending: bool = True,
+    cursor: Optional[Cursor] = None,
+    **filters,
+) -> Page:
+    """
+    One page of matching records, by offset or after/before a cursor.
+
+    Raises:
+        ValueError: If cursor was issued for a different sort.
+    """
+    key = SORT_KEYS[sort]
+    base = filtered(select(models.NormalizedRecord.__table__), **filters)
+
+    if cursor is None and offset:
+        record_id = models.NormalizedRecord.id
+        column = key.column.desc() if descending else key.column.asc()
+        query = base.order_by(
+            column.nulls_last() if key.nullable else column,
+            record_id.desc() if descending else record_id.asc(),
+        )
+        rows = list(await session.execute(query.limit(limit + 1).offset(offset)))
+        result = Page(rows[:limit])
+        if len(rows) > limit:
+            result.next_cursor = Cursor.at(rows[limit - 1], sort, descending).encode()
+        if result.rows:
+            result.prev_cursor = Cursor.at(result.rows[0], sort, descending, backward=True).encode()
+        return result
+
+    if cursor is not None and (cursor.sort, cursor.descending) != (sort, descending):
+        raise ValueError("Cursor was issued for a different sort order")
+    backward = cursor is not None and cursor.backward
+    # Segments in reading order; a backward page reads the reversed order
+    segments = [(False, descending), (True, descending)] if key.nullable else [(False, descending)]
+    if backward:
+        segments = [(nulls, not desc) for nulls, desc in reversed(segments)]
+
+    # One row past the page tells whether there is another
+    rows: List[Row] = []
+    reached = cursor is None
+    for nulls, desc in segments:
+        after = None
+        if not reached:
+            if (cursor.value is None) != nulls:
+                continue
+            after, reached = cursor, True
+        query = _segment(base, key, nulls, desc, after).limit(limit + 1 - len(rows))
+        rows.extend(await session.execute(query))
+        if len(rows) > limit:
+            break
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    result = Page(rows)
+    if rows:
+        if more or backward:
+            result.next_cursor = Cursor.at(rows[-1], sort, descending).encode()
+        if (more and backward) or (cursor is not None and not backward):
+            result.prev_cursor = Cursor.at(rows[0], sort, descending, backward=True).encode()
+    return result
+
+
+async def count(session: AsyncSession, mode: CountMode = "exact", **filters) -> Tuple[Optional[int], bool]:
+    """
+    Number of matching records.
+
+    Returns:
+        (total, estimated): total is None for mode "none"; estimated is True
+        when total is the planner's estimate rather than an exact count.
+    """
+    if mode == "none":
+        return None, False
+    record = models.NormalizedRecord
+    if mode == "estimated" and session.get_bind().dialect.name == "postgresql":
+        return await _estimate(session, filtered(select(literal(1)).select_from(record), **filters)), True
+    query = filtered(select(func.count()).select_from(record), **filters)
+    return (await session.execute(query)).scalar_one(), False
+
+
+async def _estimate(session: AsyncSession, query: Select) -> int:
+    # The planner's row estimate for the plain filtered select (its top plan
+    # node), read from EXPLAIN without running it. Compiled with named
+    # parameters so it can be re-issued as text()
+    compiled = query.compile(dialect=postgresql.dialect(paramstyle="named"))
+    plan = (await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)).scalar_one()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,35 @@
+"""
+Small ETL state shared between processes: JSON values in the etl_state table.
+
+Used for the adaptive schedule's last decision (ingestion.schedule) and the
+dataset version behind the response cache (services.cache).
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services import models
+
+
+async def save_state(session: AsyncSession, key: str, value: Dict[str, Any]) -> None:
+    row = await session.get(models.ETLState, key)
+    if row is None:
+        row = models.ETLState(key=key)
+        session.add(row)
+    row.value = json.dumps(value)
+    row.updated_at = datetime.utcnow()
+    await session.flush()
+
+
+async def load_state(session: AsyncSession, key: str) -> Optional[Dict[str, Any]]:
+    row = await session.get(models.ETLState, key)
+    return json.loads(row.value) if row is not None and row.value else None
+
+
+async def load_all(session: AsyncSession) -> Dict[str, Any]:
+    """Every key's value, in one query."""
+    rows = (await session.execute(select(models.ETLState))).scalars()
+    return {row.key: json.loads(row.value) for row in rows if row.value}
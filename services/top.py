@@ -0,0 +1,94 @@
+"""
+In-memory top-N lists for GET /data/top.
+
+The board holds the TOP_SIZE largest (or smallest) records of each list in
+LISTS, picked with heapq from one read of normalized_records. It is rebuilt
+after every ETL run, so answering /data/top is a slice of a list in memory
+with no database round trip:
+
+- ETL_MODE=inline: a JobManager listener rebuilds it when a job finishes.
+- ETL_MODE=worker: the ETL commits in another process, so watch() polls
+  data_version() (one tiny query per interval, not per request) and
+  rebuilds when it changes.
+
+Order within a list matches GET /data?sort_by=<column>&order=<order>: by
+value, then by id in the same direction.
+"""
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from services import models
+
+logger = logging.getLogger(__name__)
+
+TOP_SIZE = 100
+# list name -> (column, largest first)
+LISTS = {
+    "market_cap_usd": ("market_cap_usd", True),
+    "volume_24h_usd": ("volume_24h_usd", True),
+    "price_usd": ("price_usd", True),
+    "gainers": ("percent_change_24h", True),
+    "losers": ("percent_change_24h", False),
+}
+
+
+@dataclass
+class TopBoard:
+    lists: Dict[str, List[Dict[str, Any]]] = field(default_factory=lambda: {name: [] for name in LISTS})
+    built_at: Optional[datetime] = None
+    # data_version() the board was built from
+    version: Any = None
+
+
+def build(rows: List[Dict[str, Any]], size: int = TOP_SIZE) -> Dict[str, List[Dict[str, Any]]]:
+    """The first size rows of every list; rows without a value for a list's column are left out of it."""
+    lists = {}
+    for name, (column, largest) in LISTS.items():
+        candidates = (row for row in rows if row[column] is not None)
+        pick = heapq.nlargest if largest else heapq.nsmallest
+        lists[name] = pick(size, candidates, key=lambda row: (row[column], row["id"]))
+    return lists
+
+
+_board = TopBoard()
+
+
+def get_board() -> TopBoard:
+    return _board
+
+
+async def data_version(session: AsyncSession) -> Optional[datetime]:
+    """Changes whenever an ETL run finishes."""
+    return (await session.execute(select(func.max(models.ETLRun.finished_at)))).scalar()
+
+
+async def refresh(sessionmaker: async_sessionmaker) -> TopBoard:
+    """Rebuild the board from normalized_records and swap it in."""
+    global _board
+    async with sessionmaker() as session:
+        version = await data_version(session)
+        result = await session.execute(select(models.NormalizedRecord.__table__))
+        rows = [dict(row) for row in result.mappings()]
+    _board = TopBoard(build(rows), datetime.utcnow(), version)
+    logger.info("Top lists rebuilt from %d records", len(rows))
+    return _board
+
+
+async def watch(sessionmaker: async_sessionmaker, interval: float) -> None:
+    """Rebuild the board whenever data_version() moves; runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with sessionmaker() as session:
+                version = await data_version(session)
+            if version != _board.version:
+                await refresh(sessionmaker)
+        except Exception:
+            logger.exception("Top lists refresh failed")
@@ -0,0 +1,26 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ingestion import watermarks
+from services import cache, models
+
+
+@pytest.fixture(autouse=True)
+def reset_response_cache():
+    """Every test starts from an empty response cache; test databases all begin at the initial version."""
+    cache.reset()
+    yield
+    cache.reset()
+
+
+@pytest_asyncio.fixture
+async def sessionmaker():
+    """Session factory for a fresh in-memory SQLite database with every table created."""
+    # Watermarks cached from another test's database would skip this one's payloads
+    watermarks._caches.clear()
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
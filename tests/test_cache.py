@@ -0,0 +1,184 @@
+"""Unit tests for the versioned response cache behind GET /data and GET /stats."""
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from api.deps import get_db
+from api.main import app
+from services import cache, models
+from services.cache import ResponseCache
+from services.state import save_state
+
+
+async def _add_record(sessionmaker, ticker: str) -> None:
+    async with sessionmaker() as session:
+        session.add(models.NormalizedRecord(
+            id=f"test_{ticker}", ticker=ticker, price_usd=1.0, source="test", created_at=datetime(2024, 1, 15),
+        ))
+        await session.commit()
+
+
+def _run(status: str, finished_at: datetime) -> models.ETLRun:
+    return models.ETLRun(source="test", status=status, started_at=datetime(2024, 1, 15), finished_at=finished_at)
+
+
+class TestResponseCache:
+    def test_lru_eviction_and_counters(self):
+        response_cache = ResponseCache(2)
+        response_cache.put("a", "v1", 1)
+        response_cache.put("b", "v1", 2)
+        assert response_cache.get("a", "v1") == 1
+        response_cache.put("c", "v1", 3)
+
+        assert response_cache.get("b", "v1") is None
+        assert response_cache.get("a", "v1") == 1
+        assert response_cache.stats() == {
+            "entries": 2, "max_entries": 2, "hits": 2, "misses": 1, "evictions": 1, "hit_ratio": 0.6667,
+        }
+
+    def test_stale_version_is_a_miss(self):
+        response_cache = ResponseCache(2)
+        response_cache.put("a", "v1", 1)
+        assert response_cache.get("a", "v2") is None
+        assert response_cache.stats()["entries"] == 0
+
+    def test_zero_size_disables(self):
+        response_cache = ResponseCache(0)
+        response_cache.put("a", "v1", 1)
+        assert response_cache.get("a", "v1") is None
+
+
+class TestDatasetVersion:
+    @pytest.mark.asyncio
+    async def test_bump_applies_locally_at_once(self, sessionmaker):
+        async with sessionmaker() as session:
+            assert (await cache.dataset_version(session)).token == cache.INITIAL_VERSION
+            version = await cache.bump_dataset_version(session)
+            assert (await cache.dataset_version(session)).token == version.token
+
+    @pytest.mark.asyncio
+    async def test_other_process_bump_is_seen_after_ttl(self, sessionmaker):
+        async with sessionmaker() as session:
+            assert (await cache.dataset_version(session)).token == cache.INITIAL_VERSION
+            # Another process stores a new version directly
+            await save_state(session, cache.VERSION_KEY, {"version": "elsewhere"})
+            await session.commit()
+            assert (await cache.dataset_version(session)).token == cache.INITIAL_VERSION
+            with patch.object(cache.get_settings(), "response_cache_version_ttl", 0.0):
+                assert (await cache.dataset_version(session)).token == "elsewhere"
+
+    @pytest.mark.asyncio
+    async def test_last_modified_is_the_last_successful_run(self, sessionmaker):
+        async with sessionmaker() as session:
+            session.add_all([
+                _run("success", datetime(2024, 1, 15, 10)),
+                _run("failure", datetime(2024, 1, 15, 11)),
+            ])
+            await session.commit()
+            assert (await cache.dataset_version(session)).last_modified == datetime(2024, 1, 15, 10)
+            version = await cache.bump_dataset_version(session)
+            assert version.last_modified == datetime(2024, 1, 15, 10)
+            assert (await cache.dataset_version(session)).last_modified == datetime(2024, 1, 15, 10)
+
+
+class TestCachedEndpoints:
+    @pytest.mark.asyncio
+    async def test_data_is_cached_until_the_version_changes(self, sessionmaker):
+        await _add_record(sessionmaker, "AAA")
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                first = (await client.get("/data", params={"ticker": "aaa"})).json()
+                # Same normalized parameters: served from the cache, the new row is not seen
+                await _add_record(sessionmaker, "AAB")
+                second = (await client.get("/data", params={"ticker": "AAA"})).json()
+                unfiltered = (await client.get("/data")).json()
+                async with sessionmaker() as session:
+                    await cache.bump_dataset_version(session)
+                third = (await client.get("/data", params={"ticker": "AAA"})).json()
+                fresh = (await client.get("/data")).json()
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert [first["meta"]["cache"], second["meta"]["cache"], third["meta"]["cache"]] == ["miss", "hit", "miss"]
+        assert second["data"] == first["data"]
+        assert unfiltered["pagination"]["total"] == 2
+        assert fresh["meta"]["cache"] == "miss"
+
+    @pytest.mark.asyncio
+    async def test_stats_summary_is_cached(self, sessionmaker):
+        await _add_record(sessionmaker, "AAA")
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                first = (await client.get("/stats")).json()
+                await _add_record(sessionmaker, "AAB")
+                second = (await client.get("/stats")).json()
+                async with sessionmaker() as session:
+                    await cache.bump_dataset_version(session)
+                third = (await client.get("/stats")).json()
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert [first["total_normalized"], second["total_normalized"], third["total_normalized"]] == [1, 1, 2]
+        assert second["cache"]["hits"] == 1
+        assert third["cache"]["dataset_version"] != first["cache"]["dataset_version"]
+
+
+class TestConditionalGet:
+    @pytest.mark.asyncio
+    async def test_if_none_match_gets_304_without_a_query(self, sessionmaker):
+        await _add_record(sessionmaker, "AAA")
+        async with sessionmaker() as session:
+            session.add(_run("success", datetime(2024, 1, 15, 10, 30)))
+            await session.commit()
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        async def no_database():
+            # Any query fails the request
+            yield MagicMock(execute=MagicMock(side_effect=AssertionError("queried the database")))
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                first = await client.get("/data", params={"ticker": "AAA"})
+                other = await client.get("/data", params={"ticker": "AAB"})
+                stats = await client.get("/stats")
+                app.dependency_overrides[get_db] = no_database
+                tag = first.headers["etag"]
+                repeat = await client.get("/data", params={"ticker": "aaa"}, headers={"If-None-Match": f'W/{tag}, "x"'})
+                since = await client.get("/data", params={"ticker": "AAA"}, headers={
+                    "If-Modified-Since": first.headers["last-modified"],
+                })
+                app.dependency_overrides[get_db] = override
+                # /stats needs one query, for the newest finished run, before it can answer 304
+                stats_repeat = await client.get("/stats", headers={"If-None-Match": stats.headers["etag"]})
+                async with sessionmaker() as session:
+                    await cache.bump_dataset_version(session)
+                changed = await client.get("/data", params={"ticker": "AAA"}, headers={"If-None-Match": tag})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert first.status_code == 200
+        assert first.headers["last-modified"] == "Mon, 15 Jan 2024 10:30:00 GMT"
+        assert first.headers["cache-control"] == "public, max-age=0, must-revalidate"
+        assert other.headers["etag"] != tag
+        assert (repeat.status_code, repeat.content, repeat.headers["etag"]) == (304, b"", tag)
+        assert since.status_code == stats_repeat.status_code == 304
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != tag
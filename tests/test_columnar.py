@@ -0,0 +1,193 @@
+"""Property tests: the columnar batch transforms must match the per-record transforms."""
+from datetime import datetime
+
+from hypothesis import given, settings, strategies as st
+
+from ingestion.columnar import NormalizedBatch, transform_api_batch, transform_csv_batch
+from ingestion.normalize import merge_many
+from ingestion.transform import parse_last_updated, transform_api_record, transform_csv_record
+
+
+# Mostly well-formed API values, plus every shape the per-record path treats specially
+numbers = st.one_of(
+    st.floats(),
+    st.integers(min_value=-(10**30), max_value=10**30),
+    st.floats(min_value=0, max_value=1e7).map(lambda value: round(value, 9)),
+    st.sampled_from([0, 0.0, None, True, False, "", "45000.5", "abc", " 1e3 ", 10**400, [], [1]]),
+)
+timestamps = st.one_of(
+    st.datetimes(min_value=datetime(1, 1, 1)).map(lambda value: value.strftime("%Y-%m-%dT%H:%M:%SZ")),
+    st.sampled_from([
+        "2024-01-15T10:30:00+02:00",
+        "2024-01-15T10:30:00.123Z",
+        "2024-02-30T10:30:00Z",
+        "2024-01-15T23:59:60Z",
+        "0000-01-01T00:00:00Z",
+        "2024-01-15",
+        "",
+        None,
+        1705314600,
+    ]),
+    st.text(max_size=25),
+)
+usd_quotes = st.fixed_dictionaries(
+    {},
+    optional={
+        "price": numbers,
+        "market_cap": numbers,
+        "volume_24h": numbers,
+        "percent_change_24h": numbers,
+        "last_updated": timestamps,
+    },
+)
+payloads = st.fixed_dictionaries(
+    {
+        "id": st.one_of(st.text(max_size=10), st.integers()),
+        "symbol": st.one_of(st.sampled_from(["btc", " eth ", "BTC", "Usdt"]), st.text(max_size=5), st.none(), st.integers()),
+        "quotes": st.one_of(
+            st.fixed_dictionaries({"USD": usd_quotes}),
+            st.sampled_from([{}, {"USD": None}, None]),
+        ),
+    },
+    optional={"name": st.one_of(st.text(max_size=10), st.none(), st.integers())},
+)
+# Payloads the whole-batch column path accepts (CoinPaprika's normal shape)
+regular_payloads = st.fixed_dictionaries(
+    {
+        "id": st.text(max_size=10),
+        "symbol": st.text(max_size=5),
+        "quotes": st.fixed_dictionaries({"USD": st.fixed_dictionaries(
+            {},
+            optional={
+                key: st.one_of(st.floats(), st.integers(min_value=-(10**20), max_value=10**20), st.booleans(), st.none())
+                for key in ("price", "market_cap", "volume_24h", "percent_change_24h")
+            } | {"last_updated": st.one_of(
+                st.datetimes(min_value=datetime(1000, 1, 1)).map(lambda value: value.strftime("%Y-%m-%dT%H:%M:%SZ")),
+                st.sampled_from(["2024-02-30T10:30:00Z", "2024-01-15T10:30:00+02:00", None]),
+            )},
+        )}),
+    },
+    optional={"name": st.one_of(st.text(max_size=10), st.none())},
+)
+
+
+# CSV cells are strings; the row may also lack a column entirely
+cells = st.one_of(
+    st.floats().map(repr),
+    st.integers(min_value=-(10**30), max_value=10**30).map(str),
+    st.sampled_from(["", "abc", " 1e3 ", "1_000", "nan", "-0"]),
+)
+csv_rows = st.fixed_dictionaries(
+    {"symbol": st.text(max_size=6)},
+    optional={
+        "name": st.text(max_size=10),
+        "price_usd": cells,
+        "market_cap_usd": cells,
+        "volume_24h_usd": cells,
+        "percent_change_24h": cells,
+        "created_at": timestamps.filter(lambda value: isinstance(value, str)),
+        "external_id": st.text(max_size=10),
+    },
+)
+
+
+def _comparable(record, compare_created_at: bool) -> dict:
+    data = record.model_dump(exclude={"ingested_at"})
+    if not compare_created_at:
+        data.pop("created_at")
+    # repr() so NaN == NaN and -0.0 != 0.0
+    return {key: repr(value) for key, value in data.items()}
+
+
+def _has_timestamp(payload) -> bool:
+    usd_quote = payload["quotes"].get("USD", {})
+    return "last_updated" in usd_quote and parse_last_updated(usd_quote["last_updated"]) is not None
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.one_of(st.lists(payloads, max_size=30), st.lists(regular_payloads, max_size=30)))
+def test_matches_transform_api_record(batch):
+    expected, expected_failed = [], []
+    for index, payload in enumerate(batch):
+        try:
+            expected.append((payload, transform_api_record(payload)))
+        except Exception:
+            expected_failed.append(index)
+
+    result = transform_api_batch(batch)
+
+    assert result.failed == expected_failed
+    records = result.batch.to_records()
+    assert len(records) == len(expected)
+    for record, (payload, want) in zip(records, expected):
+        compare_created_at = _has_timestamp(payload)
+        assert _comparable(record, compare_created_at) == _comparable(want, compare_created_at)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(csv_rows, max_size=30))
+def test_csv_batch_matches_transform_csv_record(batch):
+    expected, expected_failed = [], []
+    for index, payload in enumerate(batch):
+        try:
+            expected.append((payload, transform_csv_record(payload)))
+        except Exception:
+            expected_failed.append(index)
+
+    result = transform_csv_batch(batch)
+
+    assert result.failed == expected_failed
+    records = result.batch.to_records()
+    assert len(records) == len(expected)
+    for record, (payload, want) in zip(records, expected):
+        compare_created_at = parse_last_updated(payload.get("created_at")) is not None
+        assert _comparable(record, compare_created_at) == _comparable(want, compare_created_at)
+
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(
+    st.tuples(
+        st.sampled_from(["BTC", "ETH", "USDT", "SOL"]),
+        st.floats(allow_nan=False, min_value=0, max_value=1e6),
+        st.one_of(st.none(), st.floats(allow_nan=False, min_value=0, max_value=1e12)),
+        st.datetimes(min_value=datetime(2024, 1, 1), max_value=datetime(2024, 1, 2)),
+    ),
+    max_size=30,
+))
+def test_collapse_matches_merge_many(rows):
+    batch = transform_api_batch([
+        {
+            "id": f"coin-{i}",
+            "symbol": symbol,
+            "name": f"Coin {i}",
+            "quotes": {"USD": {
+                "price": price,
+                "market_cap": market_cap,
+                "last_updated": created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }},
+        }
+        for i, (symbol, price, market_cap, created_at) in enumerate(rows)
+    ]).batch
+
+    collapsed = {record.ticker: record for record in batch.collapse().to_records()}
+    merged = {record.ticker: record for record in merge_many(batch.to_records())}
+
+    assert collapsed.keys() == merged.keys()
+    for ticker, record in merged.items():
+        assert collapsed[ticker].model_dump(exclude={"id", "ingested_at"}) == record.model_dump(exclude={"id", "ingested_at"})
+
+
+def test_nan_is_not_treated_as_missing():
+    result = transform_api_batch([
+        {"id": "x", "symbol": "X", "quotes": {"USD": {"price": 1.0, "market_cap": float("nan"), "volume_24h": 0}}},
+    ])
+    row = result.batch.to_rows()[0]
+    assert row["market_cap_usd"] != row["market_cap_usd"]
+    assert row["volume_24h_usd"] is None
+
+
+def test_empty_batch():
+    result = transform_api_batch([])
+    assert len(result.batch) == 0
+    assert result.failed == []
+    assert len(NormalizedBatch.from_records([]).collapse()) == 0
@@ -0,0 +1,156 @@
+"""Unit tests for the memory-mapped CSV source."""
+import json
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import select
+
+from ingestion import runner
+from ingestion.sources.csv_source import CSVSource, iter_csv_batches
+from services import models
+
+HEADER = "symbol,name,price_usd,market_cap_usd,volume_24h_usd,percent_change_24h,created_at\n"
+
+
+def _write_csv(path, count: int, start: int = 0, header: bool = True) -> None:
+    with open(path, "a", newline="") as handle:
+        if header:
+            handle.write(HEADER)
+        for i in range(start, start + count):
+            handle.write(f'c{i},"Coin {i}, Inc",{i}.5,{i * 10},,1.25,2024-01-15T10:{i % 60:02d}:00Z\n')
+
+
+class TestIterCSVBatches:
+    def test_small_chunks_yield_every_row_once(self, tmp_path):
+        path = tmp_path / "quotes.csv"
+        _write_csv(path, 25)
+
+        batches = list(iter_csv_batches(str(path), batch_size=4, chunk_bytes=64))
+        rows = [row for batch in batches for row in batch]
+
+        assert [row["symbol"] for row in rows] == [f"c{i}" for i in range(25)]
+        assert rows[3]["name"] == "Coin 3, Inc"
+        assert rows[0]["volume_24h_usd"] == ""
+        assert all(len(batch) <= 4 for batch in batches)
+        assert batches[-1].end_offset == path.stat().st_size
+        assert rows[0]["external_id"] == f"csv:quotes.csv:{len(HEADER)}"
+
+    def test_resume_from_end_offset(self, tmp_path):
+        path = tmp_path / "quotes.csv"
+        _write_csv(path, 10)
+
+        first = next(iter_csv_batches(str(path), batch_size=3, chunk_bytes=100))
+        rest = [row["symbol"] for batch in iter_csv_batches(str(path), first.end_offset, batch_size=3)
+                for row in batch]
+
+        assert [row["symbol"] for row in first] == ["c0", "c1", "c2"]
+        assert rest == [f"c{i}" for i in range(3, 10)]
+
+    def test_offset_past_end_starts_over(self, tmp_path):
+        path = tmp_path / "quotes.csv"
+        _write_csv(path, 2)
+
+        rows = [row for batch in iter_csv_batches(str(path), start_offset=10_000) for row in batch]
+        assert len(rows) == 2
+
+    def test_crlf_and_blank_lines(self, tmp_path):
+        path = tmp_path / "quotes.csv"
+        path.write_bytes(b"symbol,price_usd\r\nBTC,1\r\n\r\nETH,2\r\n")
+
+        rows = [row for batch in iter_csv_batches(str(path)) for row in batch]
+        assert [(row["symbol"], row["price_usd"]) for row in rows] == [("BTC", "1"), ("ETH", "2")]
+
+
+async def _ingest(sessionmaker, source: CSVSource) -> models.ETLRun:
+    with patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+            patch.object(runner.settings, "upsert_batch_size", 4):
+        async with sessionmaker() as session:
+            await runner._ingest_source(session, source)
+            await session.commit()
+    async with sessionmaker() as session:
+        result = await session.execute(select(models.ETLRun).order_by(models.ETLRun.id.desc()))
+        return result.scalars().first()
+
+
+class TestIngestCSV:
+    @pytest.mark.asyncio
+    async def test_load_then_resume_appended_rows(self, sessionmaker, tmp_path):
+        path = tmp_path / "quotes.csv"
+        _write_csv(path, 10)
+        source = CSVSource(str(path), chunk_bytes=128)
+
+        run = await _ingest(sessionmaker, source)
+        assert run.status == "success"
+        assert run.processed == 10
+        assert "records_per_s" in json.loads(run.stats)
+
+        _write_csv(path, 3, start=10, header=False)
+        run = await _ingest(sessionmaker, source)
+        assert run.processed == 3
+
+        async with sessionmaker() as session:
+            checkpoint = (await session.execute(select(models.ETLCheckpoint))).scalar_one()
+            archived = (await session.execute(select(models.RawCSVRecord.external_id))).scalars().all()
+            records = (await session.execute(select(models.NormalizedRecord))).scalars().all()
+
+        assert checkpoint.last_offset == path.stat().st_size
+        assert len(archived) == 13
+        assert len(records) == 13
+        c3 = {record.ticker: record for record in records}["C3"]
+        assert c3.source == "csv"
+        assert c3.price_usd == 3.5
+        assert c3.volume_24h_usd is None
+
+    @pytest.mark.asyncio
+    async def test_failed_write_keeps_committed_offset(self, sessionmaker, tmp_path):
+        path = tmp_path / "quotes.csv"
+        _write_csv(path, 10)
+        source = CSVSource(str(path))
+        write_batch = runner._write_batch
+        writes = 0
+
+        async def fail_second(*args):
+            nonlocal writes
+            writes += 1
+            if writes == 2:
+                raise RuntimeError("disk full")
+            await write_batch(*args)
+
+        with patch.object(runner, "_write_batch", fail_second), pytest.raises(RuntimeError):
+            await _ingest(sessionmaker, source)
+
+        run = await _ingest(sessionmaker, source)
+        async with sessionmaker() as session:
+            tickers = (await session.execute(select(models.NormalizedRecord.ticker))).scalars().all()
+        # The first batch of 4 was committed before the failure and is not re-read
+        assert run.processed == 6
+        assert sorted(tickers) == sorted(f"C{i}" for i in range(10))
+
+    @pytest.mark.asyncio
+    async def test_backfill_keeps_every_quote_in_history(self, sessionmaker, tmp_path):
+        path = tmp_path / "quotes.csv"
+        with open(path, "w", newline="") as handle:
+            handle.write(HEADER)
+            for hour in range(24):
+                handle.write(f"btc,Bitcoin,{100 + hour},,,,2024-01-15T{hour:02d}:00:00Z\n")
+        source = CSVSource(str(path))
+
+        with patch.object(runner, "get_sources", lambda: [source]), \
+                patch.object(runner, "init_db", AsyncMock()), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                patch.object(runner.settings, "upsert_batch_size", 10):
+            await runner.run_once()
+
+        async with sessionmaker() as session:
+            history = (await session.execute(
+                select(models.PriceHistory.price_usd).order_by(models.PriceHistory.ts)
+            )).scalars().all()
+            hours = (await session.execute(
+                select(models.OHLCVRollup.bucket).where(models.OHLCVRollup.interval == "1h")
+            )).scalars().all()
+            record = (await session.execute(select(models.NormalizedRecord))).scalar_one()
+
+        # Batches of 10 rows of one ticker: collapsed to one row only in normalized_records
+        assert history == [100.0 + hour for hour in range(24)]
+        assert len(hours) == 24
+        assert record.price_usd == 123.0
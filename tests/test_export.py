@@ -0,0 +1,124 @@
+"""Unit tests for the streaming bulk export (GET /data/export)."""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from api.deps import get_sessionmaker
+from api.main import app
+from services import export, models
+
+START = datetime(2024, 1, 15, 10)
+
+
+@pytest_asyncio.fixture
+async def sessionmaker(sessionmaker):
+    async with sessionmaker() as session:
+        session.add_all([
+            models.NormalizedRecord(
+                id=f"{'csv' if i % 2 else 'coinpaprika'}_T{i}",
+                ticker=f"T{i}",
+                name='Coin, "quoted"' if i == 3 else None,
+                price_usd=float(i),
+                source="csv" if i % 2 else "coinpaprika",
+                created_at=START + timedelta(minutes=i),
+                ingested_at=START,
+            )
+            for i in range(7)
+        ])
+        await session.commit()
+    yield sessionmaker
+
+
+@pytest.mark.asyncio
+async def test_stream_chunks_reads_in_chunks(sessionmaker):
+    chunks = [chunk async for chunk in export.stream_chunks(sessionmaker, 3)]
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [row.ticker for chunk in chunks for row in chunk] == [f"T{i}" for i in range(7)]
+
+
+class TestExportEndpoint:
+    async def _get(self, sessionmaker, **params):
+        app.dependency_overrides[get_sessionmaker] = lambda: sessionmaker
+        try:
+            with patch.object(export, "stream_chunks", wraps=export.stream_chunks) as stream, \
+                    patch("api.routes.data.get_settings") as settings:
+                settings.return_value.export_chunk_size = 2
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.get("/data/export", params=params)
+        finally:
+            app.dependency_overrides.pop(get_sessionmaker, None)
+        self.chunk_sizes = [call.args[1] for call in stream.call_args_list]
+        return response
+
+    @pytest.mark.asyncio
+    async def test_ndjson_with_filters(self, sessionmaker):
+        response = await self._get(
+            sessionmaker, format="ndjson", source="csv", start_date=(START + timedelta(minutes=2)).isoformat(),
+        )
+
+        assert response.status_code == 200
+        assert self.chunk_sizes == [2]
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["ticker"] for line in lines] == ["T3", "T5"]
+        assert lines[0] == {
+            "id": "csv_T3", "ticker": "T3", "name": 'Coin, "quoted"', "price_usd": 3.0, "market_cap_usd": None,
+            "volume_24h_usd": None, "percent_change_24h": None, "source": "csv",
+            "created_at": "2024-01-15T10:03:00", "ingested_at": "2024-01-15T10:00:00",
+        }
+
+    @pytest.mark.asyncio
+    async def test_csv_has_a_header_and_every_row(self, sessionmaker):
+        response = await self._get(sessionmaker, format="csv")
+
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="normalized_records.csv"' in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert list(rows[0]) == export.COLUMNS
+        assert [row["ticker"] for row in rows] == [f"T{i}" for i in range(7)]
+        assert rows[3]["name"] == 'Coin, "quoted"'
+        assert rows[0]["market_cap_usd"] == ""
+        assert rows[0]["created_at"] == "2024-01-15T10:00:00"
+
+    @pytest.mark.asyncio
+    async def test_columnar_formats_need_pyarrow(self, sessionmaker):
+        with patch.object(export, "ARROW_AVAILABLE", False):
+            app.dependency_overrides[get_sessionmaker] = lambda: sessionmaker
+            try:
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    responses = [
+                        await client.get("/data/export", params={"format": fmt}) for fmt in export.ARROW_FORMATS
+                    ]
+            finally:
+                app.dependency_overrides.pop(get_sessionmaker, None)
+
+        assert [response.status_code for response in responses] == [501, 501]
+        assert "pyarrow" in responses[0].json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_arrow_and_parquet_round_trip(self, sessionmaker):
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        arrow = await self._get(sessionmaker, format="arrow", ticker="t3")
+        parquet = await self._get(sessionmaker, format="parquet")
+        # Row groups are never smaller than PARQUET_ROW_GROUP_ROWS
+        assert self.chunk_sizes == [export.PARQUET_ROW_GROUP_ROWS]
+
+        assert arrow.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(arrow.content).read_all()
+        assert table.schema == export.arrow_schema()
+        assert table.to_pylist() == [{
+            "id": "csv_T3", "ticker": "T3", "name": 'Coin, "quoted"', "price_usd": 3.0, "market_cap_usd": None,
+            "volume_24h_usd": None, "percent_change_24h": None, "source": "csv",
+            "created_at": START + timedelta(minutes=3), "ingested_at": START,
+        }]
+        table = pq.read_table(io.BytesIO(parquet.content))
+        assert table.column("ticker").to_pylist() == [f"T{i}" for i in range(7)]
+        assert table.column("price_usd").type == pa.float64()
@@ -0,0 +1,141 @@
+"""Unit tests for the price_history table and the downsampled history endpoint."""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+
+from api.deps import get_db
+from api.main import app
+from ingestion import load
+from ingestion.columnar import NormalizedBatch
+from ingestion.load import _next_month, append_price_history
+from schemas.record import NormalizedRecord
+from services import models
+from services.history import lttb_indices
+
+START = datetime(2024, 1, 15)
+
+
+def _record(ticker: str, minute: int, price: float, source: str = "coinpaprika") -> NormalizedRecord:
+    return NormalizedRecord(
+        id=f"{source}_{ticker}",
+        ticker=ticker,
+        price_usd=price,
+        volume_24h_usd=10.0,
+        source=source,
+        created_at=START + timedelta(minutes=minute),
+    )
+
+
+class TestLTTB:
+    def test_short_series_is_kept(self):
+        x = np.arange(5, dtype=np.float64)
+        assert lttb_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+
+    def test_keeps_endpoints_and_spikes(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.sin(x / 50)
+        y[337] = 25.0
+        kept = lttb_indices(x, y, 50)
+
+        assert len(kept) == 50
+        assert kept[0] == 0 and kept[-1] == 999
+        assert np.all(np.diff(kept) > 0)
+        assert 337 in kept
+
+
+def test_next_month_wraps_year():
+    assert _next_month(datetime(2024, 12, 1).date()) == datetime(2025, 1, 1).date()
+
+
+@pytest.mark.asyncio
+async def test_partitions_are_remembered_only_after_commit():
+    session = MagicMock(info={}, execute=AsyncMock())
+    session.get_bind.return_value.dialect.name = "postgresql"
+    month = START.date().replace(day=1)
+    with patch.object(load, "_history_partitions", set()):
+        await load.ensure_history_partitions(session, [START])
+        # Rolled back: the next batch creates the partition again
+        session.info.clear()
+        await load.ensure_history_partitions(session, [START])
+        creates = [call for call in session.execute.call_args_list if "CREATE TABLE" in str(call.args[0])]
+        assert len(creates) == 2
+        assert load._history_partitions == set()
+
+        load.history_partitions_committed(session)
+        assert load._history_partitions == {month}
+        await load.ensure_history_partitions(session, [START])
+        assert session.execute.await_count == 4
+
+
+@pytest_asyncio.fixture
+async def client(sessionmaker):
+    async def override():
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        yield http
+    app.dependency_overrides.pop(get_db, None)
+
+
+class TestAppendPriceHistory:
+    @pytest.mark.asyncio
+    async def test_appends_and_skips_known_quotes(self, sessionmaker):
+        first = [_record("BTC", 0, 100.0), _record("ETH", 0, 10.0)]
+        async with sessionmaker() as session:
+            assert len(await append_price_history(session, first)) == 2
+            # The same quotes again, plus one newer quote
+            again = NormalizedBatch.from_records(first + [_record("BTC", 1, 101.0)])
+            inserted = await append_price_history(session, again)
+            assert [(row["ticker"], row["price_usd"]) for row in inserted] == [("BTC", 101.0)]
+            await session.commit()
+            count = (await session.execute(select(func.count()).select_from(models.PriceHistory))).scalar_one()
+        assert count == 3
+
+
+class TestHistoryEndpoint:
+    @pytest.mark.asyncio
+    async def test_hourly_average(self, sessionmaker, client):
+        async with sessionmaker() as session:
+            # 3 hours of minute quotes; hour h has prices 100h .. 100h + 59
+            await append_price_history(session, [_record("BTC", m, 100 * (m // 60) + m % 60) for m in range(180)])
+            await append_price_history(session, [_record("ETH", 0, 1.0)])
+            await session.commit()
+
+        response = await client.get("/data/history/btc", params={"interval": "1h"})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ticker"] == "BTC"
+        assert [point["samples"] for point in body["data"]] == [60, 60, 60]
+        assert [point["price_usd"] for point in body["data"]] == [29.5, 129.5, 229.5]
+        assert body["data"][1]["ts"] == "2024-01-15T01:00:00"
+
+        response = await client.get(
+            "/data/history/BTC",
+            params={"interval": "1d", "start_date": "2024-01-15T01:00:00", "end_date": "2024-01-15T01:59:59"},
+        )
+        assert [(point["samples"], point["price_usd"]) for point in response.json()["data"]] == [(60, 129.5)]
+
+    @pytest.mark.asyncio
+    async def test_lttb_limits_points(self, sessionmaker, client):
+        async with sessionmaker() as session:
+            await append_price_history(session, [_record("BTC", m, float(m % 7)) for m in range(500)])
+            await session.commit()
+
+        response = await client.get("/data/history/BTC", params={"method": "lttb", "points": 40})
+        body = response.json()
+        assert body["meta"]["points"] == 40
+        assert body["data"][0]["ts"] == "2024-01-15T00:00:00"
+        assert body["data"][-1]["ts"] == (START + timedelta(minutes=499)).isoformat()
+
+    @pytest.mark.asyncio
+    async def test_unknown_ticker_is_empty(self, client):
+        response = await client.get("/data/history/NOPE")
+        assert response.status_code == 200
+        assert response.json()["data"] == []
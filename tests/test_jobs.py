@@ -0,0 +1,318 @@
+"""Unit tests for single-flight ETL jobs."""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.deps import get_db
+from api.main import app
+from ingestion import jobs
+from ingestion.jobs import (
+    JobManager,
+    claim_jobs,
+    enqueue_job,
+    etl_lock,
+    fail_stale_jobs,
+    get_queued_job,
+    heartbeat_jobs,
+    run_worker,
+)
+from ingestion.schedule import AdaptiveSchedule
+from services import models
+
+
+@asynccontextmanager
+async def _free_lock():
+    yield True
+
+
+@asynccontextmanager
+async def _held_elsewhere():
+    yield False
+
+
+class _BlockingRun:
+    """ETL stand-in that runs until released."""
+
+    def __init__(self, error: str = None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise RuntimeError(self.error)
+
+
+class TestJobManager:
+    @pytest.mark.asyncio
+    async def test_concurrent_triggers_share_one_run(self):
+        run = _BlockingRun()
+        manager = JobManager(run=run, lock=_free_lock)
+
+        first = manager.submit("startup")
+        await asyncio.sleep(0)
+        assert manager.submit("api") is first
+        assert manager.submit("scheduler") is first
+        run.release.set()
+        assert await manager.run("api") is first
+
+        assert run.calls == 1
+        assert first.status == "success"
+        assert first.merged == 3
+        assert manager.current is None
+
+        second = await manager.run("api")
+        assert second.id != first.id
+        assert run.calls == 2
+        assert manager.get(first.id) is first
+
+    @pytest.mark.asyncio
+    async def test_failure_is_recorded_not_raised(self):
+        run = _BlockingRun(error="upstream down")
+        run.release.set()
+        job = await JobManager(run=run, lock=_free_lock).run("cli")
+        assert job.status == "failure"
+        assert job.error == "upstream down"
+        assert job.to_dict()["finished_at"] is not None
+
+    @pytest.mark.asyncio
+    async def test_lock_held_by_another_process_skips(self):
+        run = _BlockingRun()
+        job = await JobManager(run=run, lock=_held_elsewhere).run("scheduler")
+        assert job.status == "skipped"
+        assert run.calls == 0
+
+
+class TestEtlLock:
+    @pytest.mark.asyncio
+    async def test_sqlite_lease_is_exclusive(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lock.db'}")
+        try:
+            async with etl_lock(engine) as first:
+                with patch.object(jobs, "_OWNER", "another-process"):
+                    async with etl_lock(engine) as second:
+                        assert first is True
+                        assert second is False
+            async with etl_lock(engine) as again:
+                assert again is True
+        finally:
+            await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_taken_over(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lock.db'}")
+        try:
+            with patch.object(jobs, "LEASE_TTL", -jobs.LEASE_TTL), patch.object(jobs, "_OWNER", "crashed"):
+                # Acquired and never released, as if the holder died
+                await jobs._acquire_lease(engine)
+            async with etl_lock(engine) as acquired:
+                assert acquired is True
+        finally:
+            await engine.dispose()
+
+
+class TestTriggerEndpoint:
+    @pytest.mark.asyncio
+    async def test_repeated_triggers_return_the_same_job(self):
+        run = _BlockingRun()
+        manager = JobManager(run=run, lock=_free_lock)
+        with patch.object(jobs, "_manager", manager), \
+                patch("api.routes.trigger.get_settings") as settings:
+            settings.return_value.scheduler_token = None
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                first = (await client.post("/trigger-etl")).json()
+                second = (await client.post("/trigger-etl")).json()
+                while not run.calls:
+                    await asyncio.sleep(0)
+                running = (await client.get(f"/trigger-etl/{first['job_id']}")).json()
+                run.release.set()
+                await manager.current.task
+                finished = (await client.get(f"/trigger-etl/{first['job_id']}")).json()
+                missing = await client.get("/trigger-etl/nope")
+
+        assert first["status"] == "triggered"
+        assert second == {**second, "status": "already_running", "job_id": first["job_id"]}
+        assert running["status"] == "running"
+        assert finished["status"] == "success"
+        assert finished["merged_triggers"] == 1
+        assert missing.status_code == 404
+        assert run.calls == 1
+
+
+class TestWorkerMode:
+    @pytest.mark.asyncio
+    async def test_api_queues_and_worker_runs_once(self, sessionmaker):
+        run = _BlockingRun()
+        run.release.set()
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            with patch("api.routes.trigger.get_settings") as settings:
+                settings.return_value.scheduler_token = None
+                settings.return_value.etl_mode = "worker"
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    first = (await client.post("/trigger-etl")).json()
+                    second = (await client.post("/trigger-etl")).json()
+                    queued = (await client.get(f"/trigger-etl/{first['job_id']}")).json()
+
+                    # Nothing ran in the API process
+                    assert run.calls == 0
+
+                    stop = asyncio.Event()
+                    manager = JobManager(run=run, lock=_free_lock)
+                    worker = asyncio.create_task(
+                        run_worker(sessionmaker, manager, poll_seconds=0.01, stop=stop)
+                    )
+                    while (await client.get(f"/trigger-etl/{first['job_id']}")).json()["status"] != "success":
+                        await asyncio.sleep(0.01)
+                    stop.set()
+                    await worker
+                    finished = (await client.get(f"/trigger-etl/{first['job_id']}")).json()
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert first["status"] == "triggered"
+        assert second == {**second, "status": "already_running", "job_id": first["job_id"]}
+        assert queued["status"] == "queued"
+        assert finished["merged_triggers"] == 1
+        assert finished["started_at"] is not None
+        assert run.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_rows_queued_by_racing_replicas_are_claimed_together(self, sessionmaker):
+        async with sessionmaker() as session:
+            for trigger in ("api", "scheduler"):
+                session.add(models.ETLJobRecord(
+                    id=trigger, trigger=trigger, status="queued", created_at=datetime.utcnow(), merged=0,
+                ))
+            await session.commit()
+            assert sorted(await claim_jobs(session, "w1")) == ["api", "scheduler"]
+            assert await claim_jobs(session, "w2") == []
+            assert (await get_queued_job(session, "api")).status == "running"
+
+    @pytest.mark.asyncio
+    async def test_stale_running_job_is_failed(self, sessionmaker):
+        async with sessionmaker() as session:
+            job = await enqueue_job(session, "api")
+            await claim_jobs(session)
+            assert await fail_stale_jobs(session) == 0
+            with patch.object(jobs, "HEARTBEAT_TIMEOUT", -jobs.HEARTBEAT_TIMEOUT):
+                # A new trigger no longer joins the dead job
+                fresh = await enqueue_job(session, "api")
+                assert await fail_stale_jobs(session) == 1
+            stale = await get_queued_job(session, job.id)
+
+        assert (stale.status, stale.error) == ("failure", "worker stopped")
+        assert fresh.id != job.id
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_keeps_a_running_job_alive(self, sessionmaker):
+        async with sessionmaker() as session:
+            job = await enqueue_job(session, "api")
+            await claim_jobs(session)
+            with patch.object(jobs, "HEARTBEAT_TIMEOUT", timedelta(seconds=0.5)):
+                await asyncio.sleep(0.6)
+                await heartbeat_jobs(session, [job.id])
+                assert await fail_stale_jobs(session) == 0
+                assert (await enqueue_job(session, "api")).id == job.id
+
+    @pytest.mark.asyncio
+    async def test_restarted_worker_recovers_from_a_dead_run(self, sessionmaker):
+        # The previous worker was restarted five minutes into a run
+        started = datetime.utcnow() - timedelta(minutes=5)
+        async with sessionmaker() as session:
+            session.add(models.ETLJobRecord(
+                id="dead", trigger="scheduler", status="running", created_at=started, started_at=started,
+                heartbeat_at=started, merged=0, worker="old-host:1",
+            ))
+            await session.commit()
+
+        run = _BlockingRun()
+        run.release.set()
+        stop = asyncio.Event()
+        schedule = AdaptiveSchedule(min_interval=3600, max_interval=3600, jitter=0.0)
+        worker = asyncio.create_task(run_worker(
+            sessionmaker, JobManager(run=run, lock=_free_lock), poll_seconds=0.01, schedule=schedule, stop=stop,
+        ))
+        while run.calls < 1:
+            await asyncio.sleep(0.01)
+        async with sessionmaker() as session:
+            triggered = await enqueue_job(session, "api")
+        while run.calls < 2:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+
+        async with sessionmaker() as session:
+            dead = await get_queued_job(session, "dead")
+            served = await get_queued_job(session, triggered.id)
+        assert (dead.status, dead.merged) == ("failure", 0)
+        assert served.status == "success"
+
+    @pytest.mark.asyncio
+    async def test_starting_worker_keeps_another_live_workers_run(self, sessionmaker):
+        now = datetime.utcnow()
+        async with sessionmaker() as session:
+            for worker, heartbeat in (("other-host:1", now), ("dead-host:1", now - timedelta(minutes=5))):
+                session.add(models.ETLJobRecord(
+                    id=worker, trigger="api", status="running", created_at=now, started_at=heartbeat,
+                    heartbeat_at=heartbeat, merged=0, worker=worker,
+                ))
+            await session.commit()
+
+        stop = asyncio.Event()
+        worker = asyncio.create_task(run_worker(
+            sessionmaker, JobManager(run=_BlockingRun(), lock=_free_lock), poll_seconds=0.01, stop=stop,
+        ))
+        await asyncio.sleep(0.05)
+        stop.set()
+        await worker
+
+        async with sessionmaker() as session:
+            live = await get_queued_job(session, "other-host:1")
+            dead = await get_queued_job(session, "dead-host:1")
+        assert live.status == "running"
+        assert dead.status == "failure"
+
+    @pytest.mark.asyncio
+    async def test_scheduled_job_merged_into_another_workers_run_stays_scheduled(self, sessionmaker):
+        now = datetime.utcnow()
+        calls = []
+
+        async def run():
+            calls.append(1)
+
+        async def enqueue(session, trigger):
+            # Another live worker is mid-run on the first attempt
+            if not calls and trigger == "scheduler" and not attempts:
+                attempts.append(1)
+                return jobs.EtlJob(id="other", trigger="api", status="running", merged=1, started_at=now)
+            return await enqueue_job(session, trigger)
+
+        attempts = []
+        stop = asyncio.Event()
+        schedule = AdaptiveSchedule(min_interval=0.05, max_interval=0.05, jitter=0.0)
+        with patch.object(jobs, "enqueue_job", enqueue):
+            worker = asyncio.create_task(run_worker(
+                sessionmaker, JobManager(run=run, lock=_free_lock), poll_seconds=0.01, schedule=schedule, stop=stop,
+            ))
+            await asyncio.wait_for(self._until(lambda: calls), timeout=5)
+            stop.set()
+            await worker
+        assert attempts == [1]
+
+    @staticmethod
+    async def _until(condition):
+        while not condition():
+            await asyncio.sleep(0.01)
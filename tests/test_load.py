@@ -0,0 +1,169 @@
+"""Unit tests for the bulk load path (SQL upsert vs. merge_records)."""
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ingestion.columnar import NormalizedBatch
+from ingestion.load import RawRecordWriter, upsert_normalized_batch
+from ingestion.normalize import merge_many, merge_records
+from schemas.record import NormalizedRecord
+from services import models
+
+
+@pytest_asyncio.fixture
+async def session(sessionmaker):
+    """In-memory SQLite session with all tables created."""
+    async with sessionmaker() as session:
+        yield session
+
+
+def _record(**overrides) -> NormalizedRecord:
+    data = {
+        "id": "coinpaprika_btc-bitcoin",
+        "ticker": "BTC",
+        "name": "Bitcoin",
+        "price_usd": 45000.0,
+        "market_cap_usd": 880000000000.0,
+        "volume_24h_usd": 25000000000.0,
+        "percent_change_24h": 2.5,
+        "source": "coinpaprika",
+        "created_at": datetime(2024, 1, 15, 10, 0, 0),
+        "ingested_at": datetime(2024, 1, 15, 10, 5, 0),
+    }
+    data.update(overrides)
+    return NormalizedRecord(**data)
+
+
+async def _load(session: AsyncSession, ticker: str) -> NormalizedRecord:
+    result = await session.execute(
+        select(models.NormalizedRecord).where(models.NormalizedRecord.ticker == ticker)
+    )
+    return NormalizedRecord.model_validate(result.scalar_one(), from_attributes=True)
+
+
+MERGE_CASES = [
+    # Newer incoming record: volatile fields come from incoming
+    (_record(), _record(price_usd=46000.0, created_at=datetime(2024, 1, 15, 11, 0, 0))),
+    # Older incoming record: existing values are kept
+    (_record(), _record(price_usd=43000.0, created_at=datetime(2024, 1, 15, 9, 0, 0))),
+    # Incoming missing optional fields falls back to existing values
+    (_record(), _record(market_cap_usd=None, volume_24h_usd=None, created_at=datetime(2024, 1, 15, 11, 0, 0))),
+    # Existing missing optional fields is filled from an older incoming record
+    (_record(market_cap_usd=None, percent_change_24h=None), _record(created_at=datetime(2024, 1, 15, 9, 0, 0))),
+    # Existing record without a name takes the incoming name
+    (_record(name=None), _record(name="Bitcoin Core", created_at=datetime(2024, 1, 15, 9, 0, 0))),
+    # Higher-priority source overrides name from an unknown source
+    (_record(source="csv", name="bitcoin"), _record(created_at=datetime(2024, 1, 15, 9, 0, 0))),
+    # Equal timestamps: incoming wins
+    (_record(), _record(price_usd=47000.0, source="csv")),
+]
+
+
+class TestUpsertNormalizedBatch:
+    """The SQL upsert must reproduce merge_records exactly."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("existing,incoming", MERGE_CASES)
+    async def test_upsert_matches_merge_records(self, session, existing, incoming):
+        await upsert_normalized_batch(session, [existing])
+        await upsert_normalized_batch(session, [incoming])
+
+        stored = await _load(session, "BTC")
+        expected = merge_records(existing, incoming)
+
+        assert stored.model_dump(exclude={"id"}) == expected.model_dump(exclude={"id"})
+        assert stored.id == "merged_btc"
+
+    @pytest.mark.asyncio
+    async def test_duplicate_tickers_in_one_batch(self, session):
+        """Duplicate tickers inside a batch collapse to a single row."""
+        older = _record(price_usd=1.0, created_at=datetime(2024, 1, 15, 9, 0, 0))
+        newer = _record(price_usd=2.0, created_at=datetime(2024, 1, 15, 11, 0, 0))
+
+        written = await upsert_normalized_batch(session, [newer, older, _record(ticker="ETH")])
+
+        assert written == 2
+        count = await session.execute(select(func.count(models.NormalizedRecord.id)))
+        assert count.scalar_one() == 2
+        assert (await _load(session, "BTC")).price_usd == 2.0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("existing,incoming", MERGE_CASES)
+    async def test_columnar_batch_matches_records(self, session, existing, incoming):
+        """A NormalizedBatch is written exactly like the equivalent records."""
+        await upsert_normalized_batch(session, NormalizedBatch.from_records([existing, _record(ticker="ETH")]))
+        await upsert_normalized_batch(session, NormalizedBatch.from_records([incoming, incoming]))
+
+        stored = await _load(session, "BTC")
+        expected = merge_records(existing, incoming)
+
+        assert stored.model_dump(exclude={"id"}) == expected.model_dump(exclude={"id"})
+        assert stored.id == "merged_btc"
+
+    @pytest.mark.asyncio
+    async def test_empty_batch(self, session):
+        """Empty batches do not touch the database."""
+        assert await upsert_normalized_batch(session, []) == 0
+        assert await upsert_normalized_batch(session, NormalizedBatch.from_records([])) == 0
+
+
+class TestMergeMany:
+    """Batch-level pre-merge."""
+
+    def test_folds_to_one_record_per_ticker(self):
+        records = [
+            _record(price_usd=1.0, created_at=datetime(2024, 1, 15, 11, 0, 0)),
+            _record(ticker="ETH", name="Ethereum"),
+            _record(price_usd=2.0, created_at=datetime(2024, 1, 15, 9, 0, 0)),
+        ]
+
+        merged = merge_many(records)
+
+        assert [record.ticker for record in merged] == ["BTC", "ETH"]
+        assert merged[0].price_usd == 1.0  # Newest record wins regardless of order
+
+    def test_matches_sequential_merge_records(self):
+        records = [case[0] for case in MERGE_CASES] + [case[1] for case in MERGE_CASES]
+        expected = None
+        for record in records:
+            expected = merge_records(expected, record)
+
+        assert merge_many(records) == [expected]
+
+    def test_empty(self):
+        assert merge_many([]) == []
+
+
+class TestRawRecordWriter:
+    """Buffered raw payload archiving."""
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self, session):
+        writer = RawRecordWriter(session, batch_size=2)
+
+        await writer.add({"external_id": "btc-bitcoin", "id": "btc-bitcoin"})
+        count = await session.execute(select(func.count(models.RawAPIRecord.id)))
+        assert count.scalar_one() == 0  # Still buffered
+
+        await writer.add({"external_id": "eth-ethereum", "id": "eth-ethereum"})
+        count = await session.execute(select(func.count(models.RawAPIRecord.id)))
+        assert count.scalar_one() == 2
+
+    @pytest.mark.asyncio
+    async def test_existing_external_ids_are_skipped(self, session):
+        writer = RawRecordWriter(session, batch_size=10)
+        for external_id in ["btc-bitcoin", "eth-ethereum", "btc-bitcoin"]:
+            await writer.add({"external_id": external_id})
+        assert await writer.flush() == 2
+
+        await writer.add({"external_id": "eth-ethereum"})
+        assert await writer.flush() == 0
+        assert writer.written == 2
+
+    @pytest.mark.asyncio
+    async def test_payload_without_external_id_raises(self, session):
+        writer = RawRecordWriter(session)
+        with pytest.raises(KeyError):
+            await writer.add({"id": "btc-bitcoin"})
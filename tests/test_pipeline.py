@@ -0,0 +1,296 @@
+"""Unit tests for the staged ETL pipeline and the runner built on it."""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import func, select
+
+from ingestion import runner, watermarks
+from ingestion.pipeline import run_pipeline
+from ingestion import parallel
+from ingestion.parallel import transform_pool
+from ingestion.sources import coinpaprika
+from ingestion.sources.http_client import NotModified
+from services import models
+
+
+async def _batches(count: int, size: int = 3):
+    for i in range(count):
+        yield list(range(i * size, (i + 1) * size))
+
+
+class TestRunPipeline:
+    """Ordering-independent behaviour of run_pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_all_batches_reach_the_writer(self):
+        written = []
+
+        async def transform(batch):
+            return [value * 2 for value in batch]
+
+        async def write(batch):
+            written.extend(batch)
+
+        stats = await run_pipeline(_batches(5), transform, write, transform_concurrency=2, write_concurrency=3)
+
+        assert sorted(written) == [value * 2 for value in range(15)]
+        assert set(stats["stages"]) == {"fetch", "transform", "write"}
+        assert stats["stages"]["write"]["records"] == 15
+        assert stats["stages"]["transform"]["concurrency"] == 2
+        assert stats["bottleneck"] in stats["stages"]
+
+    @pytest.mark.asyncio
+    async def test_bounded_queues_apply_backpressure(self):
+        """A stalled writer stops the producer after the queues fill up."""
+        produced = 0
+        release = asyncio.Event()
+
+        async def source():
+            nonlocal produced
+            for i in range(50):
+                produced += 1
+                yield [i]
+
+        async def transform(batch):
+            return batch
+
+        async def write(batch):
+            await release.wait()
+
+        task = asyncio.create_task(run_pipeline(source(), transform, write, queue_size=2))
+        await asyncio.sleep(0.05)
+        # 2 per queue + 1 held by each worker + 1 blocked in put()
+        assert produced <= 7
+        release.set()
+        stats = await task
+        assert produced == 50
+        assert stats["stages"]["write"]["queue_depth_max"] <= 2
+
+    @pytest.mark.asyncio
+    async def test_stage_error_propagates(self):
+        async def transform(batch):
+            raise RuntimeError("boom")
+
+        async def write(batch):
+            pass
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await run_pipeline(_batches(10), transform, write)
+
+
+SOURCE = coinpaprika.CoinPaprikaSource()
+
+
+def _payload(coin_id: str, symbol: str, price: float) -> dict:
+    return {
+        "id": coin_id,
+        "external_id": coin_id,
+        "symbol": symbol,
+        "name": coin_id,
+        "quotes": {"USD": {"price": price, "last_updated": "2024-01-15T10:30:00Z"}},
+    }
+
+
+class TestIngestAPI:
+    """Runner end to end against SQLite with a stubbed upstream."""
+
+    @pytest.mark.asyncio
+    async def test_run_records_stats(self, sessionmaker):
+        payloads = [_payload(f"coin-{i}", f"c{i}", float(i)) for i in range(7)]
+
+        async def stream(*args, batch_size=None, **kwargs):
+            for i in range(0, len(payloads), batch_size):
+                yield payloads[i : i + batch_size]
+
+        with patch.object(coinpaprika, "stream_api_records", stream), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                patch.object(runner.settings, "upsert_batch_size", 3):
+            async with sessionmaker() as session:
+                await runner._ingest_source(session, SOURCE)
+                await session.commit()
+
+        async with sessionmaker() as session:
+            run = (await session.execute(select(models.ETLRun))).scalar_one()
+            tickers = (await session.execute(select(models.NormalizedRecord.ticker))).scalars().all()
+
+        assert run.status == "success"
+        assert run.processed == 7
+        assert len(tickers) == 7
+        stats = json.loads(run.stats)
+        assert stats["stages"]["write"]["batches"] == 3
+
+    @pytest.mark.asyncio
+    async def test_unchanged_quotes_are_skipped(self, sessionmaker):
+        payloads = [_payload(f"coin-{i}", f"c{i}", float(i)) for i in range(4)]
+
+        async def stream(*args, **kwargs):
+            yield payloads
+
+        async def run() -> dict:
+            async with sessionmaker() as session:
+                await runner._ingest_source(session, SOURCE)
+                await session.commit()
+            async with sessionmaker() as session:
+                result = await session.execute(select(models.ETLRun).order_by(models.ETLRun.id.desc()).limit(1))
+                return json.loads(result.scalar_one().stats)["records"]
+
+        with patch.object(coinpaprika, "stream_api_records", stream), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker):
+            assert await run() == {"processed": 4, "failed": 0, "skipped": 0, "collapsed": 0}
+            assert await run() == {"processed": 0, "failed": 0, "skipped": 4, "collapsed": 0}
+
+            payloads[0]["quotes"]["USD"]["last_updated"] = "2024-01-15T10:35:00Z"
+            watermarks._caches.clear()  # Also works from a cold cache
+            assert await run() == {"processed": 1, "failed": 0, "skipped": 3, "collapsed": 0}
+
+        async with sessionmaker() as session:
+            checkpoint = (await session.execute(select(models.ETLCheckpoint))).scalar_one()
+        assert checkpoint.last_id == "2024-01-15T10:35:00Z"
+
+    @pytest.mark.asyncio
+    async def test_duplicate_tickers_are_collapsed(self, sessionmaker):
+        payloads = [_payload("btc-bitcoin", "btc", 1.0), _payload("btc-bitcash", "BTC", 2.0), _payload("eth", "eth", 3.0)]
+
+        async def stream(*args, **kwargs):
+            yield payloads
+
+        with patch.object(coinpaprika, "stream_api_records", stream), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker):
+            async with sessionmaker() as session:
+                await runner._ingest_source(session, SOURCE)
+                await session.commit()
+
+        async with sessionmaker() as session:
+            run = (await session.execute(select(models.ETLRun))).scalar_one()
+            btc = (await session.execute(
+                select(models.NormalizedRecord).where(models.NormalizedRecord.ticker == "BTC")
+            )).scalar_one()
+
+        assert json.loads(run.stats)["records"] == {"processed": 3, "failed": 0, "skipped": 0, "collapsed": 1}
+        assert btc.price_usd == 2.0  # Same result as upserting one at a time
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("processes", [0, 2])
+    async def test_process_pool_matches_inline(self, sessionmaker, processes):
+        """TRANSFORM_PROCESSES ships raw bytes to workers; results are the same as inline."""
+        payloads = [_payload(f"coin-{i}", f"c{i % 4}", float(i)) for i in range(9)]
+        for i, payload in enumerate(payloads):
+            # Distinct timestamps: batches may be written in any order
+            payload["quotes"]["USD"]["last_updated"] = f"2024-01-15T10:{i:02d}:00Z"
+        payloads.append({"id": "broken", "external_id": "broken", "symbol": "X", "quotes": None})
+
+        async def stream(*args, batch_size=None, raw=False, **kwargs):
+            items = [json.dumps(payload).encode() for payload in payloads] if raw else payloads
+            for i in range(0, len(items), batch_size):
+                yield items[i : i + batch_size]
+
+        pool = transform_pool(processes) if processes else None
+
+        async def run() -> dict:
+            async with sessionmaker() as session:
+                await runner._ingest_source(session, SOURCE, pool)
+                await session.commit()
+            async with sessionmaker() as session:
+                result = await session.execute(select(models.ETLRun).order_by(models.ETLRun.id.desc()).limit(1))
+                return json.loads(result.scalar_one().stats)["records"]
+
+        try:
+            with patch.object(coinpaprika, "stream_api_records", stream), \
+                    patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                    patch.object(runner.settings, "upsert_batch_size", 5), \
+                    patch.object(runner.settings, "transform_processes", processes):
+                assert await run() == {"processed": 9, "failed": 1, "skipped": 0, "collapsed": 1}
+                assert await run() == {"processed": 0, "failed": 1, "skipped": 9, "collapsed": 0}
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        async with sessionmaker() as session:
+            records = (await session.execute(
+                select(models.NormalizedRecord.ticker, models.NormalizedRecord.price_usd)
+                .order_by(models.NormalizedRecord.ticker)
+            )).all()
+            archived = (await session.execute(select(func.count(models.RawAPIRecord.id)))).scalar_one()
+        assert records == [("C0", 8.0), ("C1", 5.0), ("C2", 6.0), ("C3", 7.0)]
+        assert archived == 10
+
+    @pytest.mark.asyncio
+    async def test_transform_pool_is_kept_across_runs(self, sessionmaker):
+        payloads = [_payload("btc-bitcoin", "btc", 1.0)]
+
+        async def stream(*args, batch_size=None, raw=False, **kwargs):
+            yield [json.dumps(payload).encode() for payload in payloads] if raw else payloads
+
+        pools = []
+
+        def get_pool(processes):
+            pools.append(parallel.get_transform_pool(processes))
+            return pools[-1]
+
+        try:
+            with patch.object(coinpaprika, "stream_api_records", stream), \
+                    patch.object(runner, "get_sources", lambda: [SOURCE]), \
+                    patch.object(runner, "init_db", AsyncMock()), \
+                    patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                    patch.object(runner, "get_transform_pool", get_pool), \
+                    patch.object(runner.settings, "transform_processes", 1):
+                for minute, price in enumerate((1.0, 2.0)):
+                    payloads[0]["quotes"]["USD"].update(price=price, last_updated=f"2024-01-15T11:0{minute}:00Z")
+                    await runner.run_once()
+            assert pools[0] is pools[1]
+            assert parallel.get_transform_pool(1) is pools[0]
+        finally:
+            parallel.close_transform_pool()
+        assert parallel.get_transform_pool(1) is not pools[0]
+        parallel.close_transform_pool()
+
+        async with sessionmaker() as session:
+            price = (await session.execute(select(models.NormalizedRecord.price_usd))).scalar_one()
+        assert price == 2.0
+
+    @pytest.mark.asyncio
+    async def test_not_modified_short_circuits_run(self, sessionmaker):
+        """A 304 ends the run early and the stored validators are sent on the next run."""
+        sent = []
+
+        async def stream(*args, validators=None, **kwargs):
+            sent.append((validators.etag, validators.last_modified))
+            if validators.etag == '"v1"':
+                raise NotModified("tickers")
+            validators.etag, validators.last_modified = '"v1"', "Mon, 15 Jan 2024 10:30:00 GMT"
+            yield [_payload("btc-bitcoin", "btc", 1.0)]
+
+        with patch.object(coinpaprika, "stream_api_records", stream), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker):
+            for _ in range(2):
+                async with sessionmaker() as session:
+                    await runner._ingest_source(session, SOURCE)
+                    await session.commit()
+
+        async with sessionmaker() as session:
+            runs = (await session.execute(select(models.ETLRun).order_by(models.ETLRun.id))).scalars().all()
+            checkpoint = (await session.execute(select(models.ETLCheckpoint))).scalar_one()
+
+        assert sent == [(None, None), ('"v1"', "Mon, 15 Jan 2024 10:30:00 GMT")]
+        assert [run.status for run in runs] == ["success", "success"]
+        assert json.loads(runs[1].stats) == {"not_modified": True}
+        assert runs[1].processed == 0
+        assert checkpoint.etag == '"v1"'
+
+    @pytest.mark.asyncio
+    async def test_failed_run_is_persisted(self, sessionmaker):
+        async def stream(*args, **kwargs):
+            raise RuntimeError("upstream down")
+            yield  # pragma: no cover
+
+        with patch.object(coinpaprika, "stream_api_records", stream), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker):
+            async with sessionmaker() as session:
+                with pytest.raises(RuntimeError):
+                    await runner._ingest_source(session, SOURCE)
+
+        async with sessionmaker() as session:
+            run = (await session.execute(select(models.ETLRun))).scalar_one()
+        assert run.status == "failure"
+        assert run.message == "upstream down"
@@ -0,0 +1,193 @@
+"""Unit tests for SQL-side paging and counting of GET /data."""
+import json
+from datetime import datetime, timedelta
+
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from api.deps import get_db
+from api.main import app
+from api.routes.data import serialize_page
+from schemas.record import NormalizedRecord as NormalizedSchema
+from services import models, records
+from services.records import Cursor, SortKey
+
+START = datetime(2024, 1, 15, 10)
+
+
+@pytest_asyncio.fixture
+async def sessionmaker(sessionmaker):
+    async with sessionmaker() as session:
+        session.add_all([
+            models.NormalizedRecord(
+                id=f"{'csv' if i % 3 == 0 else 'coinpaprika'}_T{i:02d}",
+                ticker=f"T{i:02d}",
+                price_usd=float(i),
+                # Some NULLs and ties for the nullable-key tests
+                market_cap_usd=None if i % 4 == 0 else float(i % 5),
+                source="csv" if i % 3 == 0 else "coinpaprika",
+                # Pairs of equal timestamps: id decides their order
+                created_at=START + timedelta(minutes=i // 2),
+            )
+            for i in range(30)
+        ])
+        await session.commit()
+    yield sessionmaker
+
+
+class TestPage:
+    @pytest.mark.asyncio
+    async def test_pages_are_disjoint_and_ordered(self, sessionmaker):
+        async with sessionmaker() as session:
+            pages = [(await records.page(session, 7, offset)).rows for offset in range(0, 35, 7)]
+        seen = [(row.created_at, row.id) for rows in pages for row in rows]
+        assert len(seen) == len(set(seen)) == 30
+        assert seen == sorted(seen, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_count_modes(self, sessionmaker):
+        async with sessionmaker() as session:
+            exact = await records.count(session, "exact", source="csv")
+            # SQLite has no planner estimate: falls back to the exact count
+            estimated = await records.count(session, "estimated", source="csv")
+            none = await records.count(session, "none", source="csv")
+        assert exact == estimated == (10, False)
+        assert none == (None, False)
+
+
+async def _walk(session, limit: int, **kwargs):
+    """Every page forward by next_cursor, then back again by prev_cursor."""
+    forward = [await records.page(session, limit, **kwargs)]
+    while forward[-1].next_cursor:
+        forward.append(await records.page(session, limit, cursor=Cursor.decode(forward[-1].next_cursor), **kwargs))
+    backward = [forward[-1]]
+    while backward[-1].prev_cursor:
+        backward.append(await records.page(session, limit, cursor=Cursor.decode(backward[-1].prev_cursor), **kwargs))
+    return [[row.id for row in page.rows] for page in forward], [[row.id for row in page.rows] for page in backward]
+
+
+class TestCursor:
+    @pytest.mark.asyncio
+    async def test_cursor_pages_match_offset_pages(self, sessionmaker):
+        async with sessionmaker() as session:
+            by_offset = [[row.id for row in (await records.page(session, 7, offset)).rows] for offset in range(0, 30, 7)]
+            forward, backward = await _walk(session, 7)
+        assert forward == by_offset
+        assert backward == by_offset[::-1]
+
+    @pytest.mark.asyncio
+    async def test_nullable_key_reads_nulls_last_in_both_directions(self, sessionmaker):
+        nullable = SortKey(models.NormalizedRecord.market_cap_usd, nullable=True)
+        with patch.dict(records.SORT_KEYS, {"market_cap_usd": nullable}):
+            async with sessionmaker() as session:
+                rows = (await records.page(session, 30, sort="market_cap_usd")).rows
+                for descending in (True, False):
+                    forward, backward = await _walk(session, 4, sort="market_cap_usd", descending=descending)
+                    offsets = [
+                        [row.id for row in (await records.page(
+                            session, 4, offset, sort="market_cap_usd", descending=descending,
+                        )).rows]
+                        for offset in range(0, 30, 4)
+                    ]
+                    assert forward == offsets
+                    assert backward == forward[::-1]
+
+        # Descending market cap, ties by id, then the NULLs by id
+        expected = sorted((row for row in rows if row.market_cap_usd is not None),
+                          key=lambda row: (row.market_cap_usd, row.id), reverse=True)
+        expected += sorted((row for row in rows if row.market_cap_usd is None), key=lambda row: row.id, reverse=True)
+        assert [row.id for row in rows] == [row.id for row in expected]
+
+    def test_tampered_cursor_is_rejected(self):
+        token = Cursor("created_at", True, START, "csv_T00").encode()
+        assert Cursor.decode(token) == Cursor("created_at", True, START, "csv_T00")
+        for bad in ("not-a-cursor", token[:-3], Cursor("secret", True, 1, "x").encode()):
+            with pytest.raises(ValueError):
+                Cursor.decode(bad)
+
+
+class TestSerializePage:
+    @pytest.mark.asyncio
+    async def test_matches_the_schema(self, sessionmaker):
+        assert list(models.NormalizedRecord.__table__.columns.keys()) == list(NormalizedSchema.model_fields)
+        async with sessionmaker() as session:
+            rows = (await records.page(session, 5)).rows
+        body = json.loads(serialize_page(rows, {"returned": 5}))
+
+        expected = [NormalizedSchema.model_validate(row, from_attributes=True).model_dump(mode="json") for row in rows]
+        assert body == {"data": expected, "pagination": {"returned": 5}}
+
+
+class TestListEndpoint:
+    @pytest.mark.asyncio
+    async def test_filters_page_and_total(self, sessionmaker):
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/data", params={
+                    "source": "coinpaprika", "start_date": (START + timedelta(minutes=5)).isoformat(),
+                    "limit": 5, "offset": 5,
+                })
+                uncounted = await client.get("/data", params={"count": "none", "limit": 1})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        body = response.json()
+        assert body["pagination"] == {
+            **body["pagination"], "limit": 5, "offset": 5, "returned": 5, "total": 14, "total_estimated": False,
+        }
+        assert [row["ticker"] for row in body["data"]] == ["T22", "T20", "T19", "T17", "T16"]
+        assert uncounted.json()["pagination"]["total"] is None
+
+    @pytest.mark.asyncio
+    async def test_cursor_paging(self, sessionmaker):
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                first = (await client.get("/data", params={"limit": 3})).json()["pagination"]
+                second = (await client.get("/data", params={"limit": 3, "cursor": first["next_cursor"]})).json()
+                both = await client.get("/data", params={"cursor": first["next_cursor"], "offset": 3})
+                bad = await client.get("/data", params={"cursor": "garbage"})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert first["prev_cursor"] is None
+        assert [row["ticker"] for row in second["data"]] == ["T26", "T24", "T25"]
+        assert second["pagination"]["prev_cursor"] is not None
+        assert both.status_code == bad.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_sort_by_and_order(self, sessionmaker):
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                cheapest = (await client.get("/data", params={"sort_by": "price_usd", "order": "asc", "limit": 3})).json()
+                first = (await client.get("/data", params={"sort_by": "market_cap_usd", "limit": 3})).json()
+                second = (await client.get("/data", params={
+                    "sort_by": "market_cap_usd", "limit": 3, "cursor": first["pagination"]["next_cursor"],
+                })).json()
+                mismatched = await client.get("/data", params={"cursor": first["pagination"]["next_cursor"]})
+                unknown = await client.get("/data", params={"sort_by": "name"})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert [row["ticker"] for row in cheapest["data"]] == ["T00", "T01", "T02"]
+        caps = [row["market_cap_usd"] for row in first["data"] + second["data"]]
+        assert caps == [4.0, 4.0, 4.0, 4.0, 3.0, 3.0]
+        assert mismatched.status_code == 400
+        assert unknown.status_code == 422
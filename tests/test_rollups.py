@@ -0,0 +1,196 @@
+"""Unit tests for the ingest-time OHLCV rollups."""
+from datetime import datetime, timedelta
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.deps import get_db
+from api.main import app
+from ingestion import load, runner
+from ingestion.load import append_price_history, upsert_ohlcv
+from ingestion.rollups import aggregate
+from ingestion.sources.csv_source import CSVSource
+from schemas.record import NormalizedRecord
+from services import models
+
+START = datetime(2024, 1, 15, 10)
+
+
+def _record(
+    minute: float, price: float, volume: float = None, ticker: str = "BTC", source: str = "coinpaprika",
+) -> NormalizedRecord:
+    return NormalizedRecord(
+        id=f"{source}_{ticker}",
+        ticker=ticker,
+        price_usd=price,
+        volume_24h_usd=volume,
+        source=source,
+        created_at=START + timedelta(minutes=minute),
+    )
+
+
+def _history(minute: float, price: float, volume: float = None) -> dict:
+    return {"ticker": "BTC", "ts": START + timedelta(minutes=minute), "price_usd": price, "volume_24h_usd": volume}
+
+
+def _candles(rows, interval):
+    return [
+        (row["bucket"], row["open"], row["high"], row["low"], row["close"], row["volume"], row["samples"])
+        for row in rows if row["interval"] == interval
+    ]
+
+
+class TestAggregate:
+    def test_buckets_per_interval(self):
+        rows = aggregate([
+            _history(0.5, 10.0, 1.0),
+            _history(1.2, 14.0, 2.0),
+            _history(0.1, 12.0, None),
+            _history(1.9, 8.0, None),
+            _history(61, 20.0, 3.0),
+        ])
+
+        minute = START.replace(minute=1)
+        assert _candles(rows, "1m") == [
+            (START, 12.0, 12.0, 10.0, 10.0, 1.0, 2),
+            (minute, 14.0, 14.0, 8.0, 8.0, 2.0, 2),
+            (START + timedelta(minutes=61), 20.0, 20.0, 20.0, 20.0, 3.0, 1),
+        ]
+        assert _candles(rows, "1h") == [
+            (START, 12.0, 14.0, 8.0, 8.0, 2.0, 4),
+            (START + timedelta(hours=1), 20.0, 20.0, 20.0, 20.0, 3.0, 1),
+        ]
+        assert _candles(rows, "1d") == [(START.replace(hour=0), 12.0, 20.0, 8.0, 20.0, 3.0, 5)]
+
+
+async def _ingest(sessionmaker, records) -> None:
+    async with sessionmaker() as session:
+        await upsert_ohlcv(session, await append_price_history(session, records))
+        await session.commit()
+
+
+class TestUpsertOHLCV:
+    @pytest.mark.asyncio
+    async def test_out_of_order_batches_match_one_batch(self, sessionmaker):
+        quotes = [_record(minute * 7.5, 100 + (minute * 37) % 11, float(minute)) for minute in range(40)]
+        # Later quotes first, overlapping buckets, and a batch re-sent in full
+        for batch in (quotes[20:], quotes[5:20], quotes[:5], quotes[10:15]):
+            await _ingest(sessionmaker, batch)
+
+        async with sessionmaker() as session:
+            stored = [
+                {column: getattr(row, column) for column in (
+                    "ticker", "interval", "bucket", "open", "high", "low", "close", "volume", "open_ts", "close_ts",
+                    "samples",
+                )}
+                for row in (await session.execute(
+                    select(models.OHLCVRollup).order_by(
+                        models.OHLCVRollup.ticker, models.OHLCVRollup.interval, models.OHLCVRollup.bucket,
+                    )
+                )).scalars()
+            ]
+            history = [
+                {"ticker": row.ticker, "ts": row.ts, "price_usd": row.price_usd, "volume_24h_usd": row.volume_24h_usd}
+                for row in (await session.execute(select(models.PriceHistory))).scalars()
+            ]
+
+        assert len(history) == 40
+        assert stored == aggregate(history)
+
+
+async def _stored_and_expected(sessionmaker):
+    """ohlcv_rollups as stored, and as aggregated from all of price_history."""
+    async with sessionmaker() as session:
+        rollups = models.OHLCVRollup.__table__
+        stored = [
+            dict(row) for row in (await session.execute(
+                select(*(column for column in rollups.c)).order_by(rollups.c.ticker, rollups.c.interval, rollups.c.bucket)
+            )).mappings()
+        ]
+        history = (await session.execute(select(models.PriceHistory.__table__))).mappings().all()
+    return stored, aggregate(history)
+
+
+class TestIngestedRollups:
+    @pytest.mark.asyncio
+    async def test_every_tick_of_a_batch_is_folded_in(self, sessionmaker, tmp_path):
+        ticks = [(5, 10.0, 1.0), (20, 14.0, 2.0), (40, 8.0, 3.0), (55, 11.0, 4.0), (70, 9.0, 5.0)]
+        path = tmp_path / "quotes.csv"
+        path.write_text("symbol,price_usd,volume_24h_usd,created_at\n" + "".join(
+            f"btc,{price},{volume},{START + timedelta(seconds=second):%Y-%m-%dT%H:%M:%S}Z\n"
+            for second, price, volume in ticks
+        ))
+        source = CSVSource(str(path))
+
+        # One batch holds every tick
+        with patch.object(runner, "get_sources", lambda: [source]), \
+                patch.object(runner, "init_db", AsyncMock()), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                patch.object(runner.settings, "upsert_batch_size", 100):
+            await runner.run_once()
+
+        stored, expected = await _stored_and_expected(sessionmaker)
+        assert stored == expected
+        assert _candles(stored, "1m") == [
+            (START, 10.0, 14.0, 8.0, 11.0, 4.0, 4),
+            (START.replace(minute=1), 9.0, 9.0, 9.0, 9.0, 5.0, 1),
+        ]
+        assert _candles(stored, "1h") == [(START, 10.0, 14.0, 8.0, 9.0, 5.0, 5)]
+
+
+class TestCleanupRebuild:
+    @pytest.mark.asyncio
+    async def test_csv_cleanup_rebuilds_rollups_from_the_remaining_history(self, sessionmaker):
+        await _ingest(sessionmaker, [_record(minute, 100.0 + minute, 2.0) for minute in range(0, 90, 3)])
+        # csv quotes: some inside the API buckets, ETH only from csv
+        await _ingest(sessionmaker, [
+            _record(minute + 0.5, 10.0 * minute, 1.0, source="csv") for minute in range(0, 120, 7)
+        ] + [_record(minute, 5.0, ticker="ETH", source="csv") for minute in range(3)])
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            # Small chunks: the rebuild folds a ticker's history in several upserts
+            with patch.object(load, "REBUILD_CHUNK_ROWS", 4):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    response = await client.post("/admin/cleanup-csv")
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert response.status_code == 200
+        assert response.json()["ohlcv_rebuilt_tickers"] == 2
+        stored, expected = await _stored_and_expected(sessionmaker)
+        assert {row["ticker"] for row in stored} == {"BTC"}
+        assert stored == expected
+        assert sum(row["samples"] for row in stored if row["interval"] == "1d") == 30
+
+
+class TestOHLCVEndpoint:
+    @pytest.mark.asyncio
+    async def test_reads_rollups(self, sessionmaker):
+        await _ingest(sessionmaker, [_record(minute, float(minute), 5.0) for minute in range(0, 180, 10)])
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/data/ohlcv/btc", params={"interval": "1h", "limit": 2})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert response.status_code == 200
+        body = response.json()
+        # The two most recent hours, oldest first
+        assert [(c["ts"], c["open"], c["high"], c["low"], c["close"], c["samples"]) for c in body["data"]] == [
+            ("2024-01-15T11:00:00", 60.0, 110.0, 60.0, 110.0, 6),
+            ("2024-01-15T12:00:00", 120.0, 170.0, 120.0, 170.0, 6),
+        ]
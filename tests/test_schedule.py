@@ -0,0 +1,179 @@
+"""Unit tests for the adaptive ETL schedule."""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.deps import get_db
+from api.main import app
+from ingestion.jobs import EtlJob, JobManager, run_worker
+from ingestion.runner import _failure_stats
+from ingestion.schedule import AdaptiveSchedule, RunOutcome, load_outcome, run_adaptive
+from services import models
+
+
+def _schedule(interval: float = 1000.0, rng=lambda: 0.5) -> AdaptiveSchedule:
+    # rng 0.5 = no jitter
+    return AdaptiveSchedule(min_interval=100.0, max_interval=4000.0, interval=interval, jitter=0.1, rng=rng)
+
+
+class TestDecide:
+    def test_many_changes_shorten_the_interval(self):
+        schedule = _schedule()
+        decision = schedule.decide(RunOutcome(changed=80, unchanged=20, succeeded=1))
+        assert (decision.reason, decision.interval_s, decision.delay_s) == ("high_change", 500.0, 500.0)
+        assert decision.change_ratio == 0.8
+
+    def test_quiet_or_not_modified_backs_off(self):
+        schedule = _schedule()
+        assert schedule.decide(RunOutcome(changed=1, unchanged=99, succeeded=1)).interval_s == 1500.0
+        decision = schedule.decide(RunOutcome(not_modified=1, succeeded=1))
+        assert (decision.reason, decision.interval_s) == ("not_modified", 2250.0)
+
+    def test_steady_and_failed_runs_keep_the_interval(self):
+        schedule = _schedule()
+        assert schedule.decide(RunOutcome(changed=20, unchanged=80, succeeded=1)).reason == "steady"
+        assert schedule.decide(RunOutcome(failed=1)).reason == "failed"
+        assert schedule.interval == 1000.0
+
+    def test_bounds(self):
+        fast, slow = _schedule(interval=150.0), _schedule(interval=3000.0)
+        assert fast.decide(RunOutcome(changed=10, succeeded=1)).interval_s == 100.0
+        assert slow.decide(RunOutcome(not_modified=1, succeeded=1)).interval_s == 4000.0
+
+    def test_rate_limit_waits_for_retry_after(self):
+        decision = _schedule(interval=200.0).decide(RunOutcome(rate_limited=True, retry_after=900.0, failed=1))
+        assert (decision.reason, decision.interval_s, decision.delay_s) == ("rate_limited", 400.0, 900.0)
+
+    def test_jitter_only_moves_the_delay(self):
+        low, high = _schedule(rng=lambda: 0.0), _schedule(rng=lambda: 1.0)
+        outcome = RunOutcome(changed=20, unchanged=80, succeeded=1)
+        assert low.decide(outcome).delay_s == 900.0
+        assert high.decide(outcome).delay_s == 1100.0
+        assert low.interval == high.interval == 1000.0
+
+
+class TestFailureStats:
+    def test_429_is_recorded_with_retry_after(self):
+        request = httpx.Request("GET", "https://example.com")
+        response = httpx.Response(429, headers={"Retry-After": "120"}, request=request)
+        error = httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+        assert _failure_stats(error) == {"rate_limited": True, "retry_after": 120.0}
+        assert _failure_stats(ValueError("bad body")) is None
+
+
+def _run(started_at: datetime, status: str = "success", **stats) -> models.ETLRun:
+    return models.ETLRun(
+        source="coinpaprika", status=status, started_at=started_at, finished_at=started_at,
+        stats=json.dumps(stats) if stats else None,
+    )
+
+
+class TestObserve:
+    @pytest.mark.asyncio
+    async def test_outcome_counts_only_the_jobs_runs(self, sessionmaker):
+        start = datetime(2024, 1, 15, 10)
+        job = EtlJob(id="job", trigger="api", status="success", started_at=start, finished_at=start + timedelta(minutes=1))
+        async with sessionmaker() as session:
+            session.add_all([
+                # An earlier job's run
+                _run(start - timedelta(hours=1), records={"processed": 500, "skipped": 0}),
+                _run(start + timedelta(seconds=1), records={"processed": 30, "skipped": 10}),
+                _run(start + timedelta(seconds=2), not_modified=True),
+            ])
+            await session.commit()
+            outcome = await load_outcome(session, job)
+
+        assert (outcome.changed, outcome.unchanged, outcome.not_modified, outcome.succeeded) == (30, 10, 1, 2)
+
+    @pytest.mark.asyncio
+    async def test_decision_is_stored_and_served_by_stats(self, sessionmaker):
+        job = EtlJob(id="job", trigger="api", status="success", started_at=datetime.utcnow())
+        async with sessionmaker() as session:
+            session.add(_run(job.started_at, records={"processed": 90, "skipped": 10}))
+            await session.commit()
+        job.finished_at = datetime.utcnow()
+        delay = await _schedule().observe(sessionmaker, job)
+
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/stats")
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        schedule = response.json()["schedule"]
+        assert delay == 500.0
+        assert schedule == {**schedule, "reason": "high_change", "interval_s": 500.0, "changed": 90}
+
+    @pytest.mark.asyncio
+    async def test_database_error_falls_back_to_the_interval(self):
+        def unreachable():
+            raise OSError("database unreachable")
+
+        job = EtlJob(id="job", trigger="api", status="success", started_at=datetime.utcnow())
+        assert await _schedule(interval=1200.0).observe(unreachable, job) == 1200.0
+
+
+class TestRunAdaptive:
+    @pytest.mark.asyncio
+    async def test_failing_iteration_does_not_stop_the_loop(self):
+        calls = []
+
+        async def run():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            if len(calls) == 3:
+                raise asyncio.CancelledError
+            return EtlJob(id="job", trigger="cli", status="success")
+
+        schedule = AdaptiveSchedule(min_interval=0.0, max_interval=0.0, jitter=0.0)
+        observed = []
+
+        async def observe(sessionmaker, job):
+            observed.append(job.id)
+            return 0.0
+
+        schedule.observe = observe
+        with pytest.raises(asyncio.CancelledError):
+            await run_adaptive(schedule, None, run)
+        assert (len(calls), observed) == (3, ["job"])
+
+
+@asynccontextmanager
+async def _free_lock():
+    yield True
+
+
+class TestWorkerSchedule:
+    @pytest.mark.asyncio
+    async def test_worker_queues_its_own_runs(self, sessionmaker):
+        calls = []
+
+        async def run():
+            calls.append(1)
+
+        stop = asyncio.Event()
+        schedule = AdaptiveSchedule(min_interval=0.01, max_interval=0.01, jitter=0.0)
+        worker = asyncio.create_task(run_worker(
+            sessionmaker, JobManager(run=run, lock=_free_lock), poll_seconds=0.01, schedule=schedule, stop=stop,
+        ))
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+
+        async with sessionmaker() as session:
+            triggers = (await session.execute(select(models.ETLJobRecord.trigger))).scalars().all()
+        assert set(triggers) == {"scheduler"}
+        assert schedule.last.reason == "no_runs"
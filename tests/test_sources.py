@@ -0,0 +1,191 @@
+"""Unit tests for the source registry and concurrent per-source runs."""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.deps import get_db
+from api.main import app
+from ingestion import runner
+from ingestion.columnar import BatchResult, NormalizedBatch
+from ingestion.normalize import merge_records
+from ingestion.sources import registry
+from ingestion.sources.base import Source
+from schemas.record import NormalizedRecord
+from services import cache, models
+
+
+class FakeSource(Source):
+    """Yields one batch per ticker; optionally waits for the other sources first."""
+
+    def __init__(self, name: str, priority: int, tickers: list, barrier: asyncio.Barrier = None, error: str = None):
+        self.name = name
+        self.priority = priority
+        self.tickers = tickers
+        self.barrier = barrier
+        self.error = error
+
+    async def fetch(self, context):
+        if self.barrier is not None:
+            # Only passes if every source is fetching at the same time
+            await asyncio.wait_for(self.barrier.wait(), timeout=2)
+        if self.error:
+            raise RuntimeError(self.error)
+        for ticker in self.tickers:
+            yield [{"external_id": f"{self.name}-{ticker}", "ticker": ticker}]
+
+    def transform(self, payloads):
+        records = [
+            NormalizedRecord(
+                id=f"{self.name}_{payload['ticker']}",
+                ticker=payload["ticker"],
+                name=f"{payload['ticker']} from {self.name}",
+                price_usd=1.0,
+                source=self.name,
+                created_at=datetime(2024, 1, 15),
+            )
+            for payload in payloads
+        ]
+        return BatchResult(batch=NormalizedBatch.from_records(records), failed=[])
+
+
+class FailsAfterWriteSource(FakeSource):
+    """Raises once its batches are committed, like an upstream that drops mid-run."""
+
+    def __init__(self, name: str, priority: int, tickers: list, written: asyncio.Event):
+        super().__init__(name, priority, tickers)
+        self.written = written
+
+    async def fetch(self, context):
+        async for batch in super().fetch(context):
+            yield batch
+        await asyncio.wait_for(self.written.wait(), timeout=2)
+        raise RuntimeError(f"{self.name} down")
+
+
+@pytest.fixture
+def registered():
+    """Register sources for one test only."""
+    names = []
+
+    def add(source):
+        names.append(source.name)
+        return registry.register(source)
+
+    yield add
+    for name in names:
+        registry.unregister(name)
+
+
+class TestRegistry:
+    def test_coinpaprika_is_builtin(self):
+        assert [source.name for source in registry.get_sources()][0] == "coinpaprika"
+        assert registry.priority_of("CoinPaprika") == 1
+        assert registry.priority_of("nope") == registry.DEFAULT_PRIORITY
+
+    def test_merge_priority_comes_from_registry(self, registered):
+        def record(source, name, hour):
+            return NormalizedRecord(
+                id="x", ticker="BTC", name=name, price_usd=1.0, source=source, created_at=datetime(2024, 1, 15, hour),
+            )
+
+        existing, incoming = record("slow", "Bitcoin (slow)", 9), record("fast", "Bitcoin (fast)", 8)
+        assert merge_records(existing, incoming).name == "Bitcoin (slow)"
+
+        registered(FakeSource("fast", 2, []))
+        registered(FakeSource("slow", 5, []))
+        assert merge_records(existing, incoming).name == "Bitcoin (fast)"
+
+
+class TestRunOnce:
+    @pytest.mark.asyncio
+    async def test_sources_run_concurrently_with_own_rows(self, sessionmaker):
+        barrier = asyncio.Barrier(3)
+        sources = [
+            FakeSource("alpha", 2, ["BTC", "ETH"], barrier),
+            FakeSource("beta", 3, ["BTC", "SOL"], barrier),
+            FakeSource("gamma", 4, [], barrier, error="gamma down"),
+        ]
+
+        with patch.object(runner, "get_sources", lambda: sources), \
+                patch.object(runner, "init_db", AsyncMock()), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker):
+            with pytest.raises(RuntimeError, match="gamma down"):
+                await runner.run_once()
+
+        async with sessionmaker() as session:
+            runs = {run.source: run for run in (await session.execute(select(models.ETLRun))).scalars()}
+            checkpoints = (await session.execute(select(models.ETLCheckpoint.source))).scalars().all()
+            tickers = (await session.execute(select(models.NormalizedRecord.ticker))).scalars().all()
+
+        assert {name: run.status for name, run in runs.items()} == {
+            "alpha": "success", "beta": "success", "gamma": "failure",
+        }
+        assert runs["alpha"].processed == 2
+        assert sorted(checkpoints) == ["alpha", "beta", "gamma"]
+        assert sorted(tickers) == ["BTC", "ETH", "SOL"]
+
+    @pytest.mark.asyncio
+    async def test_dataset_version_is_bumped_only_when_rows_are_written(self, sessionmaker):
+        written = asyncio.Event()
+        write_batch = runner._write_batch
+
+        async def write_and_signal(*args):
+            await write_batch(*args)
+            written.set()
+
+        runs = [
+            [FakeSource("alpha", 2, [])],
+            [FailsAfterWriteSource("alpha", 2, ["BTC"], written)],
+            # Same payload again: skipped by its watermark
+            [FakeSource("alpha", 2, ["BTC"])],
+            [FakeSource("beta", 3, ["BTC"])],
+        ]
+        bumps = []
+        with patch.object(runner, "init_db", AsyncMock()), \
+                patch.object(runner, "AsyncSessionLocal", sessionmaker), \
+                patch.object(runner, "_write_batch", write_and_signal), \
+                patch.object(cache, "bump_dataset_version", wraps=cache.bump_dataset_version) as bump:
+            for sources in runs:
+                with patch.object(runner, "get_sources", lambda: sources):
+                    try:
+                        await runner.run_once()
+                    except RuntimeError:
+                        pass
+                bumps.append(bump.await_count)
+
+        assert bumps == [0, 1, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_stats_shows_a_failed_run_that_wrote_nothing(self, sessionmaker):
+        async def override():
+            async with sessionmaker() as session:
+                yield session
+
+        async def run(source):
+            with patch.object(runner, "get_sources", lambda: [source]):
+                await runner.run_once()
+
+        app.dependency_overrides[get_db] = override
+        try:
+            with patch.object(runner, "init_db", AsyncMock()), \
+                    patch.object(runner, "AsyncSessionLocal", sessionmaker):
+                async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                    await run(FakeSource("alpha", 2, ["BTC"]))
+                    first = await client.get("/stats")
+                    with pytest.raises(RuntimeError):
+                        await run(FakeSource("alpha", 2, [], error="alpha down"))
+                    second = await client.get("/stats", headers={"If-None-Match": first.headers["etag"]})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        assert first.json()["last_failure"]["message"] is None
+        # The dataset version is unchanged, but the body and its ETag are not
+        assert second.status_code == 200
+        assert second.json()["cache"]["dataset_version"] == first.json()["cache"]["dataset_version"]
+        assert second.json()["last_failure"]["message"] == "alpha down"
+        assert second.json()["last_success"] == first.json()["last_success"]
+        assert second.headers["etag"] != first.headers["etag"]
@@ -0,0 +1,146 @@
+"""Unit tests for background startup, readiness and the cached schema creation."""
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api import main
+from api.deps import get_db
+from ingestion.jobs import JobManager
+from services import db
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(sessionmaker):
+    async def override():
+        async with sessionmaker() as session:
+            yield session
+
+    main.app.dependency_overrides[get_db] = override
+    async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+        client.sessionmaker = sessionmaker
+        yield client
+    main.app.dependency_overrides.pop(get_db, None)
+
+
+class TestInitDb:
+    @pytest.mark.asyncio
+    async def test_schema_is_created_once_per_process(self, engine):
+        create = MagicMock(side_effect=db._create_schema)
+        with patch.object(db, "engine", engine), patch.object(db, "_schema_ready", False), \
+                patch.object(db, "_create_schema", create):
+            await asyncio.gather(db.init_db(), db.init_db())
+            await db.init_db()
+            assert db.schema_ready()
+            await db.init_db(force=True)
+        assert create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_waits_for_the_database(self):
+        init = AsyncMock(side_effect=[OSError("connection refused"), OSError("connection refused"), None])
+        sleep = AsyncMock()
+        with patch.object(db, "init_db", init), patch.object(db.asyncio, "sleep", sleep):
+            await db.init_db_with_retry(max_delay=1.5)
+        assert init.await_count == 3
+        assert [call.args[0] for call in sleep.await_args_list] == [1.0, 1.5]
+
+
+class TestReadiness:
+    @pytest.mark.asyncio
+    async def test_warming_until_startup_etl_or_existing_data(self, client):
+        with patch("api.routes.health.schema_ready", return_value=True):
+            main.app.state.warming = True
+            try:
+                warming = await client.get("/health/ready")
+                main.app.state.existing_data = True
+                restarted = await client.get("/health/ready")
+            finally:
+                main.app.state.warming = False
+                main.app.state.existing_data = False
+            done = await client.get("/health/ready")
+
+        assert (warming.status_code, warming.json()["status"]) == (503, "warming")
+        assert (restarted.status_code, restarted.json()["checks"]["existing_data"]) == (200, True)
+        assert done.json()["status"] == "ready"
+
+    @pytest.mark.asyncio
+    async def test_unavailable_without_schema(self, client):
+        with patch("api.routes.health.schema_ready", return_value=False):
+            response = await client.get("/health/ready")
+        assert (response.status_code, response.json()["status"]) == (503, "unavailable")
+
+
+@asynccontextmanager
+async def _free_lock():
+    yield True
+
+
+class TestLifespan:
+    @pytest.mark.asyncio
+    async def test_startup_etl_runs_in_the_background(self, client):
+        release = asyncio.Event()
+
+        async def run():
+            await release.wait()
+
+        manager = JobManager(run=run, lock=_free_lock)
+        with patch.object(main, "init_db_with_retry", AsyncMock()), \
+                patch.object(main, "AsyncSessionLocal", client.sessionmaker), \
+                patch.object(main, "get_job_manager", return_value=manager), \
+                patch.object(main, "load_schedule", AsyncMock()), \
+                patch.object(main, "schedule_next_etl", AsyncMock()) as schedule_next, \
+                patch.object(main, "scheduler", MagicMock(running=False)), \
+                patch.object(main.settings, "etl_mode", "inline"), \
+                patch("api.routes.health.schema_ready", return_value=True):
+            async with main.app.router.lifespan_context(main.app):
+                # Serving while the initial ETL is still running
+                live = await client.get("/health/live")
+                while manager.current is None or manager.current.status != "running":
+                    await asyncio.sleep(0)
+                warming = await client.get("/health/ready")
+                release.set()
+                while main.app.state.warming:
+                    await asyncio.sleep(0.01)
+                ready = await client.get("/health/ready")
+
+        assert live.status_code == 200
+        assert warming.json() == {**warming.json(), "status": "warming", "warming": True}
+        assert warming.json()["checks"]["startup_etl"] == "running"
+        assert ready.status_code == 200
+        schedule_next.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_startup_failures_still_finish_warming_and_schedule(self, client):
+        async def run():
+            pass
+
+        def unreachable():
+            raise OSError("database unreachable")
+
+        manager = JobManager(run=run, lock=_free_lock)
+        scheduler = MagicMock(running=False)
+        with patch.object(main, "init_db_with_retry", AsyncMock()), \
+                patch.object(main, "AsyncSessionLocal", unreachable), \
+                patch.object(main, "get_job_manager", return_value=manager), \
+                patch.object(main, "load_schedule", AsyncMock(side_effect=OSError("database unreachable"))), \
+                patch.object(main, "scheduler", scheduler), \
+                patch.object(main.settings, "etl_mode", "inline"):
+            main.app.state.warming = True
+            await main.warm_up(main.app)
+
+        assert main.app.state.warming is False
+        scheduler.start.assert_called_once()
+        # The schedule decision could not be stored either: next run after the initial interval
+        scheduler.add_job.assert_called_once()
+        assert main.etl_schedule.interval == main.settings.schedule_initial_seconds
@@ -0,0 +1,164 @@
+"""Unit tests for incremental JSON parsing and streamed API fetches."""
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+
+from ingestion.sources.jsonstream import JSONArrayParser
+from ingestion.sources.api_source import fetch_api_records, stream_api_records
+from ingestion.sources.http_client import CacheValidators, NotModified, close_http_client, get_http_client
+
+
+TICKERS = [
+    {"id": "btc-bitcoin", "symbol": "BTC", "name": "Bitcoin", "quotes": {"USD": {"price": 45000.0}}},
+    {"id": "eth-ethereum", "symbol": "ETH", "name": "Ethe\"reum ]}", "tags": [["a"], {"b": "\\"}]},
+    {"id": "usdt-tether", "symbol": "USDT", "name": "Tether", "quotes": {}},
+]
+
+
+def _parse(raw: bytes, step: int) -> list:
+    parser = JSONArrayParser()
+    items = []
+    for i in range(0, len(raw), step):
+        items.extend(parser.feed(raw[i : i + step]))
+    parser.close()
+    return [json.loads(item) for item in items]
+
+
+class TestJSONArrayParser:
+    """Element boundaries must not depend on how the bytes are chunked."""
+
+    @pytest.mark.parametrize("step", [1, 2, 5, 64, 1 << 20])
+    def test_chunk_boundaries(self, step):
+        raw = json.dumps(TICKERS).encode()
+        assert _parse(raw, step) == TICKERS
+
+    def test_scalars_and_deep_nesting(self):
+        data = [1, -2.5e3, "s\\\"", True, None, [], {}, [[[[[[["]"]]]]]]]]
+        raw = json.dumps(data, indent=2).encode()
+        assert _parse(raw, 3) == data
+
+    def test_empty_array(self):
+        assert _parse(b" [ ] ", 1) == []
+
+    def test_incomplete_array_raises(self):
+        parser = JSONArrayParser()
+        parser.feed(b'[{"id": "btc"}')
+        with pytest.raises(ValueError):
+            parser.close()
+
+    def test_non_array_raises(self):
+        with pytest.raises(ValueError):
+            JSONArrayParser().feed(b'{"id": "btc"}')
+
+    def test_completed_elements_are_released(self):
+        """Only the element in progress stays buffered."""
+        parser = JSONArrayParser()
+        parser.feed(b'[{"id": "btc"}, {"id": "eth"}, {"id": "us')
+        assert bytes(parser._buf) == b'{"id": "us'
+
+
+def _mock_client(handler):
+    real_client = httpx.AsyncClient
+    transport = httpx.MockTransport(handler)
+    return patch(
+        "ingestion.sources.api_source.httpx.AsyncClient",
+        lambda **kwargs: real_client(transport=transport, **kwargs),
+    )
+
+
+class TestStreamAPIRecords:
+    """Streaming fetch against a mocked transport."""
+
+    @pytest.mark.asyncio
+    async def test_yields_payloads_with_external_id(self):
+        with _mock_client(lambda request: httpx.Response(200, json=TICKERS)):
+            items = [item async for item in stream_api_records(api_key="test_key")]
+
+        assert [item["external_id"] for item in items] == ["btc-bitcoin", "eth-ethereum", "usdt-tether"]
+        assert items[1]["name"] == TICKERS[1]["name"]
+
+    @pytest.mark.asyncio
+    async def test_batches(self):
+        with _mock_client(lambda request: httpx.Response(200, json=TICKERS)):
+            batches = [batch async for batch in stream_api_records(batch_size=2)]
+
+        assert [len(batch) for batch in batches] == [2, 1]
+
+    @pytest.mark.asyncio
+    async def test_raw_yields_undecoded_elements(self):
+        with _mock_client(lambda request: httpx.Response(200, json=TICKERS)):
+            batches = [batch async for batch in stream_api_records(batch_size=2, raw=True)]
+
+        assert [json.loads(item) for batch in batches for item in batch] == TICKERS
+
+    @pytest.mark.asyncio
+    async def test_sends_api_key(self):
+        seen = {}
+
+        def handler(request):
+            seen["key"] = request.headers.get("X-CoinAPI-Key")
+            return httpx.Response(200, json=[])
+
+        with _mock_client(handler):
+            assert [item async for item in stream_api_records(api_key="test_key")] == []
+        assert seen["key"] == "test_key"
+
+    @pytest.mark.asyncio
+    async def test_http_error_is_raised(self):
+        with _mock_client(lambda request: httpx.Response(500)):
+            with pytest.raises(httpx.HTTPStatusError):
+                [item async for item in stream_api_records()]
+
+
+class TestConditionalRequests:
+    """ETag / Last-Modified round trip against a mocked transport."""
+
+    @pytest.mark.asyncio
+    async def test_not_modified_raises(self):
+        seen = {}
+
+        def handler(request):
+            seen.update(request.headers)
+            return httpx.Response(304)
+
+        validators = CacheValidators(etag='"v1"', last_modified="Mon, 15 Jan 2024 10:30:00 GMT")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(NotModified):
+                [item async for item in stream_api_records(client=client, validators=validators)]
+
+        assert seen["if-none-match"] == '"v1"'
+        assert seen["if-modified-since"] == "Mon, 15 Jan 2024 10:30:00 GMT"
+
+    @pytest.mark.asyncio
+    async def test_validators_updated_from_response(self):
+        def handler(request):
+            assert "if-none-match" not in request.headers
+            return httpx.Response(200, json=TICKERS, headers={"ETag": '"v2"'})
+
+        validators = CacheValidators()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            items = [item async for item in stream_api_records(client=client, validators=validators)]
+
+        assert len(items) == 3
+        assert validators == CacheValidators(etag='"v2"', last_modified=None)
+
+    @pytest.mark.asyncio
+    async def test_fetch_reuses_given_client(self):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=TICKERS))) as client:
+            assert len(await fetch_api_records(client=client)) == 3
+            assert not client.is_closed
+
+
+class TestSharedClient:
+    @pytest.mark.asyncio
+    async def test_one_client_until_closed(self):
+        client = get_http_client()
+        assert get_http_client() is client
+        assert "gzip" in client.headers["Accept-Encoding"]
+
+        await close_http_client()
+        assert client.is_closed
+        replacement = get_http_client()
+        assert replacement is not client
+        await close_http_client()
@@ -0,0 +1,97 @@
+"""Unit tests for the in-memory top lists behind GET /data/top."""
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from api.deps import get_db
+from api.main import app
+from ingestion.jobs import JobManager
+from services import models, records, top
+
+
+def _maybe(rng: random.Random, value: float):
+    return None if rng.random() < 0.2 else value
+
+
+@pytest_asyncio.fixture
+async def sessionmaker(sessionmaker):
+    rng = random.Random(7)
+    async with sessionmaker() as session:
+        session.add_all([
+            models.NormalizedRecord(
+                id=f"coinpaprika_T{i:03d}",
+                ticker=f"T{i:03d}",
+                # Few distinct values, so ties are decided by id
+                price_usd=float(rng.randrange(20)),
+                market_cap_usd=_maybe(rng, float(rng.randrange(50))),
+                volume_24h_usd=_maybe(rng, float(rng.randrange(50))),
+                percent_change_24h=_maybe(rng, float(rng.randrange(-10, 10))),
+                source="coinpaprika",
+                created_at=datetime(2024, 1, 15),
+            )
+            for i in range(300)
+        ])
+        await session.commit()
+    with patch.object(top, "_board", top.TopBoard()):
+        yield sessionmaker
+
+
+class TestBoard:
+    @pytest.mark.asyncio
+    async def test_lists_match_sorted_queries(self, sessionmaker):
+        board = await top.refresh(sessionmaker)
+        async with sessionmaker() as session:
+            for name, (column, largest) in top.LISTS.items():
+                page = await records.page(session, top.TOP_SIZE, sort=column, descending=largest)
+                expected = [row.id for row in page.rows if getattr(row, column) is not None]
+                assert [row["id"] for row in board.lists[name]] == expected, name
+                assert len(board.lists[name]) == top.TOP_SIZE
+
+    @pytest.mark.asyncio
+    async def test_rebuilt_after_each_job(self, sessionmaker):
+        @asynccontextmanager
+        async def free_lock():
+            yield True
+
+        async def add_record():
+            async with sessionmaker() as session:
+                session.add(models.NormalizedRecord(
+                    id="coinpaprika_NEW", ticker="NEW", price_usd=1e9, source="coinpaprika", created_at=datetime.utcnow(),
+                ))
+                await session.commit()
+
+        manager = JobManager(run=add_record, lock=free_lock)
+        manager.add_listener(lambda job: top.refresh(sessionmaker))
+        await manager.run("api")
+        assert top.get_board().lists["price_usd"][0]["ticker"] == "NEW"
+
+
+class TestTopEndpoint:
+    @pytest.mark.asyncio
+    async def test_served_without_a_database(self, sessionmaker):
+        await top.refresh(sessionmaker)
+
+        async def no_db():
+            raise AssertionError("/data/top must not query the database")
+            yield
+
+        app.dependency_overrides[get_db] = no_db
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/data/top", params={"n": 3})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+        body = response.json()
+        assert response.status_code == 200
+        assert set(body["data"]) == set(top.LISTS)
+        assert all(len(rows) == 3 for rows in body["data"].values())
+        gainers, losers = body["data"]["gainers"], body["data"]["losers"]
+        assert gainers[0]["percent_change_24h"] >= gainers[-1]["percent_change_24h"]
+        assert losers[0]["percent_change_24h"] <= losers[-1]["percent_change_24h"]
+        assert body["meta"]["built_at"] is not None
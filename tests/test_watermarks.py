@@ -0,0 +1,67 @@
+"""Unit tests for per-ticker watermarks."""
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from ingestion.load import upsert_watermarks
+from ingestion.watermarks import HASH_PREFIX, WatermarkCache, payload_watermark
+from services import models
+
+
+@pytest_asyncio.fixture
+async def session(sessionmaker):
+    async with sessionmaker() as session:
+        yield session
+
+
+class TestPayloadWatermark:
+    """Watermark selection."""
+
+    def test_uses_last_updated(self):
+        payload = {"id": "btc-bitcoin", "quotes": {"USD": {"price": 1.0, "last_updated": "2024-01-15T10:30:00Z"}}}
+        assert payload_watermark(payload) == "2024-01-15T10:30:00Z"
+
+    def test_falls_back_to_content_hash(self):
+        first = payload_watermark({"id": "btc-bitcoin", "quotes": {"USD": {"price": 1.0}}})
+        second = payload_watermark({"quotes": {"USD": {"price": 1.0}}, "id": "btc-bitcoin"})
+        changed = payload_watermark({"id": "btc-bitcoin", "quotes": {"USD": {"price": 2.0}}})
+
+        assert first.startswith(HASH_PREFIX)
+        assert first == second  # Key order does not matter
+        assert first != changed
+
+
+class TestWatermarkCache:
+    """Cache filtering and persistence."""
+
+    @pytest.mark.asyncio
+    async def test_filter_drops_unchanged_payloads(self, session):
+        await upsert_watermarks(session, "coinpaprika", {"btc-bitcoin": "2024-01-15T10:30:00Z"})
+        cache = await WatermarkCache("coinpaprika").load(session)
+
+        unchanged = {"external_id": "btc-bitcoin", "quotes": {"USD": {"last_updated": "2024-01-15T10:30:00Z"}}}
+        moved = {"external_id": "eth-ethereum", "quotes": {"USD": {"last_updated": "2024-01-15T10:30:00Z"}}}
+        changed, skipped = cache.filter([unchanged, moved])
+
+        assert skipped == 1
+        assert changed == [(moved, "2024-01-15T10:30:00Z")]
+
+    @pytest.mark.asyncio
+    async def test_upsert_watermarks_overwrites(self, session):
+        await upsert_watermarks(session, "coinpaprika", {"btc-bitcoin": "a", "eth-ethereum": "a"})
+        await upsert_watermarks(session, "coinpaprika", {"btc-bitcoin": "b"})
+
+        rows = await session.execute(
+            select(models.TickerWatermark.external_id, models.TickerWatermark.watermark)
+            .order_by(models.TickerWatermark.external_id)
+        )
+        assert rows.all() == [("btc-bitcoin", "b"), ("eth-ethereum", "a")]
+
+    @pytest.mark.asyncio
+    async def test_update_and_invalidate(self, session):
+        cache = await WatermarkCache("coinpaprika").load(session)
+        cache.update({"btc-bitcoin": "a"})
+        assert cache.filter([{"external_id": "btc-bitcoin", "quotes": {"USD": {"last_updated": "a"}}}])[1] == 1
+
+        cache.invalidate()
+        assert not cache.loaded